@@ -50,6 +50,11 @@ requirements_py2 = [
     'futures'
 ]
 
+extras_requirements = {
+    'async': ['aiohttp'],
+    'columnar': ['numpy', 'pyarrow']
+}
+
 requirements = []
 major = sys.version_info[0]
 minor = sys.version_info[1]
@@ -97,6 +102,7 @@ setup(
     author='farmerx',
     url='https://github.com/TencentCloud/tencentcloud-cls-sdk-python',
     install_requires=requirements,
+    extras_require=extras_requirements,
     packages=packages,
     classifiers=classifiers,
     long_description=long_description,
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+import time
+
+from tencentcloud.log.consumer_group_request import ConsumerGroupGetOffsetsRequest, ConsumerGroupHeartBeatRequest, \
+    ConsumerGroupUpdateOffsetsRequest
+from tencentcloud.log.consumer_group_response import ConsumerGroupGetOffsetsResponse, \
+    ConsumerGroupHeartBeatResponse, ConsumerGroupUpdateOffsetsResponse
+from tencentcloud.log.logclient import LogClient, YunApiLogClient, CONNECTION_TIME_OUT_YUNAPI, \
+    RESPONSE_BODY_TYPE_BINARY
+from tencentcloud.log.logexception import LogException
+from tencentcloud.log.pulllog_response import PullLogResponse
+from tencentcloud.log.putlogsresponse import PutLogsResponse
+from tencentcloud.log.retry import QUOTA_EXCEED_ERROR_CODE
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ASYNC_POOL_MAXSIZE = 100
+
+
+class AsyncLogClient(object):
+    """ asyncio counterpart of LogClient and YunApiLogClient, requires python 3.5+ and aiohttp.
+    Requests are signed and responses are parsed exactly like the sync clients, but they are sent through
+    one aiohttp connection pool, so one event loop can drive many concurrent pulls.
+
+    :type endpoint: string
+    :param endpoint: log service host name, for example,  https://ap-guangzhou.cls.tencentcs.com
+    :type accessKeyId: string
+    :param accessKeyId: tencent cloud accessKeyId
+    :type accessKey: string
+    :param accessKey: tencent cloud accessKey
+    :type internal: bool
+    :param internal: consumer group requests go through the intranet or the internet
+    :type pool_maxsize: int
+    :param pool_maxsize: max concurrent connections for each host, default 100
+    :type retry_policy: RetryPolicy
+    :param retry_policy: backoff, budget and deadline of the retries, default RetryPolicy()
+    :type put_rate_limiter: TopicRateLimiter
+    :param put_rate_limiter: rate limit of put_log_raw per topic, default None
+    :type pull_rate_limiter: TopicRateLimiter
+    :param pull_rate_limiter: rate limit of pull_logs per topic, default None
+    """
+
+    def __init__(self, endpoint, accessKeyId, accessKey, securityToken=None, source=None, region='',
+                 is_https=False, internal=False, pool_maxsize=DEFAULT_ASYNC_POOL_MAXSIZE, retry_policy=None,
+                 put_rate_limiter=None, pull_rate_limiter=None):
+        if aiohttp is None:
+            raise ImportError('AsyncLogClient requires aiohttp, please install it: pip install aiohttp')
+
+        # the sync clients are only used to sign the requests and to parse the responses, without keep-alive they
+        # create no session, there is nothing to close
+        self._client = LogClient(endpoint, accessKeyId, accessKey, securityToken, source, region, is_https,
+                                 keep_alive=False, retry_policy=retry_policy, put_rate_limiter=put_rate_limiter,
+                                 pull_rate_limiter=pull_rate_limiter)
+        self._yunapi_client = YunApiLogClient(accessKeyId, accessKey, internal, securityToken, source, region,
+                                              keep_alive=False, retry_policy=self._client.retry_policy)
+        self._region = region
+        self._pool_maxsize = pool_maxsize
+        self._session = None
+
+    def set_user_agent(self, user_agent):
+        """
+        set user agent
+        :type user_agent: string
+        :param user_agent: user agent
+        :return: None
+        """
+        self._client.set_user_agent(user_agent)
+        self._yunapi_client.set_user_agent(user_agent)
+
+    def _getSession(self):
+        # aiohttp binds the session to the running loop, create it on first use
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=0, limit_per_host=self._pool_maxsize)
+            self._session = aiohttp.ClientSession(connector=connector, cookie_jar=aiohttp.DummyCookieJar())
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def _getHttpResponse(self, user_agent, method, url, params, body, headers, timeout):
+        try:
+            headers['User-Agent'] = user_agent
+            async with self._getSession().request(method, url, params=params, data=body, headers=headers,
+                                                  timeout=aiohttp.ClientTimeout(total=timeout)) as r:
+                return r.status, await r.read(), r.headers
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError as ex:
+            raise LogException('Timeout', 'request timeout: ' + repr(ex))
+        except aiohttp.ClientConnectionError as ex:
+            raise LogException('LogConnectionError', str(ex))
+        except Exception as ex:
+            raise LogException('LogRequestError', str(ex))
+
+    @staticmethod
+    def _isRetryable(ex):
+        return LogClient._isRetryable(ex) or ex.get_error_code() == 'LogConnectionError'
+
+    async def _send(self, method, body, resource, params, headers, response_body_type='json', rate_limiter=None):
+        client = self._client
+        url = client.http_type + client._endpoint + resource
+        topic_id = params.get('topic_id')
+        retry = client.retry_policy.new_state(topic_id, 'log-cli-v-' in client._user_agent, rate_limiter is not None)
+        while True:
+            delay = retry.quota_delay()
+            if rate_limiter is not None:
+                delay = max(delay, rate_limiter.acquire(topic_id, len(body)))
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                params2, headers2 = client._signRequest(method, resource, params, headers)
+                (resp_status, resp_body, resp_header) = \
+                    await self._getHttpResponse(client._user_agent, method, url, params2, body, headers2,
+                                                retry.timeout(client.timeout))
+                result = client._handleResponse(resp_status, resp_body, resp_header, response_body_type)
+                retry.on_success()
+                if rate_limiter is not None:
+                    rate_limiter.on_success(topic_id, len(body), len(resp_body))
+                return result
+            except LogException as ex:
+                if rate_limiter is not None and ex.get_error_code() == QUOTA_EXCEED_ERROR_CODE:
+                    rate_limiter.on_quota_exceeded(topic_id)
+                delay = retry.on_error(ex, self._isRetryable(ex))
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    async def _sendYunApi(self, method, resource, params, headers, body='', action='',
+                          response_body_type='json', service='cls'):
+        client = self._yunapi_client
+        url = client.http_type + client._endpoint + resource
+        retry = client.retry_policy.new_state(action, 'log-cli-v-' in client._user_agent)
+        timestamp = int(time.time())
+        while True:
+            delay = retry.quota_delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                params2, headers2 = client._signYunApiRequest(method, resource, params, headers, body, self._region,
+                                                              action, service, timestamp)
+                (resp_status, resp_body, resp_header) = \
+                    await self._getHttpResponse(client._user_agent, method, url, params2, body, headers2,
+                                                retry.timeout(CONNECTION_TIME_OUT_YUNAPI))
+                result = client._handleResponse(resp_status, resp_body, resp_header, response_body_type)
+                retry.on_success()
+                return result
+            except LogException as ex:
+                delay = retry.on_error(ex, self._isRetryable(ex))
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    async def put_log_raw(self, topic_id, log_group):
+        """ Put logs to log service. using raw data in protobuf
+
+        :type topic_id: string
+        :param topic_id: the Project name
+
+        :type log_group: LogGroup
+        :param log_group: log group structure
+
+        :return: PutLogsResponse
+        :raise: LogException
+        """
+        body, resource, params, headers = self._client._putLogRawRequest(topic_id, log_group)
+        (resp, header) = await self._send('POST', body, resource, params, headers, RESPONSE_BODY_TYPE_BINARY,
+                                          rate_limiter=self._client.put_rate_limiter)
+        return PutLogsResponse(header, resp)
+
+    async def pull_logs(self, topic_id, partition_id, size, start_time=0, offset=0, end_time=None):
+        """ batch pull log data from log service, see LogClient.pull_logs
+
+        :return: PullLogResponse
+
+        :raise: LogException
+        """
+        body_str, resource, params, headers = self._client._pullLogsRequest(topic_id, partition_id, size,
+                                                                            start_time, offset, end_time)
+        (resp, header) = await self._send("POST", body_str, resource, params, headers, RESPONSE_BODY_TYPE_BINARY,
+                                          rate_limiter=self._client.pull_rate_limiter)
+        return PullLogResponse(resp, header)
+
+    async def update_offsets(self, logset_id, consumer_group, consumer='', offsets=None):
+        """ Update check point, see YunApiLogClient.update_offsets
+
+        :return: ConsumerGroupUpdateOffsetsResponse
+        """
+        request = ConsumerGroupUpdateOffsetsRequest(logset_id, consumer_group, consumer, offsets)
+        (resp, header) = await self._sendYunApi("POST", '/', {}, self._yunapi_client._yunApiHeaders(),
+                                                request.get_request_body(), 'CommitConsumerOffsets')
+        return ConsumerGroupUpdateOffsetsResponse(header, resp)
+
+    async def get_offsets(self, logset_id, consumer_group, topic_id, partition_id=-1, position="end"):
+        """ Get offsets, see YunApiLogClient.get_offsets
+
+        :return: ConsumerGroupGetOffsetsResponse
+        """
+        request = ConsumerGroupGetOffsetsRequest(logset_id, consumer_group, topic_id, partition_id, position)
+        (resp, header) = await self._sendYunApi("POST", '/', {}, self._yunapi_client._yunApiHeaders(),
+                                                request.get_request_body(), 'DescribeConsumerOffsets')
+        return ConsumerGroupGetOffsetsResponse(resp, header, topic_id, partition_id)
+
+    async def heart_beat(self, logset_id, consumer_group, consumer='', partitions=None):
+        """ Send consumer heart beat, see YunApiLogClient.heart_beat
+
+        :return: ConsumerGroupHeartBeatResponse
+        """
+        if partitions is None:
+            partitions = []
+        request = ConsumerGroupHeartBeatRequest(logset_id, consumer_group, consumer, partitions)
+        (resp, header) = await self._sendYunApi("POST", '/', {}, self._yunapi_client._yunApiHeaders(),
+                                                request.get_request_body(), 'SendConsumerHeartbeat')
+        return ConsumerGroupHeartBeatResponse(resp, header)
@@ -7,16 +7,94 @@
 import hashlib
 import hmac
 import sys
+import threading
 import time
+from collections import OrderedDict
 from datetime import datetime
 
 from six.moves.urllib.parse import quote_plus
 
+DEFAULT_SIGNATURE_CACHE_SIZE = 1024
+DEFAULT_SIGNING_KEY_CACHE_SIZE = 64
+
+
+class _BoundedCache(object):
+    """ thread safe LRU dict, max_size 0 disables it """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                # refresh LRU position
+                del self._data[key]
+                self._data[key] = value
+            return value
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_signature_cache = _BoundedCache(DEFAULT_SIGNATURE_CACHE_SIZE)
+_signing_key_cache = _BoundedCache(DEFAULT_SIGNING_KEY_CACHE_SIZE)
+
+
+def configure_sign_cache(signature_cache_size=DEFAULT_SIGNATURE_CACHE_SIZE,
+                         signing_key_cache_size=DEFAULT_SIGNING_KEY_CACHE_SIZE):
+    """ resize the signing caches, 0 disables a cache
+
+    :type signature_cache_size: int
+    :param signature_cache_size: max CLS signatures reused within their validity window
+
+    :type signing_key_cache_size: int
+    :param signing_key_cache_size: max TC3 derived keys, one per (secret, date, service)
+    """
+    _signature_cache.max_size = signature_cache_size
+    _signature_cache.clear()
+    _signing_key_cache.max_size = signing_key_cache_size
+    _signing_key_cache.clear()
+
 
 def signature(access_key_id, access_key_secret, method='GET', path='/', params={}, headers={}, expire=120):
     filters_headers = dict((k, headers[k].encode('utf-8'))
                            for k in headers if k.lower() in ['content-type', 'content-md5', 'host'])
 
+    # the signature only covers the fields below, reuse it during the first half of its validity
+    # window so a request or its retries never carry a signature about to expire
+    now = int(time.time())
+    try:
+        cache_key = (access_key_id, access_key_secret, method, path, expire,
+                     tuple(sorted(params.items())), tuple(sorted(filters_headers.items())))
+        cached = _signature_cache.get(cache_key)
+    except TypeError:  # unhashable param values
+        cache_key, cached = None, None
+    if cached is not None and 0 <= now - cached[0] < expire // 2:
+        return cached[1]
+
+    sign = _signature(access_key_id, access_key_secret, method, path, params, filters_headers, expire, now)
+    if cache_key is not None:
+        _signature_cache.put(cache_key, (now, sign))
+    return sign
+
+
+def _signature(access_key_id, access_key_secret, method, path, params, filters_headers, expire, start_sign_time):
     format_str = u"{method}\n{path}\n{params}\n{headers}\n".format(
         method=method.lower(),
         path=path,
@@ -25,7 +103,6 @@ def signature(access_key_id, access_key_secret, method='GET', path='/', params={
             map(lambda tupl: "%s=%s" % (tupl[0].lower(), quote_plus(tupl[1])), sorted(filters_headers.items())))
     )
 
-    start_sign_time = int(time.time())
     sign_time = "{bg_time};{ed_time}".format(bg_time=start_sign_time - 60, ed_time=start_sign_time + expire)
     sha1 = hashlib.sha1()
     sha1.update(format_str.encode('utf-8'))
@@ -102,6 +179,10 @@ def sign_tc3(secret_key, date, service, str2sign):
         k_signing = _hmac_sha256(k_service.digest(), 'tc3_request')
         return k_signing.digest()
 
-    signing_key = _get_signature_key(secret_key, date, service)
+    cache_key = (secret_key, date, service)
+    signing_key = _signing_key_cache.get(cache_key)
+    if signing_key is None:
+        signing_key = _get_signature_key(secret_key, date, service)
+        _signing_key_cache.put(cache_key, signing_key)
     signature = _hmac_sha256(signing_key, str2sign).hexdigest()
     return signature
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) Tencent Cloud Computing
+# All rights reserved.
+
+from array import array
+from collections import OrderedDict
+
+import six
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+TIME_COLUMN = u'__timestamp__'
+FILENAME_COLUMN = u'__filename__'
+SOURCE_COLUMN = u'__source__'
+TAG_COLUMN_PREFIX = u'__tag__:'
+
+
+def _pad(column, size):
+    if len(column) < size:
+        column.extend([None] * (size - len(column)))
+
+
+def log_groups_to_columns(log_groups, keys=None):
+    """ Turn log groups into columns, the columnar counterpart of PullLogResponse.log_groups_to_flattern_list,
+    no dict is allocated per log.
+
+    :type log_groups: list<LogGroup>
+    :param log_groups: log groups to export
+
+    :type keys: list
+    :param keys: content keys to export, default None exports all the keys in order of appearance
+
+    :return: OrderedDict, column name -> column. "__timestamp__" is an int64 array, "__filename__",
+        "__source__", "__tag__:<key>" and one column per content key hold the string values, None when a log
+        has no such key. Columns are numpy arrays when numpy is installed, else lists, and array('q') for the
+        times on python 3.
+    """
+    # python 2 arrays have no 64 bits typecode
+    times = array('q') if six.PY3 else []
+    filenames = []
+    sources = []
+    tags = OrderedDict()
+    contents = OrderedDict()
+    fixed_keys = keys is not None
+    if fixed_keys:
+        for key in keys:
+            contents[key] = []
+
+    row = 0
+    for log_group in log_groups:
+        count = len(log_group.logs)
+        if count == 0:
+            continue
+
+        filenames.extend([log_group.filename] * count)
+        sources.extend([log_group.source] * count)
+        for tag in log_group.logTags:
+            name = TAG_COLUMN_PREFIX + tag.key
+            column = tags.get(name)
+            if column is None:
+                column = tags[name] = []
+            _pad(column, row)
+            del column[row:]  # the last duplicated tag wins, like the flatten list
+            column.extend([tag.value] * count)
+
+        for log in log_group.logs:
+            times.append(log.time)
+            for content in log.contents:
+                column = contents.get(content.key)
+                if column is None:
+                    if fixed_keys:
+                        continue
+                    column = contents[content.key] = []
+                if len(column) > row:
+                    column[row] = content.value  # duplicated key in one log, the last one wins
+                else:
+                    _pad(column, row)
+                    column.append(content.value)
+            row += 1
+
+    columns = OrderedDict()
+    columns[TIME_COLUMN] = numpy.array(times, dtype=numpy.int64) if numpy is not None else times
+    for name, column in [(FILENAME_COLUMN, filenames), (SOURCE_COLUMN, sources)] + \
+            list(tags.items()) + list(contents.items()):
+        _pad(column, row)
+        columns[name] = _to_string_column(column)
+    return columns
+
+
+def _to_string_column(column):
+    if numpy is None:
+        return column
+    result = numpy.empty(len(column), dtype=object)
+    result[:] = column
+    return result
+
+
+def columns_to_record_batch(columns):
+    """ Turn the columns of log_groups_to_columns into a pyarrow RecordBatch, requires pyarrow
+
+    :type columns: OrderedDict
+    :param columns: the result of log_groups_to_columns
+
+    :return: pyarrow.RecordBatch
+    """
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError('pyarrow is required to export log groups as RecordBatch, please install it: '
+                          'pip install pyarrow')
+
+    arrays = []
+    for name, column in columns.items():
+        if name == TIME_COLUMN:
+            arrays.append(pyarrow.array(column, type=pyarrow.int64()))
+        else:
+            arrays.append(pyarrow.array(column, type=pyarrow.string()))
+    return pyarrow.RecordBatch.from_arrays(arrays, names=list(columns.keys()))
+
+
+def log_groups_to_record_batch(log_groups, keys=None):
+    """ Turn log groups into a pyarrow RecordBatch, see log_groups_to_columns, requires pyarrow
+
+    :return: pyarrow.RecordBatch
+    """
+    return columns_to_record_batch(log_groups_to_columns(log_groups, keys))
@@ -1,3 +1,4 @@
 from tencentcloud.log.consumer.config import *
+from tencentcloud.log.consumer.fetch_throttle import *
 from tencentcloud.log.consumer.tasks import *
 from tencentcloud.log.consumer.worker import *
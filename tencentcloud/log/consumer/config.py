@@ -2,6 +2,8 @@
 
 from enum import Enum
 
+from tencentcloud.log.consumer.fetch_throttle import AdaptiveFetchThrottle
+
 
 class TimePosition(Enum):
     BEGIN = 'begin'
@@ -21,7 +23,9 @@ class LogHubConfig(object):
                  consumer_group_name, consumer_name, internal=False,
                  heartbeat_interval=None, data_fetch_interval=None, offset_position=None,
                  offset_start_time=None, max_fetch_log_group_size=None, worker_pool_size=None,
-                 shared_executor=None, offset_end_time=None):
+                 shared_executor=None, offset_end_time=None, http_pool_size=None, decode_executor=None,
+                 decode_chunk_size=None, decode_output=None, prefetch_depth=None, prefetch_max_bytes=None,
+                 fetch_throttle=None, offset_commit_interval=None, offset_commit_batch_size=None):
         """
         :param endpoint:
         :param access_key_id:
@@ -32,13 +36,22 @@ class LogHubConfig(object):
         :param internal: request go through the intranet or the internet.
         :param consumer_name: suggest use format "{consumer_group_name}-{current_process_id}", give it different consumer name when you need to run this program in parallel
         :param heartbeat_interval: default 20, once a client doesn't report to server * heartbeat_interval * 2 interval, server will consider it's offline and re-assign its task to another consumer. thus  don't set the heatbeat interval too small when the network badwidth or performance of consumtion is not so good.
-        :param data_fetch_interval: default 2, don't configure it too small (<1s)
+        :param data_fetch_interval: default 2, interval to check the held partitions and to retry a failed initialization of a partition. completed pulls and processing are handled at once, the pulls are paced by fetch_throttle. don't configure it too small (<1s)
         :param offset_start_time: offset start time, could be "begin", "end", "str(unix timestamp)".
         :param max_fetch_log_group_size: default 1048576, fetch size in each request, normally use default. maximum is 10485760, could be lower. the lower the size the memory efficiency might be better.
         :param worker_pool_size: default 2. suggest keep the default size (2), use multiple process instead, when you need to have more concurrent processing, launch this consumer for mulitple times and give them different consuer name in same consumer group. will be ignored when shared_executor is passed.
         :param shared_executor: shared executor, if not None, worker_pool_size will be ignored.
         :param offset_end_time: offset end time, default is None (never stop processing), could be "str(unix timestamp)".
         :param region: region of topic_id.
+        :param http_pool_size: default 10, max keep-alive connections per host shared by the pull and consumer group requests, suggest not less than worker_pool_size + 1 (heart beat).
+        :param decode_executor: default None, executor decoding the pulled messages, e.g. a ProcessPoolExecutor shared by the workers, so decoding scales with cores. None decodes in the fetching thread.
+        :param decode_chunk_size: default 8, messages (log groups) per decode task submitted to decode_executor.
+        :param decode_output: default "log_group", processors receive LogGroups. "columns" makes processors receive a list of columns (see tencentcloud.log.columnar.log_groups_to_columns), one per decode chunk, built by decode_executor, which avoids parsing the LogGroups again in this process, or one built in the fetching thread without decode_executor. "records" makes processors receive LogGroupRecords (see tencentcloud.log.wire.LogGroupDecoder), light records of (time, keys, values) decoded without protobuf objects, with or without decode_executor.
+        :param prefetch_depth: default 1, max fetched batches queued per partition while the processor is busy, a pull is in flight besides them. larger depth overlaps pulling and processing on backlogged partitions.
+        :param prefetch_max_bytes: default 67108864 (64MB), max bytes of the fetched messages queued per partition, at least one batch is queued whatever its size.
+        :param fetch_throttle: default AdaptiveFetchThrottle, class (or factory) of the FetchThrottle pacing the pulls, called once per partition, e.g. functools.partial(AdaptiveFetchThrottle, max_interval=10), or StepFetchThrottle for the fixed pacing of the former versions.
+        :param offset_commit_interval: default 3, the offsets saved by the processors are committed in the background every offset_commit_interval seconds, in one request for all the partitions of the worker. the offset of a partition being shutdown (revoked or worker stopping) is committed at once.
+        :param offset_commit_batch_size: default 100, commit before offset_commit_interval once so many partitions have offsets to commit.
         """
         self.endpoint = endpoint
         self.access_key_id = access_key_id
@@ -58,3 +71,12 @@ class LogHubConfig(object):
         self.consumer_group_time_out = self.heartbeat_interval * 2
         self.offset_end_time = offset_end_time or None  # default to None
         self.region = region
+        self.http_pool_size = http_pool_size or 10
+        self.decode_executor = decode_executor
+        self.decode_chunk_size = decode_chunk_size or 8
+        self.decode_output = decode_output or 'log_group'
+        self.prefetch_depth = prefetch_depth or 1
+        self.prefetch_max_bytes = prefetch_max_bytes or 64 * 1024 * 1024
+        self.fetch_throttle = fetch_throttle or AdaptiveFetchThrottle
+        self.offset_commit_interval = offset_commit_interval or 3
+        self.offset_commit_batch_size = offset_commit_batch_size or 100
@@ -1,6 +1,7 @@
 # -×- coding: utf-8 -*-
 
 import logging
+import threading
 
 from tencentcloud.log.consumer.exceptions import ClientWorkerException
 from tencentcloud.log.consumer.exceptions import OffsetException
@@ -21,13 +22,16 @@ class ConsumerClientLoggerAdapter(logging.LoggerAdapter):
 class ConsumerClient(object):
     def __init__(self, endpoint, access_key_id, access_key, logset_id,
                  topic_ids, consumer_group, consumer, internal, region, security_token=None,
-                 source=None):
+                 source=None, http_pool_size=None):
 
-        from tencentcloud.log.logclient import LogClient, YunApiLogClient
+        from tencentcloud.log.logclient import LogClient, YunApiLogClient, make_session, DEFAULT_POOL_MAXSIZE
 
-        self.client = LogClient(endpoint, access_key_id, access_key, security_token, source, region)
+        # pull_logs and consumer group calls go to different hosts, one pool per host
+        self.session = make_session(pool_connections=2, pool_maxsize=http_pool_size or DEFAULT_POOL_MAXSIZE)
+        self.client = LogClient(endpoint, access_key_id, access_key, security_token, source, region,
+                                session=self.session)
         self.yunapi_client = YunApiLogClient(access_key_id, access_key, internal, security_token,
-                                             source, region)
+                                             source, region, session=self.session)
         self.region = region
         self.client.set_user_agent('%s-consumer' % USER_AGENT)
         self.yunapi_client.set_user_agent('%s-consumer' % USER_AGENT)
@@ -85,7 +89,7 @@ class ConsumerClient(object):
                                           self.consumer, offsets)
 
     def get_offsets(self, topic_id='', partition_id=-1, position="end"):
-        offsets = self.yunapi_client.get_offsets(self.logset_id, self.consumer_group, topic_id, self.region,
+        offsets = self.yunapi_client.get_offsets(self.logset_id, self.consumer_group, topic_id,
                                                  partition_id, position).get_consumer_group_offsets()
 
         if offsets is None or len(offsets) == 0:
@@ -100,8 +104,48 @@ class ConsumerClient(object):
         return self.yunapi_client.get_offsets(self.logset_id, self.consumer_group, topic_id, partition_id,
                                               position).get_consumer_group_partition_offsets()
 
+    def get_topic_offsets(self, topic_id, position="end"):
+        """
+        offsets of all the partitions of a topic in one call
+        :return: dict, partition id -> offset
+        """
+        offsets = self.get_offsets(topic_id, -1, position)
+        return dict((offset["PartitionId"], offset["Offset"]) for offset in offsets.get(topic_id) or [])
+
     def pull_logs(self, topic_id, partition_id, size, start_time=0, offset=0, end_time=None):
         return self.client.pull_logs(topic_id, partition_id, size, start_time, offset, end_time)
 
     def delete_consumer_group(self):
         return self.yunapi_client.delete_consumer_group(self.logset_id, self.consumer_group)
+
+    def close(self):
+        self.session.close()
+
+
+class TopicOffsetsSnapshot(object):
+    """ Offsets of all the partitions of a topic, got in one DescribeConsumerOffsets call on the first use, and
+    shared by the initialization of the partitions assigned together. A partition missing from the snapshot, or
+    all of them if the call fails, get their own offset as before.
+    """
+
+    def __init__(self, consumer_client, topic_id, position="end"):
+        self.consumer_client = consumer_client
+        self.topic_id = topic_id
+        self.position = position
+        self.lock = threading.Lock()
+        self.offsets = None
+
+    def get_partition_offsets(self, partition_id):
+        with self.lock:
+            if self.offsets is None:
+                try:
+                    self.offsets = self.consumer_client.get_topic_offsets(self.topic_id, self.position)
+                except Exception as e:
+                    self.consumer_client.logger.warning(
+                        "fail to get the offsets of topic %s, get them by partition: %s", self.topic_id, e)
+                    self.offsets = {}
+
+        offset = self.offsets.get(partition_id)
+        if offset is None:
+            return self.consumer_client.get_partition_offsets(self.topic_id, partition_id, self.position)
+        return offset
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+from tencentcloud.log.logexception import LogException
+from tencentcloud.log.retry import QUOTA_EXCEED_ERROR_CODE
+
+
+class FetchThrottle(object):
+    """ Pacing of the pulls of one partition, a partition consumer creates its own instance from
+    LogHubConfig.fetch_throttle and asks it how long to wait before pulling again.
+    """
+
+    def on_fetch(self, log_group_count, fetched_bytes, offset_moved):
+        """
+        :param log_group_count: log groups got by the last pull
+        :param fetched_bytes: bytes of the messages got by the last pull
+        :param offset_moved: if the next offset moved forward
+        :return: seconds to wait before the next pull
+        """
+        raise NotImplementedError('not create method on_fetch')
+
+    def on_error(self, exception):
+        """
+        :param exception: the exception of the failed pull, None if unknown
+        :return: seconds to wait before the next pull
+        """
+        raise NotImplementedError('not create method on_error')
+
+
+class AdaptiveFetchThrottle(FetchThrottle):
+    """ Pulls backlogged partitions back to back, slows down when pulls get fewer data, and backs off
+    exponentially on idle partitions and errors (quota exceeded included) up to max_interval.
+
+    :type base_interval: float
+    :param base_interval: default 0.5, pause after a pull which is almost empty, and first pause of the backoff
+
+    :type max_interval: float
+    :param max_interval: default 5, max pause of the backoff
+
+    :type backlog_log_group_count: int
+    :param backlog_log_group_count: default 1000, a pull getting so many log groups means a backlog
+
+    :type backlog_bytes: int
+    :param backlog_bytes: default 524288, a pull getting so many bytes means a backlog, None to ignore the size
+
+    :type backoff_factor: float
+    :param backoff_factor: default 2, growth of the pause on consecutive idle pulls or errors
+    """
+
+    def __init__(self, base_interval=0.5, max_interval=5, backlog_log_group_count=1000, backlog_bytes=524288,
+                 backoff_factor=2):
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.backlog_log_group_count = backlog_log_group_count
+        self.backlog_bytes = backlog_bytes
+        self.backoff_factor = backoff_factor
+        self.interval = 0
+        self.backoff_interval = 0
+
+    def on_fetch(self, log_group_count, fetched_bytes, offset_moved):
+        if log_group_count == 0 or not offset_moved:
+            return self._backoff()
+
+        self.backoff_interval = 0
+        fill = float(log_group_count) / self.backlog_log_group_count
+        if self.backlog_bytes:
+            fill = max(fill, float(fetched_bytes) / self.backlog_bytes)
+        # 0 on a backlog, close to base_interval when the pull got few data
+        self.interval = self.base_interval * max(0.0, 1 - fill)
+        return self.interval
+
+    def on_error(self, exception):
+        if isinstance(exception, LogException) and exception.get_error_code() == QUOTA_EXCEED_ERROR_CODE:
+            # the server is throttling this topic, skip the shortest pauses
+            self.backoff_interval = max(self.backoff_interval, self.base_interval)
+        return self._backoff()
+
+    def _backoff(self):
+        if self.backoff_interval == 0:
+            self.backoff_interval = self.base_interval
+        else:
+            self.backoff_interval = min(self.max_interval, self.backoff_interval * self.backoff_factor)
+        self.interval = self.backoff_interval
+        return self.interval
+
+
+class StepFetchThrottle(FetchThrottle):
+    """ The fixed pacing of the former versions: wait 0.5s after a pull getting less than 100 log groups,
+    0.2s under 500, 0.05s under 1000, no wait otherwise.
+
+    :type error_interval: float
+    :param error_interval: default 2, pause after a failed pull
+    """
+
+    def __init__(self, error_interval=2):
+        self.error_interval = error_interval
+
+    def on_fetch(self, log_group_count, fetched_bytes, offset_moved):
+        if log_group_count < 100:
+            return 0.5
+        elif log_group_count < 500:
+            return 0.2
+        elif log_group_count < 1000:
+            return 0.05
+        return 0
+
+    def on_error(self, exception):
+        return self.error_interval
@@ -2,11 +2,26 @@
 
 
 class FetchedLogGroup(object):
+    """ Immutable batch of fetched log groups, handed over from the fetch task to the process task
+    without copying, the fetching side drops its reference once the batch is submitted.
+    """
 
-    def __init__(self, partition_id, log_groups, end_offset):
-        self._partition_id = partition_id
-        self._fetched_log_groups = log_groups
-        self._end_offset = end_offset
+    __slots__ = ('_partition_id', '_fetched_log_groups', '_end_offset', '_log_group_count', '_fetched_bytes')
+
+    def __init__(self, partition_id, log_groups, end_offset, log_group_count=None, fetched_bytes=0):
+        object.__setattr__(self, '_partition_id', partition_id)
+        object.__setattr__(self, '_fetched_log_groups', log_groups)
+        object.__setattr__(self, '_end_offset', end_offset)
+        object.__setattr__(self, '_log_group_count',
+                           len(log_groups) if log_group_count is None else log_group_count)
+        object.__setattr__(self, '_fetched_bytes', fetched_bytes)
+
+    def __setattr__(self, *_):
+        raise AttributeError("Cannot modify attributes of FetchedLogGroup")
+
+    def __reduce__(self):
+        return FetchedLogGroup, (self._partition_id, self._fetched_log_groups, self._end_offset,
+                                 self._log_group_count, self._fetched_bytes)
 
     @property
     def partition_id(self):
@@ -22,4 +37,8 @@ class FetchedLogGroup(object):
 
     @property
     def log_group_size(self):
-        return len(self._fetched_log_groups)
+        return self._log_group_count
+
+    @property
+    def fetched_bytes(self):
+        return self._fetched_bytes
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from threading import Thread
+
+from tencentcloud.log.logexception import LogException
+
+
+class OffsetCommitterLoggerAdapter(logging.LoggerAdapter):
+    def process(self, msg, kwargs):
+        offset_committer = self.extra['offset_committer']  # type: ConsumerOffsetCommitter
+        _id = '/'.join([
+            offset_committer.log_client.logset_id, str(offset_committer.log_client.topic_ids),
+            offset_committer.log_client.consumer_group,
+            offset_committer.log_client.consumer
+        ])
+        return "[{0}] {1}".format(_id, msg), kwargs
+
+
+class ConsumerOffsetCommitter(Thread):
+    """ Commits the offsets saved by the offset trackers of a consumer worker in the background, the offsets
+    of all the partitions changed since the last commit are sent in one CommitConsumerOffsets request,
+    every commit_interval seconds or once commit_batch_size partitions are waiting.
+    """
+
+    def __init__(self, log_client, commit_interval=3, commit_batch_size=100):
+        super(ConsumerOffsetCommitter, self).__init__()
+        self.log_client = log_client
+        self.commit_interval = commit_interval
+        self.commit_batch_size = commit_batch_size
+        self.shut_down_flag = False
+        self.lock = threading.Lock()
+        # one commit at a time, a commit of the worker waits for the one in flight which may carry its offsets
+        self.commit_lock = threading.Lock()
+        self.dirty_trackers = OrderedDict()
+        self.commit_event = threading.Event()
+        self.logger = OffsetCommitterLoggerAdapter(
+            logging.getLogger(__name__), {"offset_committer": self})
+
+    def mark_dirty(self, tracker):
+        """
+        queue the saved offset of tracker for the next commit
+        :param tracker: ConsumerOffsetTracker
+        :return:
+        """
+        with self.lock:
+            self.dirty_trackers[(tracker.topic_id, tracker.partition_id)] = tracker
+            if len(self.dirty_trackers) >= self.commit_batch_size:
+                self.commit_event.set()
+
+    def run(self):
+        self.logger.info('offset committer start')
+        while not self.shut_down_flag:
+            last_commit_time = time.time()
+            self.commit()
+
+            time_to_wait = self.commit_interval - (time.time() - last_commit_time)
+            if time_to_wait > 0 and not self.shut_down_flag:
+                self.commit_event.wait(time_to_wait)
+            self.commit_event.clear()
+
+        # commit what is left by the shutdown of the partition consumers
+        self.commit()
+        self.logger.info('offset committer exit')
+
+    def commit(self):
+        """
+        commit the queued offsets in one request, they are queued again if the request fails
+        :return: bool, if the offsets are committed
+        """
+        with self.commit_lock:
+            return self._commit()
+
+    def _commit(self):
+        with self.lock:
+            trackers = list(self.dirty_trackers.values())
+            self.dirty_trackers.clear()
+
+        pending = []
+        topic_partition_offsets = OrderedDict()
+        for tracker in trackers:
+            with tracker.lock:
+                offset = tracker.temp_offset
+                last_persistent_offset = tracker.last_persistent_offset
+                if offset == '' or offset == last_persistent_offset:
+                    continue
+            pending.append((tracker, offset, last_persistent_offset))
+            topic_partition_offsets.setdefault(tracker.topic_id, []).append(
+                {"PartitionId": tracker.partition_id, "Offset": offset})
+
+        if not pending:
+            return True
+
+        offsets = [{'TopicID': topic_id, 'PartitionOffsets': partition_offsets}
+                   for topic_id, partition_offsets in topic_partition_offsets.items()]
+        try:
+            self.log_client.update_offsets(offsets)
+        except LogException as e:
+            self.logger.warning("fail to commit offsets of %d partitions, retry later: %s", len(pending), e)
+            for tracker, _, _ in pending:
+                self.mark_dirty(tracker)
+            return False
+
+        for tracker, offset, last_persistent_offset in pending:
+            with tracker.lock:
+                # unless the tracker committed by itself meanwhile
+                if tracker.last_persistent_offset == last_persistent_offset:
+                    tracker.last_persistent_offset = offset
+        self.logger.debug('offsets committed: %s', offsets)
+        return True
+
+    def shutdown(self):
+        self.logger.info('try to stop offset committer')
+        self.shut_down_flag = True
+        self.commit_event.set()
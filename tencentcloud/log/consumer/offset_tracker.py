@@ -8,7 +8,7 @@ from tencentcloud.log.logexception import LogException
 
 
 class ConsumerOffsetTracker(object):
-    def __init__(self, loghub_client_adapter, consumer_name, topic_id, partition_id):
+    def __init__(self, loghub_client_adapter, consumer_name, topic_id, partition_id, offset_committer=None):
         self.consumer_group_client = loghub_client_adapter
         self.consumer_name = consumer_name
         self.topic_id = topic_id
@@ -19,6 +19,7 @@ class ConsumerOffsetTracker(object):
         self.last_persistent_offset = ''
         self.default_flush_offset_interval = 60
         self.lock = RLock()
+        self.offset_committer = offset_committer
 
     def set_offset(self, offset):
         self.offset = offset
@@ -41,6 +42,15 @@ class ConsumerOffsetTracker(object):
         self.last_persistent_offset = offset
 
     def flush_offset(self, force=False):
+        """
+        persist the saved offset, queued to the offset committer if any
+        :param force: send the offset even if it's not changed, at once
+        :return:
+        """
+        if self.offset_committer is not None and not force:
+            self.offset_committer.mark_dirty(self)
+            return
+
         with self.lock:
             if (self.temp_offset != '' and self.temp_offset != self.last_persistent_offset) or force:
                 try:
@@ -1,16 +1,18 @@
 # -*- coding: utf-8 -*-
 
-import copy
 import logging
 import time
+from collections import deque
 
 from tencentcloud.log.consumer.config import ConsumerStatus
 from tencentcloud.log.consumer.exceptions import ClientWorkerException
+from tencentcloud.log.consumer.fetch_throttle import AdaptiveFetchThrottle
 from tencentcloud.log.consumer.fetched_log_group import FetchedLogGroup
 from tencentcloud.log.consumer.offset_tracker import ConsumerOffsetTracker
 from tencentcloud.log.consumer.tasks import ProcessTaskResult, InitTaskResult, FetchTaskResult, TaskResult
 from tencentcloud.log.consumer.tasks import consumer_fetch_task, consumer_initialize_task, \
     consumer_process_task, consumer_shutdown_task
+from tencentcloud.log.pulllog_response import DEFAULT_DECODE_CHUNK_SIZE, DECODE_OUTPUT_LOG_GROUP
 
 
 class PartitionConsumerWorkerLoggerAdapter(logging.LoggerAdapter):
@@ -27,7 +29,10 @@ class PartitionConsumerWorkerLoggerAdapter(logging.LoggerAdapter):
 
 class PartitionConsumerWorker(object):
     def __init__(self, log_client, topic_id, partition_id, consumer_name, processor, offset_start_time,
-                 max_fetch_log_group_size=1000, executor=None, offset_end_time=None):
+                 max_fetch_log_group_size=1000, executor=None, offset_end_time=None, decode_executor=None,
+                 decode_chunk_size=DEFAULT_DECODE_CHUNK_SIZE, decode_output=DECODE_OUTPUT_LOG_GROUP,
+                 prefetch_depth=1, prefetch_max_bytes=None, wakeup=None, fetch_throttle=None,
+                 error_retry_interval=2, offset_committer=None, offsets_snapshot=None):
         self.topic_id = topic_id
         self.log_client = log_client
         self.partition_id = partition_id
@@ -36,9 +41,21 @@ class PartitionConsumerWorker(object):
         self.offset_end_time = offset_end_time or None
         self.processor = processor
         self.offset_tracker = ConsumerOffsetTracker(self.log_client, self.consumer_name, self.topic_id,
-                                                    self.partition_id)
+                                                    self.partition_id, offset_committer=offset_committer)
         self.executor = executor
         self.max_fetch_log_group_size = max_fetch_log_group_size
+        self.decode_executor = decode_executor
+        self.decode_chunk_size = decode_chunk_size
+        self.decode_output = decode_output
+        self.prefetch_depth = max(1, prefetch_depth)
+        self.prefetch_max_bytes = prefetch_max_bytes
+        # called with this worker when one of its tasks is done, so the scheduler calls consume() again
+        self.wakeup = wakeup
+        self.fetch_throttle = fetch_throttle if fetch_throttle is not None else AdaptiveFetchThrottle()
+        self.error_retry_interval = error_retry_interval
+        self.offsets_snapshot = offsets_snapshot
+        # when > 0, consume() has nothing to do before this time unless a task completes
+        self.next_wakeup_time = 0
 
         self.consumer_status = ConsumerStatus.INITIALIZING
         self.current_task_exist = False
@@ -48,10 +65,14 @@ class PartitionConsumerWorker(object):
         self.next_fetch_offset = ''
 
         self.shutdown = False
-        self.last_fetch_log_group = None
+        # fetched but not yet processed batches, in offset order, each fetch starts from the previous next_offset
+        self.prefetched_log_groups = deque()
+        self.prefetched_bytes = 0
 
         self.last_log_error_time = 0
         self.last_fetch_time = 0
+        self.next_fetch_time = 0
+        self.last_task_fail_time = 0
         self.last_fetch_count = 0
         self.last_success_fetch_time = 0
         self.last_success_fetch_time_with_data = 0
@@ -64,9 +85,39 @@ class PartitionConsumerWorker(object):
 
     def consume(self):
         self.logger.debug('consumer start consuming')
+        self.next_wakeup_time = 0
         self.check_and_generate_next_task()
-        if self.consumer_status == ConsumerStatus.PROCESSING and self.last_fetch_log_group is None:
+        if self.consumer_status == ConsumerStatus.PROCESSING and self.can_prefetch():
             self.fetch_data()
+            # hand the batch just fetched to the processor at once when it is idle
+            if self.task_future is None and self.prefetched_log_groups:
+                self.check_and_generate_next_task()
+
+    def _submit(self, fn, *args, **kwargs):
+        future = self.executor.submit(fn, *args, **kwargs)
+        if self.wakeup is not None:
+            future.add_done_callback(self._on_task_done)
+        return future
+
+    def _on_task_done(self, future):
+        if not future.cancelled():
+            self.wakeup(self)
+
+    def _schedule_wakeup(self, wakeup_time):
+        if self.next_wakeup_time == 0 or wakeup_time < self.next_wakeup_time:
+            self.next_wakeup_time = wakeup_time
+
+    def can_prefetch(self):
+        """
+        if another batch could be queued, at most prefetch_depth batches and prefetch_max_bytes are queued,
+        a single batch is always allowed whatever its size
+        :return: bool
+        """
+        if not self.prefetched_log_groups:
+            return True
+        if len(self.prefetched_log_groups) >= self.prefetch_depth:
+            return False
+        return self.prefetch_max_bytes is None or self.prefetched_bytes < self.prefetch_max_bytes
 
     @staticmethod
     # get future (if failed return None)
@@ -91,11 +142,15 @@ class PartitionConsumerWorker(object):
 
                 self.last_success_fetch_time = time.time()
 
-                self.last_fetch_log_group = FetchedLogGroup(self.partition_id, task_result.get_fetched_log_group_list(),
-                                                            task_result.get_offset())
+                fetched_log_group = FetchedLogGroup(self.partition_id, task_result.get_fetched_log_group_list(),
+                                                    task_result.get_offset(), task_result.get_log_group_count(),
+                                                    task_result.get_fetched_bytes())
+                self.prefetched_log_groups.append(fetched_log_group)
+                self.prefetched_bytes += fetched_log_group.fetched_bytes
+                offset_moved = task_result.get_offset() != self.next_fetch_offset
                 self.next_fetch_offset = task_result.get_offset()
                 self.fetch_reach_end = task_result.get_reach_end()
-                self.last_fetch_count = self.last_fetch_log_group.log_group_size
+                self.last_fetch_count = fetched_log_group.log_group_size
                 if self.last_fetch_count > 0:
                     self.last_success_fetch_time_with_data = time.time()
                     self.save_last_offset = False
@@ -105,32 +160,32 @@ class PartitionConsumerWorker(object):
                         self.offset_tracker.flush_offset()
                         self.save_last_offset = True
 
+                # throttling control
+                self.next_fetch_time = time.time() + self.fetch_throttle.on_fetch(
+                    self.last_fetch_count, fetched_log_group.fetched_bytes, offset_moved)
+
+            elif self.fetch_data_future is not None:
+                # the fetch task failed
+                exception = task_result.get_exception() if task_result is not None else None
+                self.next_fetch_time = time.time() + self.fetch_throttle.on_error(exception)
+
             self._sample_log_error(task_result)
 
             # no task or task is done, create new task
-            if task_result is None or task_result.get_exception() is None:
-                # flag to indicate if it's done
-                is_generate_fetch_task = True
-
-                # throttling control
-                if self.last_fetch_count < 100:
-                    is_generate_fetch_task = (time.time() - self.last_fetch_time) > 0.5
-                elif self.last_fetch_count < 500:
-                    is_generate_fetch_task = (time.time() - self.last_fetch_time) > 0.2
-                elif self.last_fetch_count < 1000:
-                    is_generate_fetch_task = (time.time() - self.last_fetch_time) > 0.05
-
-                if is_generate_fetch_task and not self.fetch_reach_end:
-                    self.last_fetch_time = time.time()
-                    self.fetch_data_future = \
-                        self.executor.submit(consumer_fetch_task,
-                                             self.log_client, self.topic_id, self.partition_id, self.next_fetch_offset,
-                                             max_fetch_log_group_size=self.max_fetch_log_group_size,
-                                             end_time=self.offset_end_time)
-                else:
-                    self.fetch_data_future = None
+            if time.time() >= self.next_fetch_time and not self.fetch_reach_end:
+                self.last_fetch_time = time.time()
+                self.fetch_data_future = \
+                    self._submit(consumer_fetch_task,
+                                 self.log_client, self.topic_id, self.partition_id, self.next_fetch_offset,
+                                 max_fetch_log_group_size=self.max_fetch_log_group_size,
+                                 end_time=self.offset_end_time,
+                                 decode_executor=self.decode_executor,
+                                 decode_chunk_size=self.decode_chunk_size,
+                                 decode_output=self.decode_output)
             else:
                 self.fetch_data_future = None
+                if not self.fetch_reach_end:
+                    self._schedule_wakeup(self.next_fetch_time)
 
     def check_and_generate_next_task(self):
         """
@@ -142,6 +197,8 @@ class PartitionConsumerWorker(object):
             task_success = False
 
             task_result = self.get_task_result(self.task_future)
+            if self.task_future is not None and (task_result is None or task_result.get_exception() is not None):
+                self.last_task_fail_time = time.time()
             self.task_future = None
 
             if task_result is not None and task_result.get_exception() is None:
@@ -157,6 +214,7 @@ class PartitionConsumerWorker(object):
                     self.offset_tracker.set_memory_offset(self.next_fetch_offset)
                     if init_result.is_offset_persistent():
                         self.offset_tracker.set_persistent_offset(self.next_fetch_offset)
+                    self.offsets_snapshot = None
 
                 elif isinstance(task_result, ProcessTaskResult):
                     # maintain check points
@@ -168,7 +226,7 @@ class PartitionConsumerWorker(object):
 
                     roll_back_offset = process_task_result.get_rollback_offset()
                     if roll_back_offset:
-                        self.last_fetch_log_group = None
+                        self.clear_prefetched()
                         self.logger.info("user defined to roll-back check-point, cancel current fetching task")
                         self.cancel_current_fetch()
                         self.next_fetch_offset = roll_back_offset
@@ -187,30 +245,38 @@ class PartitionConsumerWorker(object):
         :return:
         """
         if self.consumer_status == ConsumerStatus.INITIALIZING:
+            # don't retry a failed initialization at once
+            retry_time = self.last_task_fail_time + self.error_retry_interval
+            if time.time() < retry_time:
+                self._schedule_wakeup(retry_time)
+                return
+
             self.current_task_exist = True
-            self.task_future = self.executor.submit(consumer_initialize_task, self.processor, self.log_client,
-                                                    self.topic_id, self.partition_id,
-                                                    self.offset_start_time, self.offset_end_time)
+            self.task_future = self._submit(consumer_initialize_task, self.processor, self.log_client,
+                                            self.topic_id, self.partition_id,
+                                            self.offset_start_time, self.offset_end_time,
+                                            offsets_snapshot=self.offsets_snapshot)
 
         elif self.consumer_status == ConsumerStatus.PROCESSING:
-            if self.last_fetch_log_group is not None:
-                self.offset_tracker.set_offset(self.last_fetch_log_group.end_offset)
-                self.current_task_exist = True
+            if self.prefetched_log_groups:
+                # hand the oldest batch over to the process task, nothing else keeps a reference to it
+                fetched_log_group = self.prefetched_log_groups.popleft()
+                self.prefetched_bytes -= fetched_log_group.fetched_bytes
 
-                # must deep copy cause some revision will happen
-                last_fetch_log_group = copy.deepcopy(self.last_fetch_log_group)
-                self.last_fetch_log_group = None
+                self.offset_tracker.set_offset(fetched_log_group.end_offset)
+                self.current_task_exist = True
 
-                if self.last_fetch_count > 0:
-                    self.task_future = self.executor.submit(consumer_process_task, self.processor,
-                                                            last_fetch_log_group.fetched_log_groups,
-                                                            self.offset_tracker)
+                if fetched_log_group.log_group_size > 0:
+                    self.task_future = self._submit(consumer_process_task, self.processor,
+                                                    fetched_log_group.fetched_log_groups,
+                                                    self.offset_tracker)
 
         elif self.consumer_status == ConsumerStatus.SHUTTING_DOWN:
             self.current_task_exist = True
             self.logger.info("start to cancel fetch job")
             self.cancel_current_fetch()
-            self.task_future = self.executor.submit(consumer_shutdown_task, self.processor, self.offset_tracker)
+            self.clear_prefetched()
+            self.task_future = self._submit(consumer_shutdown_task, self.processor, self.offset_tracker)
 
     def cancel_current_fetch(self):
         if self.fetch_data_future is not None:
@@ -218,6 +284,10 @@ class PartitionConsumerWorker(object):
             self.logger.info('Cancel a fetch task, partition id: {0}:{1}'.format(self.topic_id, self.partition_id))
             self.fetch_data_future = None
 
+    def clear_prefetched(self):
+        self.prefetched_log_groups.clear()
+        self.prefetched_bytes = 0
+
     def _sample_log_error(self, result):
         # record the time when error happens
         if not isinstance(result, TaskResult):
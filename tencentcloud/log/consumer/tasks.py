@@ -8,6 +8,8 @@ import time
 import six
 
 from tencentcloud.log.logexception import LogException
+from tencentcloud.log.pulllog_response import DEFAULT_DECODE_CHUNK_SIZE, DECODE_OUTPUT_COLUMNS, \
+    DECODE_OUTPUT_LOG_GROUP, DECODE_OUTPUT_RECORDS
 
 logger = logging.getLogger(__name__)
 
@@ -112,11 +114,13 @@ class InitTaskResult(TaskResult):
 
 
 class FetchTaskResult(TaskResult):
-    def __init__(self, fetched_log_groups, offset, reach_end=False):
+    def __init__(self, fetched_log_groups, offset, reach_end=False, log_group_count=None, fetched_bytes=0):
         super(FetchTaskResult, self).__init__(None)
         self.fetched_log_groups = fetched_log_groups
         self.offset = offset
         self.reach_end = reach_end
+        self.log_group_count = len(fetched_log_groups) if log_group_count is None else log_group_count
+        self.fetched_bytes = fetched_bytes
 
     def get_fetched_log_group_list(self):
         return self.fetched_log_groups
@@ -127,6 +131,12 @@ class FetchTaskResult(TaskResult):
     def get_reach_end(self):
         return self.reach_end
 
+    def get_log_group_count(self):
+        return self.log_group_count
+
+    def get_fetched_bytes(self):
+        return self.fetched_bytes
+
 
 def consumer_process_task(processor, log_groups, offset_tracker):
     """
@@ -146,7 +156,7 @@ def consumer_process_task(processor, log_groups, offset_tracker):
 
 
 def consumer_initialize_task(processor, consumer_client, topic_id, partition_id, offset_start_time,
-                             offset_end_time=None):
+                             offset_end_time=None, offsets_snapshot=None):
     """
     return TaskResult if failed, or else, return InitTaskResult
     :param processor:
@@ -155,12 +165,17 @@ def consumer_initialize_task(processor, consumer_client, topic_id, partition_id,
     :param partition_id:
     :param offset_start_time:
     :param offset_end_time:
+    :param offsets_snapshot: TopicOffsetsSnapshot shared by the partitions assigned together, None to get the
+        offset of this partition alone
     :return:
     """
     try:
         processor.initialize(topic_id)
         is_offset_persistent = False
-        c_offset = consumer_client.get_partition_offsets(topic_id, partition_id, offset_start_time)
+        if offsets_snapshot is not None:
+            c_offset = offsets_snapshot.get_partition_offsets(partition_id)
+        else:
+            c_offset = consumer_client.get_partition_offsets(topic_id, partition_id, offset_start_time)
         offset = -1
         if c_offset > 0:
             is_offset_persistent = True
@@ -172,24 +187,38 @@ def consumer_initialize_task(processor, consumer_client, topic_id, partition_id,
 
 
 def consumer_fetch_task(loghub_client_adapter, topic_id, partition_id, offset, max_fetch_log_group_size=1000,
-                        end_time=None):
+                        end_time=None, decode_executor=None, decode_chunk_size=DEFAULT_DECODE_CHUNK_SIZE,
+                        decode_output=DECODE_OUTPUT_LOG_GROUP):
     exception = None
 
     for retry_times in range(3):
         try:
             response = loghub_client_adapter.pull_logs(topic_id, partition_id,
                                                        max_fetch_log_group_size, offset=offset, end_time=end_time)
-            fetch_log_groups = response.get_log_groups()
+            log_group_count = response.get_log_group_count()
+            fetched_bytes = response.get_message_bytes()
+            if decode_executor is not None and log_group_count > 0:
+                fetch_log_groups = response.decode_with_executor(decode_executor, decode_chunk_size, decode_output)
+            elif decode_output == DECODE_OUTPUT_RECORDS:
+                fetch_log_groups = response.get_log_records()
+            elif decode_output == DECODE_OUTPUT_COLUMNS:
+                # one chunk of columns, as decode_with_executor returns them
+                fetch_log_groups = [response.to_columns()] if log_group_count > 0 else []
+            else:
+                fetch_log_groups = response.get_log_groups()
             next_offset = response.get_next_offset()
-            logger.debug("topic id = %s partition id = %s offset = %s next offset = %s size: %d",
+            logger.debug("topic id = %s partition id = %s offset = %s next offset = %s log groups: %d",
                          topic_id, partition_id, offset, next_offset,
-                         response.get_log_count())
+                         response.get_log_group_count())
             if not next_offset:
-                return FetchTaskResult(fetch_log_groups, offset)
+                return FetchTaskResult(fetch_log_groups, offset, log_group_count=log_group_count,
+                                       fetched_bytes=fetched_bytes)
             if next_offset == PULL_NO_LOG:
-                return FetchTaskResult(fetch_log_groups, offset, reach_end=True)
+                return FetchTaskResult(fetch_log_groups, offset, reach_end=True, log_group_count=log_group_count,
+                                       fetched_bytes=fetched_bytes)
             else:
-                return FetchTaskResult(fetch_log_groups, next_offset)
+                return FetchTaskResult(fetch_log_groups, next_offset, log_group_count=log_group_count,
+                                       fetched_bytes=fetched_bytes)
         except LogException as e:
             exception = e
         except Exception as e1:
@@ -199,7 +228,7 @@ def consumer_fetch_task(loghub_client_adapter, topic_id, partition_id, offset, m
         if retry_times == 0 and isinstance(exception, LogException) \
                 and 'invalidoffset' in exception.get_error_code().lower():
             try:
-                offset = loghub_client_adapter.get_offsets(topic_id, partition_id, "end")
+                offset = loghub_client_adapter.get_partition_offsets(topic_id, partition_id, "end")
             except Exception:
                 return TaskResult(exception)
         else:
@@ -222,7 +251,8 @@ def consumer_shutdown_task(processor, offset_tracker):
         exception = None
 
     try:
-        offset_tracker.get_offset()
+        # with an offset committer, the worker commits the offsets of the shutdown partitions before releasing them
+        offset_tracker.flush_offset()
     except Exception:
         logger.error('Failed to flush check point', exc_info=True)
 
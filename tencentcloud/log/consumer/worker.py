@@ -1,13 +1,18 @@
 # -*- coding: utf-8 -*-
 
 
+import heapq
+import itertools
 import logging
 import time
 from concurrent.futures import ThreadPoolExecutor
 from threading import Thread
 
-from tencentcloud.log.consumer.consumer_client import ConsumerClient
+from six.moves import queue
+
+from tencentcloud.log.consumer.consumer_client import ConsumerClient, TopicOffsetsSnapshot
 from tencentcloud.log.consumer.heart_beat import ConsumerHeatBeat
+from tencentcloud.log.consumer.offset_committer import ConsumerOffsetCommitter
 from tencentcloud.log.consumer.partition_worker import PartitionConsumerWorker
 
 
@@ -33,11 +38,17 @@ class ConsumerWorker(Thread):
         self.consumer_client = \
             ConsumerClient(consumer_option.endpoint, consumer_option.access_key_id, consumer_option.access_key,
                            consumer_option.logset_id, consumer_option.topic_ids, consumer_option.consumer_group_name,
-                           consumer_option.consumer_name, consumer_option.internal, consumer_option.region)
+                           consumer_option.consumer_name, consumer_option.internal, consumer_option.region,
+                           http_pool_size=consumer_option.http_pool_size)
         self.shut_down_flag = False
         self.logger = ConsumerWorkerLoggerAdapter(
             logging.getLogger(__name__), {"consumer_worker": self})
         self.partition_consumers = {}
+        # partition consumers with a completed task, pushed by the executor threads
+        self.ready_partition_consumers = queue.Queue()
+        # heap of (wakeup time, sequence, partition consumer) for the throttled and retrying partitions
+        self.wakeup_timers = []
+        self.wakeup_sequence = itertools.count()
 
         self.last_owned_consumer_finish_time = 0
 
@@ -45,6 +56,8 @@ class ConsumerWorker(Thread):
         self.heart_beat = ConsumerHeatBeat(self.consumer_client, consumer_option.topic_ids,
                                            consumer_option.heartbeat_interval,
                                            consumer_option.consumer_group_time_out)
+        self.offset_committer = ConsumerOffsetCommitter(self.consumer_client, consumer_option.offset_commit_interval,
+                                                        consumer_option.offset_commit_batch_size)
 
         if consumer_option.partition_executor is not None:
             self.own_executor = False
@@ -84,40 +97,23 @@ class ConsumerWorker(Thread):
     def run(self):
         self.logger.info('consumer worker "{0}" start '.format(self.option.consumer_name))
         self.heart_beat.start()
+        self.offset_committer.start()
 
+        # partition consumers are driven by their task completions and timers, the held partitions are only
+        # checked every data_fetch_interval
+        next_assignment_time = 0
         while not self.shut_down_flag:
-            held_partitions = self.heart_beat.get_held_partitions()
-
-            last_fetch_time = time.time()
-            for partitions in held_partitions:
-                partition_ids = partitions['Partitions']
-                topic_id = partitions['TopicID']
-                if self.shut_down_flag:
-                    break
-
-                for partition_id in partition_ids:
-                    partition_consumer = self.get_partition_consumer(topic_id, partition_id)
-                    if partition_consumer is None:  # error when init consumer. shutdown directly
-                        self.shutdown()
-                        break
-
-                    partition_consumer.consume()
-
-            self.clean_partition_consumer(held_partitions)
-
-            if self._need_stop():
-                self.logger.info(
-                    "all owned partitions complete the tasks, owned partitions: {0}".format(self.partition_consumers))
-                self.shutdown()
+            if time.time() >= next_assignment_time:
+                self.update_partition_consumers()
+                next_assignment_time = time.time() + self.option.data_fetch_interval
+                continue
 
-            time_to_sleep = self.option.data_fetch_interval - (time.time() - last_fetch_time)
-            while time_to_sleep > 0 and not self.shut_down_flag:
-                time.sleep(min(time_to_sleep, 1))
-                time_to_sleep = self.option.data_fetch_interval - (time.time() - last_fetch_time)
+            self.run_ready_partition_consumers(next_assignment_time)
 
         # # stopping worker, need to cleanup all existing partition consumer
         self.logger.info('consumer worker "{0}" try to cleanup consumers'.format(self.option.consumer_name))
         self.shutdown_and_wait()
+        self.offset_committer.shutdown()
 
         if self.own_executor:
             self.logger.info('consumer worker "{0}" try to shutdown executors'.format(self.option.consumer_name))
@@ -126,6 +122,88 @@ class ConsumerWorker(Thread):
         else:
             self.logger.info('executor is shared, consumer worker "{0}" stopped'.format(self.option.consumer_name))
 
+        self.heart_beat.join()
+        self.offset_committer.join()
+        self.consumer_client.close()
+
+    def update_partition_consumers(self):
+        """
+        create the consumers of the newly held partitions, and shutdown the ones not held any more
+        :return:
+        """
+        held_partitions = self.heart_beat.get_held_partitions()
+
+        for partitions in held_partitions:
+            partition_ids = partitions['Partitions']
+            topic_id = partitions['TopicID']
+            if self.shut_down_flag:
+                break
+
+            # the partitions newly assigned get their offsets from one call
+            offsets_snapshot = TopicOffsetsSnapshot(self.consumer_client, topic_id, self.option.offset_start_time)
+            for partition_id in partition_ids:
+                if '{}:{}'.format(topic_id, partition_id) in self.partition_consumers:
+                    continue
+
+                partition_consumer = self.get_partition_consumer(topic_id, partition_id, offsets_snapshot)
+                if partition_consumer is None:  # error when init consumer. shutdown directly
+                    self.shutdown()
+                    break
+
+                self.consume_partition(partition_consumer)
+
+        self.clean_partition_consumer(held_partitions)
+
+        if self._need_stop():
+            self.logger.info(
+                "all owned partitions complete the tasks, owned partitions: {0}".format(self.partition_consumers))
+            self.shutdown()
+
+    def run_ready_partition_consumers(self, until):
+        """
+        wait for a partition consumer with a completed task or a due timer, no later than until, and consume the
+        ready ones
+        :param until: unix time to return at the latest
+        :return:
+        """
+        timeout = until - time.time()
+        if self.wakeup_timers:
+            timeout = min(timeout, self.wakeup_timers[0][0] - time.time())
+
+        ready = []
+        try:
+            # wake up at least every second to check the shutdown flag
+            ready.append(self.ready_partition_consumers.get(timeout=min(max(timeout, 0), 1)))
+            while True:
+                ready.append(self.ready_partition_consumers.get_nowait())
+        except queue.Empty:
+            pass
+
+        now = time.time()
+        while self.wakeup_timers and self.wakeup_timers[0][0] <= now:
+            partition_consumer = heapq.heappop(self.wakeup_timers)[2]
+            # a timer is stale if the partition consumer has been consumed since it was set
+            if 0 < partition_consumer.next_wakeup_time <= now:
+                ready.append(partition_consumer)
+
+        consumed = set()
+        for partition_consumer in ready:
+            if partition_consumer is None or partition_consumer in consumed:
+                continue
+            consumed.add(partition_consumer)
+            self.consume_partition(partition_consumer)
+
+    def consume_partition(self, partition_consumer):
+        key = '{}:{}'.format(partition_consumer.topic_id, partition_consumer.partition_id)
+        if self.partition_consumers.get(key) is not partition_consumer or self.shut_down_flag:
+            return
+
+        last_wakeup_time = partition_consumer.next_wakeup_time
+        partition_consumer.consume()
+        wakeup_time = partition_consumer.next_wakeup_time
+        if wakeup_time > 0 and wakeup_time != last_wakeup_time:
+            heapq.heappush(self.wakeup_timers, (wakeup_time, next(self.wakeup_sequence), partition_consumer))
+
     def start(self, join=False):
         """
         when calling with join=True, must call it in main thread, or else, the Keyboard Interrupt won't be caputured.
@@ -147,14 +225,16 @@ class ConsumerWorker(Thread):
     def shutdown_and_wait(self):
         while True:
             time.sleep(0.5)
-            for topic_partition, consumer in self.partition_consumers.items():
-                if not consumer.is_shutdown():
-                    consumer.shut_down()
-                    break  # there's live consumer, no need to check, loop to next
-            else:
+            # shutdown all the live consumers together, so their offsets are committed in few requests
+            live_consumers = [consumer for consumer in self.partition_consumers.values() if not consumer.is_shutdown()]
+            if not live_consumers:
                 break  # all are shutdown, exit look
 
+            for consumer in live_consumers:
+                consumer.shut_down()
+
         self.partition_consumers.clear()
+        self.wakeup_timers = []
 
     def clean_partition_consumer(self, owned_partitions):
         remove_partitions = []
@@ -166,11 +246,15 @@ class ConsumerWorker(Thread):
                 consumer.shut_down()
                 self.logger.info('Complete call shut down for unassigned consumer partition: ' + str(topic_partition))
             if consumer.is_shutdown():
-                self.logger.info('Remove an unassigned consumer partition:' + str(topic_partition))
-                self.heart_beat.remove_heart_partition(topic_id, int(partition_id))
                 remove_partitions.append(topic_partition)
 
+        if remove_partitions and not self.offset_committer.commit():
+            self.logger.warning('Fail to commit the offsets of the removed partitions: ' + str(remove_partitions))
+
         for topic_partition in remove_partitions:
+            topic_id, partition_id = topic_partition.split(':')
+            self.logger.info('Remove an unassigned consumer partition:' + str(topic_partition))
+            self.heart_beat.remove_heart_partition(topic_id, int(partition_id))
             self.partition_consumers.pop(topic_partition)
 
     @staticmethod
@@ -185,10 +269,11 @@ class ConsumerWorker(Thread):
 
     def shutdown(self):
         self.shut_down_flag = True
+        self.ready_partition_consumers.put(None)
         self.heart_beat.shutdown()
         self.logger.info('get stop signal, start to stop consumer worker "{0}"'.format(self.option.consumer_name))
 
-    def get_partition_consumer(self, topic_id, partition_id):
+    def get_partition_consumer(self, topic_id, partition_id, offsets_snapshot=None):
         key = '{}:{}'.format(topic_id, partition_id)
         consumer = self.partition_consumers.get(key, None)
         if consumer is not None:
@@ -205,6 +290,16 @@ class ConsumerWorker(Thread):
                                            processer, self.option.offset_start_time,
                                            max_fetch_log_group_size=self.option.max_fetch_log_group_size,
                                            executor=self._executor,
-                                           offset_end_time=self.option.offset_end_time)
+                                           offset_end_time=self.option.offset_end_time,
+                                           decode_executor=self.option.decode_executor,
+                                           decode_chunk_size=self.option.decode_chunk_size,
+                                           decode_output=self.option.decode_output,
+                                           prefetch_depth=self.option.prefetch_depth,
+                                           prefetch_max_bytes=self.option.prefetch_max_bytes,
+                                           wakeup=self.ready_partition_consumers.put,
+                                           fetch_throttle=self.option.fetch_throttle(),
+                                           error_retry_interval=self.option.data_fetch_interval,
+                                           offset_committer=self.offset_committer,
+                                           offsets_snapshot=offsets_snapshot)
         self.partition_consumers[key] = consumer
         return consumer
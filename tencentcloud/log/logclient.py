@@ -5,17 +5,19 @@ import logging
 import struct
 import time
 from copy import copy
-from itertools import cycle
 
 import requests
 import six
+from requests.adapters import HTTPAdapter
+from six.moves import http_cookiejar
 
 from tencentcloud.log.auth import signature, signatureWithYunApiV3
 from tencentcloud.log.consumer_group_request import *
 from tencentcloud.log.consumer_group_response import *
 from tencentcloud.log.logexception import LogException
-from tencentcloud.log.pulllog_response import PullLogResponse
+from tencentcloud.log.pulllog_response import PullLogResponse, PullLogStreamResponse
 from tencentcloud.log.putlogsresponse import PutLogsResponse
+from tencentcloud.log.retry import QUOTA_EXCEED_ERROR_CODE, RetryPolicy
 from tencentcloud.log.util import Util
 from tencentcloud.log.version import API_VERSION, USER_AGENT
 
@@ -52,6 +54,35 @@ API_VERSION = '2020-10-16'
 CLS_YUNAPI_ENDPOINT = 'cls.tencentcloudapi.com'
 CLS_YUNAPI_ENDPOINT_TEMP = 'cls.%s.tencentcloudapi.com'
 CLS_YUNAPI_INTERNAL_ENDPOINT = 'cls.internal.tencentcloudapi.com'
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+STREAM_CHUNK_SIZE = 65536
+
+
+def make_session(pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE, pool_block=False):
+    """ Create a keep-alive HTTP session with a connection pool, it could be shared by several clients
+    and threads.
+
+    :type pool_connections: int
+    :param pool_connections: number of per-host connection pools to cache
+
+    :type pool_maxsize: int
+    :param pool_maxsize: max connections kept alive for each host
+
+    :type pool_block: bool
+    :param pool_block: wait for a free connection when the pool of a host is exhausted, instead of
+        opening an extra connection which is discarded after use
+
+    :return: requests.Session
+    """
+    session = requests.Session()
+    # responses never carry state, don't let threads share a mutable cookie jar
+    session.cookies.set_policy(http_cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0,
+                          pool_block=pool_block)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
 
 
 class LogClient(object):
@@ -62,12 +93,31 @@ class LogClient(object):
     :param accessKeyId: tencent cloud accessKeyId
     :type accessKey: string
     :param accessKey: tencent cloud accessKey
+    :type pool_connections: int
+    :param pool_connections: number of per-host connection pools, ignored when session is passed
+    :type pool_maxsize: int
+    :param pool_maxsize: max keep-alive connections for each host, ignored when session is passed
+    :type pool_block: bool
+    :param pool_block: block when all connections of a host are in use, ignored when session is passed
+    :type keep_alive: bool
+    :param keep_alive: reuse connections between requests, default True, False opens a new connection for
+        each request, outside any pooled session, the client then creates no session of its own
+    :type session: requests.Session
+    :param session: shared session created by make_session, the client won't close it
+    :type retry_policy: RetryPolicy
+    :param retry_policy: backoff, budget and deadline of the retries, default RetryPolicy()
+    :type put_rate_limiter: TopicRateLimiter
+    :param put_rate_limiter: rate limit of put_log_raw and put_log_lz4 per topic, default None
+    :type pull_rate_limiter: TopicRateLimiter
+    :param pull_rate_limiter: rate limit of pull_logs and pull_logs_stream per topic, default None
     """
 
     __version__ = API_VERSION
     Version = __version__
 
-    def __init__(self, endpoint, accessKeyId, accessKey, securityToken=None, source=None, region='', is_https=False):
+    def __init__(self, endpoint, accessKeyId, accessKey, securityToken=None, source=None, region='', is_https=False,
+                 pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE, pool_block=False,
+                 keep_alive=True, session=None, retry_policy=None, put_rate_limiter=None, pull_rate_limiter=None):
         self._isRowIp = Util.is_row_ip(endpoint)
         self._setendpoint(endpoint, is_https)
         self._accessKeyId = accessKeyId
@@ -80,6 +130,53 @@ class LogClient(object):
         self._securityToken = securityToken
         self._user_agent = USER_AGENT
         self._region = region
+        self._keep_alive = keep_alive
+        self._retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.put_rate_limiter = put_rate_limiter
+        self.pull_rate_limiter = pull_rate_limiter
+        self._pool_args = (pool_connections, pool_maxsize, pool_block)
+        if session is None and keep_alive:
+            self._own_session = True
+            self._session = make_session(pool_connections, pool_maxsize, pool_block)
+        elif session is None:
+            # the requests without keep-alive are not sent through a session
+            self._own_session = False
+            self._session = None
+        else:
+            self._own_session = False
+            self._session = session
+
+    @property
+    def session(self):
+        return self._session
+
+    def close(self):
+        """
+        release the pooled connections, a shared session is left open for its owner
+        :return: None
+        """
+        if self._own_session:
+            self._session.close()
+
+    def reset_session(self):
+        """
+        use a new session of its own, e.g. in a forked process, whose inherited connections are shared with the
+        parent process. the former session is dropped without closing its connections. a client without keep-alive
+        has no session to reset.
+        :return: None
+        """
+        if not self._keep_alive:
+            return
+        self._own_session = True
+        self._session = make_session(*self._pool_args)
+
+    @property
+    def retry_policy(self):
+        return self._retry_policy
+
+    @retry_policy.setter
+    def retry_policy(self, value):
+        self._retry_policy = value
 
     @property
     def timeout(self):
@@ -128,7 +225,7 @@ class LogClient(object):
         if not resp_body:
             return None
         try:
-            if isinstance(resp_body, six.binary_type):
+            if isinstance(resp_body, (six.binary_type, bytearray)):
                 return json.loads(resp_body.decode('utf8', "ignore"))
 
             return json.loads(resp_body)
@@ -153,17 +250,39 @@ class LogClient(object):
                                resp_status, resp_header, resp_body)
 
     def _getHttpResponse(self, method, url, params, body, headers,
-                         timeout=CONNECTION_TIME_OUT):  # ensure method, url, body is str
+                         timeout=CONNECTION_TIME_OUT, stream=False):  # ensure method, url, body is str
         try:
             headers['User-Agent'] = self._user_agent
-            r = getattr(requests, method.lower())(url, params=params, data=body, headers=headers, timeout=timeout)
-            return r.status_code, r.content, r.headers
+            if self._keep_alive:
+                session = self._session
+            else:
+                # requests.request sends through a session of its own, closed with its connection afterwards
+                headers['Connection'] = 'close'
+                session = requests
+            if not stream:
+                r = session.request(method, url, params=params, data=body, headers=headers, timeout=timeout)
+                return r.status_code, r.content, r.headers
+
+            # read the body chunk by chunk into one buffer, instead of joining all the chunks like r.content
+            r = session.request(method, url, params=params, data=body, headers=headers, timeout=timeout,
+                                stream=True)
+            try:
+                content = bytearray()
+                for chunk in r.iter_content(STREAM_CHUNK_SIZE):
+                    content += chunk
+                return r.status_code, content, r.headers
+            finally:
+                r.close()
         except Exception as ex:
             raise LogException('LogRequestError', str(ex))
 
-    def _sendRequest(self, method, url, params, body, headers, response_body_type='json', timeout=CONNECTION_TIME_OUT):
+    def _sendRequest(self, method, url, params, body, headers, response_body_type='json', timeout=CONNECTION_TIME_OUT,
+                     stream=False):
         (resp_status, resp_body, resp_header) = self._getHttpResponse(method, url, params, body, headers,
-                                                                      timeout=timeout)
+                                                                      timeout=timeout, stream=stream)
+        return self._handleResponse(resp_status, resp_body, resp_header, response_body_type)
+
+    def _handleResponse(self, resp_status, resp_body, resp_header, response_body_type='json'):
         header = {}
         for key, value in resp_header.items():
             header[key] = value
@@ -184,30 +303,97 @@ class LogClient(object):
 
         LogClient._error(exJson, resp_status, resp_header, resp_body, requestId)
 
-    def _send(self, method, body, resource, params, headers, response_body_type='json'):
+    @staticmethod
+    def _responseSize(result):
+        (resp, header) = result
+        # a streamed body is read into a bytearray by _getHttpResponse
+        if isinstance(resp, (six.binary_type, bytearray)):
+            return len(resp)
+        return int(Util.h_v_td(header, 'Content-Length', 0) or 0)
+
+    @staticmethod
+    def _isRetryable(ex):
+        return ex.get_error_code() in ('InternalError', 'Timeout', 'SpeedQuotaExceed') or ex.resp_status >= 500 \
+            or (ex.get_error_code() == 'LogRequestError'
+                and 'httpconnectionpool' in ex.get_error_message().lower())
+
+    def _signRequest(self, method, resource, params, headers):
+        headers2 = copy(headers)
+        params2 = copy(params)
+        if self._securityToken:
+            headers2["X-Cls-Token"] = self._securityToken
+
+        authorization = signature(self._accessKeyId, self._accessKey, method, resource, params2,
+                                  headers2, 300)
+        headers2["Authorization"] = authorization
+        return params2, headers2
+
+    def _send(self, method, body, resource, params, headers, response_body_type='json', stream=False,
+              rate_limiter=None):
         url = self.http_type + self._endpoint + resource
-        retry_times = range(10) if 'log-cli-v-' not in self._user_agent else cycle(range(10))
-        last_err = None
-        for _ in retry_times:
+        topic_id = params.get('topic_id')
+        # log cli keeps retrying until the deadline or the budget runs out
+        retry = self._retry_policy.new_state(topic_id, 'log-cli-v-' in self._user_agent,
+                                             rate_limiter is not None)
+        while True:
+            delay = retry.quota_delay()
+            if rate_limiter is not None:
+                delay = max(delay, rate_limiter.acquire(topic_id, len(body)))
+            if delay > 0:
+                time.sleep(delay)
             try:
-                headers2 = copy(headers)
-                params2 = copy(params)
-                if self._securityToken:
-                    headers2["X-Cls-Token"] = self._securityToken
-
-                authorization = signature(self._accessKeyId, self._accessKey, method, resource, params2,
-                                          headers2, 300)
-                headers2["Authorization"] = authorization
-                return self._sendRequest(method, url, params2, body, headers2, response_body_type)
+                params2, headers2 = self._signRequest(method, resource, params, headers)
+                result = self._sendRequest(method, url, params2, body, headers2, response_body_type,
+                                           timeout=retry.timeout(self._timeout), stream=stream)
+                retry.on_success()
+                if rate_limiter is not None:
+                    rate_limiter.on_success(topic_id, len(body), self._responseSize(result))
+                return result
             except LogException as ex:
-                last_err = ex
-                if ex.get_error_code() in ('InternalError', 'Timeout', 'SpeedQuotaExceed') or ex.resp_status >= 500 \
-                        or (ex.get_error_code() == 'LogRequestError'
-                            and 'httpconnectionpool' in ex.get_error_message().lower()):
-                    time.sleep(1)
-                    continue
-                raise last_err
-        raise last_err
+                if rate_limiter is not None and ex.get_error_code() == QUOTA_EXCEED_ERROR_CODE:
+                    rate_limiter.on_quota_exceeded(topic_id)
+                delay = retry.on_error(ex, self._isRetryable(ex))
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    def _putLogRawRequest(self, topic_id, log_group):
+        body = log_group.SerializeToString()
+        body = lz_compresss(body)
+        return self._putLogLz4Request(topic_id, body)
+
+    def _putLogLz4Request(self, topic_id, body):
+        headers = {
+            'Host': self._logHost,
+            'Content-Type': 'application/x-protobuf',
+            'x-cls-compress-type': 'lz4',
+            'Content-Length': str(len(body))
+        }
+        params = {"topic_id": topic_id}
+        resource = '/structuredlog'
+        return body, resource, params, headers
+
+    def _pullLogsRequest(self, topic_id, partition_id, size, start_time=0, offset=0, end_time=None):
+        body_dict = {
+            'StartOffset': offset,
+            'StartTime': int(start_time),
+            'Size': size,
+            'CompressType': 'snappy',
+            'PartitionId': partition_id
+        }
+        if end_time is not None:
+            body_dict['EndTime'] = int(end_time)
+
+        body_str = six.b(json.dumps(body_dict))
+
+        params = {'topic_id': topic_id}
+        headers = {
+            'Host': self._logHost,
+            'Content-Type': 'application/json',
+        }
+
+        resource = '/pull_log'
+        return body_str, resource, params, headers
 
     def put_log_raw(self, topic_id, log_group):
         """ Put logs to log service. using raw data in protobuf
@@ -222,18 +408,27 @@ class LogClient(object):
         :raise: LogException
         """
 
-        body = log_group.SerializeToString()
-        body = lz_compresss(body)
-        headers = {
-            'Host': self._logHost,
-            'Content-Type': 'application/x-protobuf',
-            'x-cls-compress-type': 'lz4',
-            'Content-Length': str(len(body))
-        }
-        params = {"topic_id": topic_id}
-        resource = '/structuredlog'
+        body, resource, params, headers = self._putLogRawRequest(topic_id, log_group)
+        (resp, header) = self._send('POST', body, resource, params, headers, RESPONSE_BODY_TYPE_BINARY,
+                                    rate_limiter=self.put_rate_limiter)
+        return PutLogsResponse(header, resp)
+
+    def put_log_lz4(self, topic_id, body):
+        """ Put logs already serialized and compressed, as put_log_raw sends them
 
-        (resp, header) = self._send('POST', body, resource, params, headers, RESPONSE_BODY_TYPE_BINARY)
+        :type topic_id: string
+        :param topic_id: topic id
+
+        :type body: bytes
+        :param body: a serialized LogGroupList compressed in lz4 block format, without the size prefix
+
+        :return: PutLogsResponse
+        :raise: LogException
+        """
+
+        body, resource, params, headers = self._putLogLz4Request(topic_id, body)
+        (resp, header) = self._send('POST', body, resource, params, headers, RESPONSE_BODY_TYPE_BINARY,
+                                    rate_limiter=self.put_rate_limiter)
         return PutLogsResponse(header, resp)
 
     def pull_logs(self, topic_id, partition_id, size, start_time=0, offset=0, end_time=None):
@@ -263,72 +458,107 @@ class LogClient(object):
         :raise: LogException
         """
 
-        body_dict = {
-            'StartOffset': offset,
-            'StartTime': int(start_time),
-            'Size': size,
-            'CompressType': 'snappy',
-            'PartitionId': partition_id
-        }
-        if end_time is not None:
-            body_dict['EndTime'] = int(end_time)
+        body_str, resource, params, headers = self._pullLogsRequest(topic_id, partition_id, size, start_time,
+                                                                    offset, end_time)
+        (resp, header) = self._send("POST", body_str, resource, params, headers, RESPONSE_BODY_TYPE_BINARY,
+                                    rate_limiter=self.pull_rate_limiter)
 
-        body_str = six.b(json.dumps(body_dict))
+        return PullLogResponse(resp, header)
 
-        params = {'topic_id': topic_id}
-        headers = {
-            'Host': self._logHost,
-            'Content-Type': 'application/json',
-        }
+    def pull_logs_stream(self, topic_id, partition_id, size, start_time=0, offset=0, end_time=None):
+        """ batch pull log data from log service like pull_logs, but the body is downloaded in chunks into one
+        buffer instead of being joined from the chunks, the buffer is released once decompressed, and the log
+        groups are decoded one by one while iterating the response instead of all at once, which lowers the
+        memory held for big fetch sizes. The whole body is still downloaded before any decoding starts.
+        Unsuccessful operation will cause an LogException.
 
-        resource = '/pull_log'
-        (resp, header) = self._send("POST", body_str, resource, params, headers, RESPONSE_BODY_TYPE_BINARY)
+        :type topic_id: string
+        :param topic_id: topic id
 
-        return PullLogResponse(resp, header)
+        :type partition_id: int
+        :param partition_id: partition id
+
+        :type size: int
+        :param size: the required data flow for pulling log packages
+
+        :type offset: int
+        :param offset: the offset position to get data
+
+        :type start_time: int
+        :param start_time: the start time to get data
+
+        :type end_time: int
+        :param start_time: the end time to get data
+
+        :return: PullLogStreamResponse, iterate it to get the LogGroups
+
+        :raise: LogException
+        """
+
+        body_str, resource, params, headers = self._pullLogsRequest(topic_id, partition_id, size, start_time,
+                                                                    offset, end_time)
+        (resp, header) = self._send("POST", body_str, resource, params, headers, RESPONSE_BODY_TYPE_BINARY,
+                                    stream=True, rate_limiter=self.pull_rate_limiter)
+
+        return PullLogStreamResponse(resp, header)
 
 
 class YunApiLogClient(LogClient):
     def __init__(self, accessKeyId, accessKey, internal=False, securityToken=None, source=None, region='',
-                 is_https=True):
+                 is_https=True, pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 pool_block=False, keep_alive=True, session=None, retry_policy=None):
         yunapi_endpoint = CLS_YUNAPI_ENDPOINT
         if region != '':
             yunapi_endpoint = CLS_YUNAPI_ENDPOINT_TEMP % region
         if internal:
             yunapi_endpoint = CLS_YUNAPI_INTERNAL_ENDPOINT
         super(YunApiLogClient, self).__init__(yunapi_endpoint, accessKeyId, accessKey, securityToken, source, region,
-                                              is_https)
+                                              is_https, pool_connections, pool_maxsize, pool_block, keep_alive,
+                                              session, retry_policy)
+
+    def _signYunApiRequest(self, method, resource, params, headers, body, region, action, service, timestamp):
+        headers2 = copy(headers)
+        params2 = copy(params)
+        headers2['X-TC-Timestamp'] = str(timestamp)
+        headers2['X-TC-Language'] = 'zh-CN'
+        headers2['X-TC-Action'] = action
+        headers2['X-TC-Region'] = region
+        if self._securityToken:
+            headers2["X-Cls-Token"] = self._securityToken
+
+        authorization = signatureWithYunApiV3(self._accessKeyId, self._accessKey, service,
+                                              method, resource, params2, headers2, body)
+        headers2["Authorization"] = authorization
+        return params2, headers2
+
+    def _yunApiHeaders(self):
+        return {
+            'Host': self._logHost,
+            'Content-Type': 'application/json',
+            'X-TC-Version': API_VERSION
+        }
 
     def _send(self, method, resource, params, headers, body='', region='', action='',
               response_body_type='json', service='cls'):
         url = self.http_type + self._endpoint + resource
-        retry_times = range(10) if 'log-cli-v-' not in self._user_agent else cycle(range(10))
-        last_err = None
+        retry = self._retry_policy.new_state(action, 'log-cli-v-' in self._user_agent)
         timestamp = int(time.time())
-        for _ in retry_times:
+        while True:
+            delay = retry.quota_delay()
+            if delay > 0:
+                time.sleep(delay)
             try:
-                headers2 = copy(headers)
-                params2 = copy(params)
-                headers2['X-TC-Timestamp'] = str(timestamp)
-                headers2['X-TC-Language'] = 'zh-CN'
-                headers2['X-TC-Action'] = action
-                headers2['X-TC-Region'] = region
-                if self._securityToken:
-                    headers2["X-Cls-Token"] = self._securityToken
-
-                authorization = signatureWithYunApiV3(self._accessKeyId, self._accessKey, service,
-                                                      method, resource, params2, headers2, body)
-                headers2["Authorization"] = authorization
-                return self._sendRequest(method, url, params2, body, headers2, response_body_type,
-                                         timeout=CONNECTION_TIME_OUT_YUNAPI)
+                params2, headers2 = self._signYunApiRequest(method, resource, params, headers, body, region, action,
+                                                            service, timestamp)
+                result = self._sendRequest(method, url, params2, body, headers2, response_body_type,
+                                           timeout=retry.timeout(CONNECTION_TIME_OUT_YUNAPI))
+                retry.on_success()
+                return result
             except LogException as ex:
-                last_err = ex
-                if ex.get_error_code() in ('InternalError', 'Timeout', 'SpeedQuotaExceed') or ex.resp_status >= 500 \
-                        or (ex.get_error_code() == 'LogRequestError'
-                            and 'httpconnectionpool' in ex.get_error_message().lower()):
-                    time.sleep(1)
-                    continue
-                raise last_err
-        raise last_err
+                delay = retry.on_error(ex, self._isRetryable(ex))
+                if delay is None:
+                    raise
+                time.sleep(delay)
 
     def create_consumer_group(self, logset_id, consumer_group, timeout, topics):
         """ create consumer group
@@ -350,11 +580,7 @@ class YunApiLogClient(LogClient):
         request = CreateConsumerGroupRequest(logset_id, consumer_group, timeout, topics)
         body_str = request.get_request_body()
 
-        headers = {
-            'Host': self._logHost,
-            'Content-Type': 'application/json',
-            'X-TC-Version': API_VERSION
-        }
+        headers = self._yunApiHeaders()
         params = {}
 
         resource = '/'
@@ -397,11 +623,7 @@ class YunApiLogClient(LogClient):
         body_dict['ConsumerGroup'] = consumer_group
         body_str = six.b(json.dumps(body_dict))
 
-        headers = {
-            'Host': self._logHost,
-            'Content-Type': 'application/json',
-            'X-TC-Version': API_VERSION
-        }
+        headers = self._yunApiHeaders()
         params = {}
         resource = '/'
         (resp, header) = self._send('POST', resource, params, headers, body_str, self._region, 'ModifyConsumerGroup')
@@ -425,11 +647,7 @@ class YunApiLogClient(LogClient):
         }
         body_str = six.b(json.dumps(body_dict))
 
-        headers = {
-            'Host': self._logHost,
-            'Content-Type': 'application/json',
-            'X-TC-Version': API_VERSION
-        }
+        headers = self._yunApiHeaders()
 
         params = {}
 
@@ -457,11 +675,7 @@ class YunApiLogClient(LogClient):
 
         resource = '/'
         params = {}
-        headers = {
-            'Host': self._logHost,
-            'Content-Type': 'application/json',
-            'X-TC-Version': API_VERSION
-        }
+        headers = self._yunApiHeaders()
 
         (resp, header) = self._send('POST', resource, params, headers, body_str, self._region, 'DescribeConsumerGroups')
         return ListConsumerGroupResponse(resp, header)
@@ -486,11 +700,7 @@ class YunApiLogClient(LogClient):
         request = ConsumerGroupUpdateOffsetsRequest(logset_id, consumer_group, consumer, offsets)
         body_str = request.get_request_body()
         params = {}
-        headers = {
-            'Host': self._logHost,
-            'Content-Type': 'application/json',
-            'X-TC-Version': API_VERSION
-        }
+        headers = self._yunApiHeaders()
 
         resource = '/'
         (resp, header) = self._send("POST", resource, params, headers, body_str, self._region, 'CommitConsumerOffsets')
@@ -519,11 +729,7 @@ class YunApiLogClient(LogClient):
         request = ConsumerGroupGetOffsetsRequest(logset_id, consumer_group, topic_id, partition_id, position)
         body_str = request.get_request_body()
         params = {}
-        headers = {
-            'Host': self._logHost,
-            'Content-Type': 'application/json',
-            'X-TC-Version': API_VERSION
-        }
+        headers = self._yunApiHeaders()
 
         resource = '/'
         (resp, header) = self._send("POST", resource, params, headers, body_str, self._region,
@@ -552,11 +758,7 @@ class YunApiLogClient(LogClient):
         request = ConsumerGroupHeartBeatRequest(logset_id, consumer_group, consumer, partitions)
         body_str = request.get_request_body()
         params = {}
-        headers = {
-            'Host': self._logHost,
-            'Content-Type': 'application/json',
-            'X-TC-Version': API_VERSION
-        }
+        headers = self._yunApiHeaders()
 
         resource = '/'
         (resp, header) = self._send("POST", resource, params, headers, body_str, self._region, 'SendConsumerHeartbeat')
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) Tencent Cloud Computing
+# All rights reserved.
+
+import atexit
+import logging
+
+import six
+
+from tencentcloud.log.logclient import LogClient
+from tencentcloud.log.producer import BUFFER_FULL_DROP_NEWEST, LogProducer
+from tencentcloud.log.version import LOGGING_HANDLER_USER_AGENT
+
+DEFAULT_MAX_BUFFER_SIZE = 16 * 1024 * 1024
+DEFAULT_LINGER = 1
+DEFAULT_CLOSE_TIMEOUT = 5
+DEFAULT_FIELDS = (('module', 'module'), ('function', 'funcName'), ('line', 'lineno'), ('thread', 'threadName'),
+                  ('process', 'process'))
+# logs of these loggers are not shipped, they may be written while shipping
+DEFAULT_EXCLUDE_LOGGERS = ('tencentcloud.log', 'urllib3', 'requests')
+
+# attributes of every LogRecord, the others come from the extra argument of the logging calls
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+_DEFAULT_FORMATTER = logging.Formatter()
+
+
+class ClsLogHandler(logging.Handler):
+    """ logging.Handler shipping the records to a CLS topic. emit() turns a record into log contents and queues
+    them in a LogProducer without waiting for the network, the producer sends them in batches in background.
+    When the queue is full the records are dropped and counted. The queued records are sent at exit.
+
+        handler = ClsLogHandler('https://ap-guangzhou.cls.tencentcs.com', 'your_access_id', 'your_access_key',
+                                'your_topic_id')
+        logging.getLogger().addHandler(handler)
+        logging.getLogger(__name__).info('user %s logged in', name, extra={'request_id': request_id})
+
+    The contents of a log are "level", "logger", "message", the fields, the extra attributes of the record,
+    and "exception" / "stack" when the record has exc_info / stack_info.
+
+    :type endpoint: string
+    :param endpoint: log service endpoint, ignored if client is passed
+
+    :type access_key_id: string
+    :param access_key_id: tencent cloud access key id, ignored if client is passed
+
+    :type access_key: string
+    :param access_key: tencent cloud access key, ignored if client is passed
+
+    :type topic_id: string
+    :param topic_id: topic id
+
+    :type level: int
+    :param level: level of the handler, default logging.NOTSET
+
+    :type source: string
+    :param source: source of the log groups
+
+    :type filename: string
+    :param filename: filename of the log groups
+
+    :type tags: dict
+    :param tags: tags of the log groups
+
+    :type fields: list
+    :param fields: (content key, LogRecord attribute) of the other contents, default module, function, line,
+        thread and process
+
+    :type exclude_loggers: list
+    :param exclude_loggers: loggers (and their children) whose records are ignored, default the loggers of this
+        sdk and of the http libraries, so shipping never logs to itself
+
+    :type max_buffer_size: int
+    :param max_buffer_size: default 16777216 (16MB), max estimated bytes of the queued records
+
+    :type linger: float
+    :param linger: default 1, max seconds a record waits for its batch
+
+    :type close_timeout: float
+    :param close_timeout: default 5, max seconds to send the queued records on close and at exit
+
+    :type client: LogClient
+    :param client: client sending the records, default a client of endpoint and keys
+    """
+
+    def __init__(self, endpoint, access_key_id, access_key, topic_id, level=logging.NOTSET, source=None,
+                 filename=None, tags=None, fields=DEFAULT_FIELDS, exclude_loggers=DEFAULT_EXCLUDE_LOGGERS,
+                 max_buffer_size=DEFAULT_MAX_BUFFER_SIZE, linger=DEFAULT_LINGER, close_timeout=DEFAULT_CLOSE_TIMEOUT,
+                 client=None):
+        logging.Handler.__init__(self, level)
+        if client is None:
+            client = LogClient(endpoint, access_key_id, access_key)
+            client.set_user_agent(LOGGING_HANDLER_USER_AGENT)
+        self.client = client
+        self.topic_id = topic_id
+        self.tags = tags
+        self.fields = tuple(fields)
+        self.exclude_loggers = tuple(exclude_loggers)
+        self.close_timeout = close_timeout
+        self.producer = LogProducer(client, linger=linger, source=source, filename=filename,
+                                    max_buffer_size=max_buffer_size, buffer_full_policy=BUFFER_FULL_DROP_NEWEST)
+        self._closed = False
+        atexit.register(self.close)
+
+    def emit(self, record):
+        if self._closed or self._excluded(record.name):
+            return
+        try:
+            self.producer.send(self.topic_id, self.record_to_contents(record), tags=self.tags)
+        except Exception:
+            self.handleError(record)
+
+    def record_to_contents(self, record):
+        """ Turn a LogRecord into log contents, called by emit
+
+        :type record: logging.LogRecord
+        :param record: the record
+
+        :return: tuple(key-value) list
+        """
+        if self.formatter is not None:
+            message = self.format(record)
+        else:
+            message = record.getMessage()
+        contents = [('level', record.levelname), ('logger', record.name), ('message', message)]
+        for key, attribute in self.fields:
+            contents.append((key, getattr(record, attribute, None)))
+
+        for key, value in six.iteritems(vars(record)):
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                contents.append((key, value))
+
+        # a formatter puts them in the message
+        if self.formatter is None:
+            if record.exc_info:
+                contents.append(('exception', _DEFAULT_FORMATTER.formatException(record.exc_info)))
+            elif record.exc_text:
+                contents.append(('exception', record.exc_text))
+            if getattr(record, 'stack_info', None):
+                contents.append(('stack', record.stack_info))
+        return [(key, value) for key, value in contents if value is not None]
+
+    def get_dropped_count(self):
+        """ records dropped because the queue was full """
+        return self.producer.get_dropped_count()
+
+    def get_failed_count(self):
+        """ records not sent because the requests failed """
+        return self.producer.get_failed_count()
+
+    def flush(self):
+        """ send the queued records now, wait for them up to close_timeout seconds """
+        if not self._closed:
+            self.producer.flush(self.close_timeout)
+
+    def close(self):
+        """ send the queued records, up to close_timeout seconds, and stop shipping """
+        if not self._closed:
+            self._closed = True
+            self.producer.close(self.close_timeout)
+            if hasattr(atexit, 'unregister'):
+                atexit.unregister(self.close)
+        logging.Handler.close(self)
+
+    def _excluded(self, name):
+        for logger_name in self.exclude_loggers:
+            if name == logger_name or name.startswith(logger_name + '.'):
+                return True
+        return False
@@ -16,13 +16,34 @@ class LogItem(object):
     :param timestamp: time of the log item, the default time is the now time.
 
     :type contents: tuple(key-value) list
-    :param contents: the data of the log item, including many (key,value) pairs.
+    :param contents: the data of the log item, including many (key,value) pairs, deep copied.
+        use LogItem.wrap to keep the list as is.
     """
 
+    __slots__ = ('timestamp', 'contents')
+
     def __init__(self, timestamp=None, contents=None):
         self.timestamp = int(timestamp) if timestamp else int(time.time())
         self.contents = copy.deepcopy(contents) if contents else []
 
+    @classmethod
+    def wrap(cls, timestamp, contents):
+        """ Create a log item holding contents as is, without copying it nor reading the clock, the caller
+        must not modify contents afterwards
+
+        :type timestamp: int
+        :param timestamp: time of the log item, e.g. one time.time() shared by a batch of items
+
+        :type contents: tuple(key-value) list
+        :param contents: the data of the log item
+
+        :return: LogItem
+        """
+        item = cls.__new__(cls)
+        item.timestamp = int(timestamp)
+        item.contents = contents
+        return item
+
     def push_back(self, key, value):
         """ Append a key/value pair as a log content to the log
 
@@ -66,4 +87,101 @@ class LogItem(object):
 
     def log_print(self):
         print('time', self.timestamp)
-        print('contents', self.contents)
\ No newline at end of file
+        print('contents', self.contents)
+
+
+class LogBatchBuilder(object):
+    """ Logs with the same keys appended as rows into shared columns, a time list and one value list per
+    key, and encoded from them without a LogItem or a protobuf object per log.
+
+        builder = LogBatchBuilder(['level', 'message'])
+        builder.add(['INFO', 'hello'])
+        builder.add_dict({'level': 'WARN', 'message': 'world'})
+        body = builder.encode_log_group_list(source='127.0.0.1')
+        client.put_log_lz4(topic_id, lz_compresss(body))
+
+    :type keys: list
+    :param keys: content keys of the logs
+
+    :type timestamp: int
+    :param timestamp: time of the rows added without a time, default the current time when the builder is created
+    """
+
+    def __init__(self, keys, timestamp=None):
+        self.keys = tuple(keys)
+        self.timestamp = int(timestamp) if timestamp else int(time.time())
+        self.times = []
+        self.columns = [[] for _ in self.keys]
+
+    def add(self, values, timestamp=None):
+        """ Append a log
+
+        :type values: list
+        :param values: values in the order of keys, None for a missing content, other values than strings
+            are converted by six.text_type when encoded
+
+        :type timestamp: int
+        :param timestamp: time of the log, default the time of the builder
+        """
+        if len(values) != len(self.keys):
+            raise ValueError('{0} values for {1} keys'.format(len(values), len(self.keys)))
+        self.times.append(self.timestamp if timestamp is None else int(timestamp))
+        for column, value in zip(self.columns, values):
+            column.append(value)
+
+    def add_dict(self, contents, timestamp=None):
+        """ Append a log from a dict, its keys out of the builder keys are ignored
+
+        :type contents: dict
+        :param contents: key -> value
+
+        :type timestamp: int
+        :param timestamp: time of the log, default the time of the builder
+        """
+        self.times.append(self.timestamp if timestamp is None else int(timestamp))
+        for key, column in zip(self.keys, self.columns):
+            column.append(contents.get(key))
+
+    def set_time(self, timestamp):
+        """ Set the time of the rows added from now on without a time
+
+        :type timestamp: int
+        :param timestamp: log time
+        """
+        self.timestamp = int(timestamp)
+
+    def clear(self):
+        """ remove all the rows, the builder could be reused """
+        self.times = []
+        self.columns = [[] for _ in self.keys]
+
+    def __len__(self):
+        return len(self.times)
+
+    def encode_log_group(self, encoder=None, **kwargs):
+        """ Encode the rows as a LogGroup
+
+        :type encoder: LogGroupEncoder
+        :param encoder: encoder to reuse, default a new one
+
+        :param kwargs: source, filename, tags and context_flow, see LogGroupEncoder.encode_log_group
+
+        :return: bytes, as cls_pb2.LogGroup.SerializeToString
+        """
+        return self._encoder(encoder).encode_columns(self.times, self.keys, self.columns, **kwargs)
+
+    def encode_log_group_list(self, encoder=None, **kwargs):
+        """ Encode the rows as a LogGroupList of one LogGroup, the body of put_log_raw before compression,
+        see encode_log_group for the parameters
+
+        :return: bytes, as cls_pb2.LogGroupList.SerializeToString
+        """
+        return self._encoder(encoder).encode_columns(self.times, self.keys, self.columns, as_list=True, **kwargs)
+
+    @staticmethod
+    def _encoder(encoder):
+        if encoder is None:
+            # wire imports this module
+            from tencentcloud.log.wire import LogGroupEncoder
+            encoder = LogGroupEncoder()
+        return encoder
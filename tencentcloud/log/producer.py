@@ -0,0 +1,694 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) Tencent Cloud Computing
+# All rights reserved.
+
+import heapq
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+import six
+
+from tencentcloud.log.logclient import LogClient, lz_compresss
+from tencentcloud.log.logexception import LogException
+from tencentcloud.log.logitem import LogItem
+from tencentcloud.log.wal import DEFAULT_SEGMENT_SIZE, WriteAheadLog
+from tencentcloud.log.wire import LogGroupEncoder
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH_SIZE = 512 * 1024
+DEFAULT_MAX_BATCH_COUNT = 4096
+DEFAULT_LINGER = 2
+DEFAULT_IO_THREADS = 4
+DEFAULT_MAX_BUFFER_SIZE = 64 * 1024 * 1024
+DEFAULT_MAX_BLOCK_TIME = 60
+BUFFER_FULL_BLOCK = 'block'
+BUFFER_FULL_DROP_NEWEST = 'drop_newest'
+BUFFER_FULL_DROP_OLDEST = 'drop_oldest'
+BUFFER_FULL_SPILL = 'spill'
+DEFAULT_REPLAY_MAX_INTERVAL = 30
+ORDERING_NONE = 'none'
+ORDERING_CONTEXT_FLOW = 'context_flow'
+ORDERING_SOURCE = 'source'
+# bytes of the protobuf framing of a log and of a content, used to estimate the batch size
+LOG_OVERHEAD = 16
+CONTENT_OVERHEAD = 4
+
+
+class ProducerBatchResult(object):
+    """ The result of a batch sent by LogProducer, shared by the futures of all the logs of the batch.
+
+    :type topic_id: string
+    :param topic_id: topic id of the batch
+
+    :type log_count: int
+    :param log_count: logs in the batch
+
+    :type size: int
+    :param size: estimated bytes of the batch before compression
+
+    :type response: PutLogsResponse
+    :param response: response of put_log_raw
+    """
+
+    def __init__(self, topic_id, log_count, size, response):
+        self.topic_id = topic_id
+        self.log_count = log_count
+        self.size = size
+        self.response = response
+
+    def get_topic_id(self):
+        return self.topic_id
+
+    def get_log_count(self):
+        return self.log_count
+
+    def get_size(self):
+        return self.size
+
+    def get_response(self):
+        return self.response
+
+    def get_request_id(self):
+        return self.response.get_request_id()
+
+
+class ProducerBatch(object):
+    """ logs of the same topic, source, filename, tags and contextFlow, sent in one put_log_raw call """
+
+    __slots__ = ('key', 'topic_id', 'source', 'filename', 'tags', 'context_flow', 'logs', 'log_count', 'size',
+                 'deadline', 'future', 'spill_path', 'ordering_key')
+
+    def __init__(self, key, linger):
+        self.key = key
+        self.topic_id, self.source, self.filename, self.tags, self.context_flow = key
+        self.logs = []
+        self.log_count = 0
+        self.size = 0
+        self.deadline = time.time() + linger
+        self.future = Future()
+        self.spill_path = None
+        self.ordering_key = None
+
+    def add(self, timestamp, contents, size):
+        self.logs.append((timestamp, contents))
+        self.log_count += 1
+        self.size += size
+
+    def encode(self, encoder):
+        """
+        :param encoder: LogGroupEncoder
+        :return: bytes, the serialized LogGroupList of the batch
+        """
+        return encoder.encode_log_group_list(self.logs, self.source or None, self.filename or None, self.tags,
+                                             self.context_flow)
+
+
+class LogProducer(object):
+    """ Thread safe producer batching the logs sent to the same topic, source, filename, tags and contextFlow in
+    background, a batch is sent through put_log_raw by one of the io threads once it reaches max_batch_size bytes
+    or max_batch_count logs, or linger seconds after its first log.
+
+    Up to io_threads batches are in flight at once, sharing the pooled connections of the client, whose
+    pool_maxsize should not be below io_threads. max_in_flight_per_topic bounds the batches in flight of one
+    topic, and ordering keeps the batches of the same contextFlow or source in order by sending them one at a
+    time, the other batches using all the concurrency.
+
+        producer = LogProducer(client)
+        future = producer.send(topic_id, {'level': 'INFO', 'message': 'hello'})
+        ...
+        producer.close()
+
+    :type client: LogClient
+    :param client: client sending the batches, its retry policy applies to each batch
+
+    :type max_batch_size: int
+    :param max_batch_size: default 524288, max estimated bytes of a batch
+
+    :type max_batch_count: int
+    :param max_batch_count: default 4096, max logs of a batch
+
+    :type linger: float
+    :param linger: default 2, max seconds a log waits for its batch to fill
+
+    :type io_threads: int
+    :param io_threads: default 4, threads sending the batches, the max batches in flight
+
+    :type max_in_flight_per_topic: int
+    :param max_in_flight_per_topic: default None, max batches of a topic in flight, None for up to io_threads
+
+    :type ordering: string
+    :param ordering: default "none", "context_flow" sends the batches of the same topic and contextFlow one at a
+        time in the order they are sealed, the logs sent without context_flow are not ordered, "source" does so
+        for the batches of the same topic and source
+
+    :type source: string
+    :param source: default source of the log groups
+
+    :type filename: string
+    :param filename: default filename of the log groups
+
+    :type max_buffer_size: int
+    :param max_buffer_size: default 67108864 (64MB), max estimated bytes of the logs queued or in flight,
+        buffer_full_policy applies to the logs sent beyond
+
+    :type buffer_full_policy: string
+    :param buffer_full_policy: default "block", "block" waits up to max_block_time for room then raises
+        LogException ProducerBufferFull, "drop_newest" drops the log sent, "drop_oldest" drops the oldest batches
+        waiting to be sent, the sealed ones first, to make room, "spill" writes the oldest sealed batches waiting to
+        be sent to files in spill_dir and sends them from there, the batches being filled stay in memory, beyond
+        max_buffer_size if nothing is left to spill. the futures of the dropped logs fail with LogException
+        LogDropped.
+
+    :type max_block_time: float
+    :param max_block_time: default 60, max seconds send() blocks with the "block" policy
+
+    :type spill_dir: string
+    :param spill_dir: directory of the spilled batches, default a new temporary directory
+
+    :type wal_dir: string
+    :param wal_dir: default None, directory of a write-ahead log (see WriteAheadLog) for at-least-once delivery.
+        each batch is written compressed to the log before it is sent and its memory released. a batch failing
+        with a retryable error is kept in the log and replayed, in order per topic, until the server accepts it,
+        its future is done then. the batches left by a former producer on the same directory are replayed at start.
+
+    :type wal_segment_size: int
+    :param wal_segment_size: default 67108864 (64MB), size of a segment file of the write-ahead log
+
+    :type wal_sync: bool
+    :param wal_sync: default True, msync each batch written to the write-ahead log
+
+    :type replay_max_interval: float
+    :param replay_max_interval: default 30, max seconds between two tries of replaying a batch
+    """
+
+    def __init__(self, client, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_batch_count=DEFAULT_MAX_BATCH_COUNT,
+                 linger=DEFAULT_LINGER, io_threads=DEFAULT_IO_THREADS, source=None, filename=None,
+                 max_buffer_size=DEFAULT_MAX_BUFFER_SIZE, buffer_full_policy=BUFFER_FULL_BLOCK,
+                 max_block_time=DEFAULT_MAX_BLOCK_TIME, spill_dir=None, wal_dir=None,
+                 wal_segment_size=DEFAULT_SEGMENT_SIZE, wal_sync=True,
+                 replay_max_interval=DEFAULT_REPLAY_MAX_INTERVAL, max_in_flight_per_topic=None,
+                 ordering=ORDERING_NONE):
+        if buffer_full_policy not in (BUFFER_FULL_BLOCK, BUFFER_FULL_DROP_NEWEST, BUFFER_FULL_DROP_OLDEST,
+                                      BUFFER_FULL_SPILL):
+            raise ValueError('unknown buffer_full_policy: %s' % buffer_full_policy)
+        if ordering not in (ORDERING_NONE, ORDERING_CONTEXT_FLOW, ORDERING_SOURCE):
+            raise ValueError('unknown ordering: %s' % ordering)
+
+        self.client = client
+        self.max_batch_size = max_batch_size
+        self.max_batch_count = max_batch_count
+        self.linger = linger
+        self.source = source
+        self.filename = filename
+        self.max_buffer_size = max_buffer_size
+        self.buffer_full_policy = buffer_full_policy
+        self.max_block_time = max_block_time
+        self.spill_dir = spill_dir
+        if buffer_full_policy == BUFFER_FULL_SPILL and spill_dir is None:
+            self.spill_dir = tempfile.mkdtemp(prefix='cls-producer-')
+
+        self.max_in_flight_per_topic = max_in_flight_per_topic
+        self.ordering = ordering
+        self._lock = threading.Condition()
+        self._batches = {}
+        self._in_flight = set()
+        # sealed batches not sending yet, in the order they were sealed, the ones buffer_full_policy acts on first
+        self._queued = OrderedDict()
+        # sealed batches taken out of _queued while written to spill_dir, the lock is released meanwhile
+        self._spilling = set()
+        # sealed batches waiting for the limits of their topic or ordering key, in the order they were sealed
+        self._pending = []
+        self._topic_sending = {}
+        self._ordering_sending = set()
+        self._closed = False
+        self._buffered_bytes = 0
+        self._buffered_count = 0
+        self._dropped_count = 0
+        self._spilled_count = 0
+        self._failed_count = 0
+        self._encoders = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=io_threads)
+        self._linger_thread = threading.Thread(target=self._linger_loop, name='cls-producer-linger')
+        self._linger_thread.daemon = True
+        self._linger_thread.start()
+
+        self.replay_max_interval = replay_max_interval
+        self._wal = None
+        # topic id -> heap of (WalRecord, future, size) waiting for replay, in the order they were written, each
+        # topic is replayed by a thread of its own so a failing topic never holds back the others
+        self._replay_queues = {}
+        self._replay_threads = {}
+        self._replay_stopped = False
+        if wal_dir is not None:
+            self._wal = WriteAheadLog(wal_dir, wal_segment_size, wal_sync)
+            with self._lock:
+                for record in self._wal.recover():
+                    self._queue_replay(record, Future(), record.size)
+
+    def send(self, topic_id, log, tags=None, source=None, filename=None, context_flow=None):
+        """ Queue a log, it is sent in background with the other logs of the same topic, source, filename, tags
+        and contextFlow
+
+        :type topic_id: string
+        :param topic_id: topic id
+
+        :type log: LogItem, dict or tuple(key-value) list
+        :param log: the log, a dict or a (key, value) list is logged at the current time
+
+        :type tags: dict or tuple(key-value) list
+        :param tags: tags of the log group
+
+        :type source: string
+        :param source: source of the log group, default the source of the producer
+
+        :type filename: string
+        :param filename: filename of the log group, default the filename of the producer
+
+        :type context_flow: string
+        :param context_flow: contextFlow of the log group
+
+        :return: Future of the batch, its result is a ProducerBatchResult, or the LogException of put_log_raw
+        :raise: LogException if the producer is closed, or ProducerBufferFull if the buffer is still full after
+            max_block_time with the "block" policy
+        """
+        if isinstance(log, LogItem):
+            timestamp = log.get_time()
+            contents = log.get_contents()
+        else:
+            timestamp = int(time.time())
+            contents = log.items() if isinstance(log, dict) else log
+
+        contents = [(key, value if isinstance(value, six.string_types) else six.text_type(value))
+                    for key, value in contents]
+        size = LOG_OVERHEAD
+        for key, value in contents:
+            size += len(key) + len(value) + CONTENT_OVERHEAD
+
+        if tags:
+            tags = tuple(sorted(tags.items() if isinstance(tags, dict) else tags))
+        key = (topic_id, source or self.source, filename or self.filename, tags or (), context_flow)
+
+        with self._lock:
+            if self._closed:
+                raise LogException('ProducerClosed', 'the producer is closed')
+
+            if self._buffered_bytes + size > self.max_buffer_size and not self._make_room(size):
+                if self.buffer_full_policy != BUFFER_FULL_SPILL:
+                    self._dropped_count += 1
+                    future = Future()
+                    future.set_exception(LogException('LogDropped', 'the producer buffer is full'))
+                    return future
+                # nothing left to spill, the log goes to its batch in memory, which is spilled once sealed
+
+            batch = self._batches.get(key)
+            if batch is not None and batch.size + size > self.max_batch_size:
+                self._seal(batch)
+                batch = None
+            if batch is None:
+                batch = self._batches[key] = ProducerBatch(key, self.linger)
+                self._lock.notify_all()
+
+            batch.add(timestamp, contents, size)
+            self._buffered_bytes += size
+            self._buffered_count += 1
+            future = batch.future
+            if batch.log_count >= self.max_batch_count or batch.size >= self.max_batch_size:
+                self._seal(batch)
+        return future
+
+    def get_buffered_bytes(self):
+        """ estimated bytes of the logs queued or in flight, spilled ones excluded """
+        return self._buffered_bytes
+
+    def get_buffered_count(self):
+        """ logs queued or in flight, spilled ones excluded """
+        return self._buffered_count
+
+    def get_dropped_count(self):
+        """ logs dropped because the buffer was full """
+        return self._dropped_count
+
+    def get_spilled_count(self):
+        """ logs spilled to spill_dir because the buffer was full """
+        return self._spilled_count
+
+    def get_failed_count(self):
+        """ logs not sent because put_log_raw failed """
+        return self._failed_count
+
+    def get_replay_count(self):
+        """ batches kept in the write-ahead log waiting for replay """
+        return sum(len(queue) for queue in list(self._replay_queues.values()))
+
+    def flush(self, timeout=None):
+        """ Send all the queued logs now and wait for the batches in flight
+
+        :type timeout: float
+        :param timeout: max seconds to wait, None to wait until all the batches are done
+
+        :return: bool, if all the batches are done
+        """
+        with self._lock:
+            for batch in list(self._batches.values()):
+                self._seal(batch)
+            futures = list(self._in_flight)
+        done, not_done = wait(futures, timeout)
+        return not not_done
+
+    def close(self, timeout=None):
+        """ Send all the queued logs and stop the producer, logs can't be sent any more
+
+        :type timeout: float
+        :param timeout: max seconds to wait for the batches in flight, the batches not replayed yet are kept in
+            the write-ahead log for the next producer and their futures fail with LogException ProducerClosed
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._lock.notify_all()
+        self.flush(timeout)
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for batch in pending:
+            self._abort(batch)
+        self._executor.shutdown(wait=timeout is None)
+
+        if self._wal is not None:
+            with self._lock:
+                self._replay_stopped = True
+                self._lock.notify_all()
+            deadline = None if timeout is None else time.time() + timeout
+            for thread in list(self._replay_threads.values()):
+                thread.join(None if deadline is None else max(0, deadline - time.time()))
+            with self._lock:
+                replay_queues, self._replay_queues = self._replay_queues, {}
+            for record, future, _ in [item for queue in replay_queues.values() for item in queue]:
+                future.set_exception(LogException('ProducerClosed', 'the batch is kept in the write-ahead log'))
+            self._wal.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _seal(self, batch):
+        # called with the lock held
+        del self._batches[batch.key]
+        self._submit(batch)
+
+    def _submit(self, batch):
+        # called with the lock held
+        self._in_flight.add(batch.future)
+        self._queued[batch] = None
+        if self.max_in_flight_per_topic is None and self.ordering == ORDERING_NONE:
+            self._executor.submit(self._send_batch, batch)
+            return
+        if self.ordering == ORDERING_SOURCE:
+            batch.ordering_key = (batch.topic_id, batch.source)
+        elif self.ordering == ORDERING_CONTEXT_FLOW and batch.context_flow:
+            batch.ordering_key = (batch.topic_id, batch.context_flow)
+        self._pending.append(batch)
+        self._dispatch()
+
+    def _dispatch(self):
+        # called with the lock held, submit the pending batches in order as far as the limits allow, a batch
+        # waiting for its ordering key holds back the later batches of that key
+        limit = self.max_in_flight_per_topic
+        blocked = set()
+        pending = []
+        for batch in self._pending:
+            ordering_key = batch.ordering_key
+            if (limit is not None and self._topic_sending.get(batch.topic_id, 0) >= limit) or \
+                    (ordering_key is not None and (ordering_key in self._ordering_sending or ordering_key in blocked)):
+                if ordering_key is not None:
+                    blocked.add(ordering_key)
+                pending.append(batch)
+                continue
+            self._topic_sending[batch.topic_id] = self._topic_sending.get(batch.topic_id, 0) + 1
+            if ordering_key is not None:
+                self._ordering_sending.add(ordering_key)
+            self._executor.submit(self._send_batch, batch)
+        self._pending = pending
+
+    def _done(self, batch):
+        # called with the lock held when a batch dispatched by _dispatch is no longer sending
+        count = self._topic_sending.pop(batch.topic_id) - 1
+        if count:
+            self._topic_sending[batch.topic_id] = count
+        self._ordering_sending.discard(batch.ordering_key)
+        if self._pending:
+            self._dispatch()
+
+    def _abort(self, batch):
+        # a batch still pending when the producer is closed, written to the write-ahead log for the next producer
+        message = 'the producer is closed before the batch is sent'
+        with self._lock:
+            while batch in self._spilling:
+                self._lock.wait()
+        if self._wal is not None:
+            try:
+                if batch.spill_path is not None:
+                    with open(batch.spill_path, 'rb') as f:
+                        body = f.read()
+                else:
+                    body = batch.encode(self._encoder())
+                self._wal.append(batch.topic_id, lz_compresss(body), batch.log_count)
+                message = 'the batch is kept in the write-ahead log'
+            except Exception as e:
+                logger.warning("fail to keep %d logs to topic %s in the write-ahead log: %s", batch.log_count,
+                               batch.topic_id, e)
+        if batch.spill_path is not None:
+            os.remove(batch.spill_path)
+        with self._lock:
+            self._in_flight.discard(batch.future)
+            self._queued.pop(batch, None)
+            if batch.logs is not None:
+                self._release(batch)
+                batch.logs = None
+        batch.future.set_exception(LogException('ProducerClosed', message))
+
+    def _make_room(self, size):
+        """ apply buffer_full_policy until size bytes fit in the buffer, called with the lock held
+
+        :return: bool, if the log fits
+        """
+        if self.buffer_full_policy == BUFFER_FULL_BLOCK:
+            # the queued batches would hold their bytes until linger, send them now
+            for batch in list(self._batches.values()):
+                self._seal(batch)
+            deadline = time.time() + self.max_block_time
+            while self._buffered_bytes + size > self.max_buffer_size:
+                time_left = deadline - time.time()
+                if time_left <= 0 or self._closed:
+                    raise LogException('ProducerBufferFull',
+                                       'no room in the producer buffer after %s seconds' % self.max_block_time)
+                self._lock.wait(time_left)
+            return True
+
+        if self.buffer_full_policy == BUFFER_FULL_DROP_NEWEST:
+            return False
+
+        # drop or spill the oldest batches waiting to be sent, the sealed ones first, then for drop_oldest the ones
+        # being filled. the batches sending can't be released
+        candidates = [batch for batch in self._queued if batch.logs is not None]
+        if self.buffer_full_policy == BUFFER_FULL_DROP_OLDEST:
+            candidates.extend(sorted(self._batches.values(), key=lambda b: b.deadline))
+        for batch in candidates:
+            if self._buffered_bytes + size <= self.max_buffer_size:
+                break
+            if self.buffer_full_policy == BUFFER_FULL_SPILL:
+                # the lock is released while spilling, the batch may be sending since
+                if batch in self._queued and batch.logs is not None:
+                    self._spill(batch)
+                continue
+            if batch in self._queued:
+                del self._queued[batch]
+                self._in_flight.discard(batch.future)
+                if batch in self._pending:
+                    self._pending.remove(batch)
+            else:
+                del self._batches[batch.key]
+            self._release(batch)
+            batch.logs = None
+            self._dropped_count += batch.log_count
+            batch.future.set_exception(LogException('LogDropped', 'the producer buffer is full'))
+        return self._buffered_bytes + size <= self.max_buffer_size
+
+    def _release(self, batch):
+        # called with the lock held
+        self._buffered_bytes -= batch.size
+        self._buffered_count -= batch.log_count
+        self._lock.notify_all()
+
+    def _spill(self, batch):
+        # called with the lock held on a sealed batch waiting to be sent, it is sent from its file and its logs
+        # are released. the lock is released while encoding and writing the file, so the other senders and the io
+        # threads don't wait for the disk, _send_batch and _abort wait for the batch out of _spilling
+        del self._queued[batch]
+        self._spilling.add(batch)
+        self._lock.release()
+        path = None
+        try:
+            fd, path = tempfile.mkstemp(suffix='.pb', dir=self.spill_dir)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(batch.encode(self._encoder()))
+        except Exception:
+            if path is not None:
+                os.remove(path)
+            path = None
+            raise
+        finally:
+            self._lock.acquire()
+            self._spilling.discard(batch)
+            self._queued[batch] = None
+            if path is not None:
+                batch.spill_path = path
+                batch.logs = None
+                self._release(batch)
+                self._spilled_count += batch.log_count
+            else:
+                self._lock.notify_all()
+
+    def _linger_loop(self):
+        with self._lock:
+            while not self._closed:
+                now = time.time()
+                next_deadline = None
+                for batch in list(self._batches.values()):
+                    if batch.deadline <= now:
+                        self._seal(batch)
+                    elif next_deadline is None or batch.deadline < next_deadline:
+                        next_deadline = batch.deadline
+                self._lock.wait(None if next_deadline is None else next_deadline - now)
+
+    def _send_batch(self, batch):
+        with self._lock:
+            while batch in self._spilling:
+                self._lock.wait()
+            if batch not in self._queued:
+                # dropped to make room while waiting
+                if self.max_in_flight_per_topic is not None or self.ordering != ORDERING_NONE:
+                    self._done(batch)
+                return
+            del self._queued[batch]
+        record = None
+        try:
+            if batch.spill_path is not None:
+                with open(batch.spill_path, 'rb') as f:
+                    body = f.read()
+                os.remove(batch.spill_path)
+            else:
+                body = batch.encode(self._encoder())
+            body = lz_compresss(body)
+
+            if self._wal is None:
+                response = self.client.put_log_lz4(batch.topic_id, body)
+            else:
+                record = self._wal.append(batch.topic_id, body, batch.log_count)
+                with self._lock:
+                    if batch.logs is not None:
+                        self._release(batch)
+                        batch.logs = None
+                    if self._replay_queues.get(batch.topic_id):
+                        # keep the order, behind the batches of the topic waiting for replay
+                        self._queue_replay(record, batch.future, batch.size)
+                        return
+                response = self.client.put_log_lz4(batch.topic_id, body)
+                self._wal.ack(record)
+            batch.future.set_result(ProducerBatchResult(batch.topic_id, batch.log_count, batch.size, response))
+        except Exception as e:
+            if record is not None and isinstance(e, LogException) and LogClient._isRetryable(e):
+                logger.warning("fail to send %d logs to topic %s, replay them later: %s", batch.log_count,
+                               batch.topic_id, e)
+                with self._lock:
+                    self._queue_replay(record, batch.future, batch.size)
+                return
+
+            logger.warning("fail to send %d logs to topic %s: %s", batch.log_count, batch.topic_id, e)
+            if record is not None:
+                self._wal.ack(record)
+            with self._lock:
+                self._failed_count += batch.log_count
+            batch.future.set_exception(e)
+        finally:
+            with self._lock:
+                if record is None or batch.future.done():
+                    self._in_flight.discard(batch.future)
+                if batch.logs is not None:
+                    self._release(batch)
+                    batch.logs = None
+                if self.max_in_flight_per_topic is not None or self.ordering != ORDERING_NONE:
+                    self._done(batch)
+
+    def _encoder(self):
+        # one encoder per thread, it reuses its buffer
+        encoder = getattr(self._encoders, 'encoder', None)
+        if encoder is None:
+            encoder = self._encoders.encoder = LogGroupEncoder()
+        return encoder
+
+    def _queue_replay(self, record, future, size):
+        # called with the lock held, the batch stays in flight until it is replayed
+        topic_id = record.topic_id
+        heapq.heappush(self._replay_queues.setdefault(topic_id, []), (record, future, size))
+        if topic_id not in self._replay_threads and not self._replay_stopped:
+            thread = self._replay_threads[topic_id] = threading.Thread(target=self._replay_loop, args=(topic_id,),
+                                                                      name='cls-producer-replay')
+            thread.daemon = True
+            thread.start()
+        self._lock.notify_all()
+
+    def _replay_loop(self, topic_id):
+        interval = 0
+        while True:
+            with self._lock:
+                queue = self._replay_queues.get(topic_id)
+                if self._replay_stopped or not queue:
+                    # the thread of the topic ends with its queue, _queue_replay starts a new one
+                    del self._replay_threads[topic_id]
+                    if not self._replay_stopped:
+                        self._replay_queues.pop(topic_id, None)
+                    return
+                item = queue[0]
+            record, future, size = item
+
+            try:
+                response = self.client.put_log_lz4(record.topic_id, self._wal.read(record))
+            except Exception as e:
+                if isinstance(e, LogException) and LogClient._isRetryable(e):
+                    interval = min(self.replay_max_interval, interval * 2 or 1)
+                    logger.warning("fail to replay %d logs to topic %s, retry in %s seconds: %s", record.log_count,
+                                   record.topic_id, interval, e)
+                    deadline = time.time() + interval
+                    with self._lock:
+                        while not self._replay_stopped and time.time() < deadline:
+                            self._lock.wait(deadline - time.time())
+                    continue
+
+                logger.warning("fail to replay %d logs to topic %s: %s", record.log_count, record.topic_id, e)
+                self._wal.ack(record)
+                with self._lock:
+                    self._failed_count += record.log_count
+                    queue.remove(item)
+                    heapq.heapify(queue)
+                    self._in_flight.discard(future)
+                future.set_exception(e)
+                continue
+
+            interval = 0
+            self._wal.ack(record)
+            with self._lock:
+                queue.remove(item)
+                heapq.heapify(queue)
+                self._in_flight.discard(future)
+            future.set_result(ProducerBatchResult(record.topic_id, record.log_count, size, response))
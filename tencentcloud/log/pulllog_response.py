@@ -1,14 +1,16 @@
 #!/usr/bin/env python
 # encoding: utf-8
-import base64
+import binascii
 import json
 import struct
 
 import six
 
 from tencentcloud.log.cls_pb2 import LogGroup
+from tencentcloud.log.columnar import log_groups_to_columns, log_groups_to_record_batch
 from tencentcloud.log.logexception import LogException
 from tencentcloud.log.logresponse import LogResponse
+from tencentcloud.log.wire import LogGroupDecoder
 
 # Copyright (C) Alibaba Cloud Computing
 # All rights reserved.
@@ -16,10 +18,22 @@ from tencentcloud.log.logresponse import LogResponse
 DEFAULT_DECODE_LIST = ('utf8',)
 VERSION = 130
 MSGHEADERLEN = 96
+MSGHEADER_FORMAT = '>qq36s36si'
+DECODE_OUTPUT_LOG_GROUP = 'log_group'
+DECODE_OUTPUT_COLUMNS = 'columns'
+DECODE_OUTPUT_RECORDS = 'records'
+DEFAULT_DECODE_CHUNK_SIZE = 8
+
+# old protobuf implementations only parse bytes, fall back once they reject a memoryview
+_parse_accepts_memoryview = six.PY3
 
 
 class PullLogResponse(LogResponse):
     """ The response of the pull_logs API from log.
+    The log groups are parsed lazily, all of them on the first access of log_groups / get_log_groups(),
+    or one by one with get_log_group(index) and iter_log_groups(). get_next_offset() and
+    get_log_group_count() never parse. get_log_records() decodes them into light LogGroupRecords instead.
+
     :type resp: dict
     :param resp: the HTTP response body
     """
@@ -28,22 +42,17 @@ class PullLogResponse(LogResponse):
         LogResponse.__init__(self, header, resp)
         self.resp = self.decompress_resp(resp)
         self.next_offset = self.resp['Response']["NextOffset"]
-        self.log_groups = []
-        self._parse_log_groups(self.resp['Response']["Message"])
+        # the response only keeps the messages in _messages, so a parsed message is really released
+        self._messages = self.resp['Response'].pop("Message", None) or []
+        self._log_groups = [None] * len(self._messages)
+        self._parsed_count = 0
+        self._message_bytes = sum(_decoded_size(message) for message in self._messages)
+        self._log_records = None
         self.flatten_logs_json = []
+        self.log_groups_json = None
 
     def decompress_resp(self, resp):
-        import snappy
-
-        decompress = snappy.decompress(resp)
-        try:
-            if isinstance(decompress, six.binary_type):
-                return json.loads(decompress.decode('utf8', "ignore"))
-
-            return json.loads(decompress)
-        except Exception as ex:
-            raise LogException('BadResponse', 'Bad json format:\n' + repr(ex),
-                               self.get_request_id(), self.get_all_headers(), decompress)
+        return _decompress_resp(resp, self.get_request_id(), self.get_all_headers())
 
     def get_body(self):
         if self._body is None:
@@ -67,7 +76,66 @@ class PullLogResponse(LogResponse):
         return len(self.get_flatten_logs_json())
 
     def get_log_group_count(self):
-        return len(self.log_groups)
+        return len(self._log_groups)
+
+    def get_message_bytes(self):
+        """ decoded size of the pulled log group messages, computed from their base64 length without decoding them """
+        return self._message_bytes
+
+    @property
+    def log_groups(self):
+        if self._parsed_count < len(self._log_groups):
+            for index in range(len(self._log_groups)):
+                self.get_log_group(index)
+        return self._log_groups
+
+    @log_groups.setter
+    def log_groups(self, value):
+        self._messages = [None] * len(value)
+        self._log_groups = list(value)
+        self._parsed_count = len(value)
+
+    def get_log_group(self, index):
+        """ parse the log group at index if not parsed yet
+
+        :type index: int
+        :param index: index of the log group in the response
+
+        :return: LogGroup
+        """
+        log_group = self._log_groups[index]
+        if log_group is None:
+            log_group = _parse_log_group(self._messages[index])
+            self._log_groups[index] = log_group
+            # the raw message is useless once parsed
+            self._messages[index] = None
+            self._parsed_count += 1
+        return log_group
+
+    def iter_log_groups(self):
+        """ parse the log groups one by one while iterating, the parsed ones are kept by the response
+
+        :return: generator of LogGroup
+        """
+        for index in range(len(self._log_groups)):
+            yield self.get_log_group(index)
+
+    def get_log_records(self):
+        """ decode the log groups with LogGroupDecoder, the content keys are interned across the response.
+        The raw messages are kept, so log_groups could still be parsed afterwards.
+
+        :return: list of LogGroupRecord
+        """
+        if self._log_records is None:
+            decoder = LogGroupDecoder()
+            log_records = []
+            for message, log_group in zip(self._messages, self._log_groups):
+                if message is not None:
+                    log_records.append(_decode_log_record(message, decoder))
+                else:
+                    log_records.append(decoder.decode_log_group(log_group.SerializeToString()))
+            self._log_records = log_records
+        return self._log_records
 
     def get_log_group_json_list(self):
         if self.log_groups_json is None:
@@ -84,20 +152,6 @@ class PullLogResponse(LogResponse):
         print('headers:', self.get_all_headers())
         print('detail:', self.get_log_group_json_list())
 
-    def _parse_log_groups(self, data):
-        try:
-            if data is not None:
-                for message in data:
-                    b_message = base64.b64decode(message)
-                    log_group_binary = Message(b_message)
-                    log_group_binary.parse_message()
-                    log_group = LogGroup()
-                    log_group.ParseFromString(log_group_binary.data)
-                    self.log_groups.append(log_group)
-        except Exception as ex:
-            err = 'failed to parse data to LogGroup: \n' + str(ex)
-            raise LogException('BadResponse', err)
-
     def _transfer_to_json(self):
         self.log_groups_json = []
         for log_group in self.log_groups:
@@ -142,6 +196,87 @@ class PullLogResponse(LogResponse):
                 flatten_logs_json.append(item)
         return flatten_logs_json
 
+    def decode_with_executor(self, executor, chunk_size=DEFAULT_DECODE_CHUNK_SIZE, output=DECODE_OUTPUT_LOG_GROUP,
+                             keys=None):
+        """ Decode the messages not parsed yet in chunks on an executor, normally a ProcessPoolExecutor,
+        so the decoding of big responses is not bound to one core.
+        For the "log_group" output the workers only do the base64 and header decoding, they return the serialized
+        LogGroups, which are parsed in this process since cls_pb2 messages can't be pickled. The columns output is
+        built entirely by the workers.
+
+        :type executor: concurrent.futures.Executor
+        :param executor: executor running parse_log_group_messages
+
+        :type chunk_size: int
+        :param chunk_size: messages per submitted task
+
+        :type output: string
+        :param output: "log_group" (default), "columns" or "records"
+
+        :type keys: list
+        :param keys: content keys of the columns output, default None exports all the keys
+
+        :return: list of LogGroup for "log_group", the parsed log groups are kept by the response;
+            list of columns (see log_groups_to_columns), one per chunk, for "columns";
+            list of LogGroupRecord for "records", the keys are interned per chunk
+        """
+        if output == DECODE_OUTPUT_RECORDS:
+            if self._log_records is None:
+                if any(message is None for message in self._messages):
+                    return self.get_log_records()
+                futures = [executor.submit(parse_log_group_messages, self._messages[start:start + chunk_size],
+                                           output)
+                           for start in range(0, len(self._messages), chunk_size)]
+                self._log_records = [record for future in futures for record in future.result()]
+            return self._log_records
+
+        if output == DECODE_OUTPUT_COLUMNS:
+            indexes = list(range(len(self._log_groups)))
+        else:
+            indexes = [index for index, log_group in enumerate(self._log_groups) if log_group is None]
+
+        # (indexes, future or None, columns exported here when the chunk was partly parsed already)
+        tasks = []
+        for start in range(0, len(indexes), chunk_size):
+            chunk = indexes[start:start + chunk_size]
+            messages = [self._messages[index] for index in chunk]
+            if output == DECODE_OUTPUT_COLUMNS and any(message is None for message in messages):
+                tasks.append((chunk, None, log_groups_to_columns([self.get_log_group(i) for i in chunk], keys)))
+            elif output == DECODE_OUTPUT_COLUMNS:
+                tasks.append((chunk, executor.submit(parse_log_group_messages, messages, output, keys), None))
+            else:
+                tasks.append((chunk, executor.submit(extract_log_group_messages, messages), None))
+
+        if output == DECODE_OUTPUT_COLUMNS:
+            return [future.result() if future is not None else columns for _, future, columns in tasks]
+
+        for chunk, future, _ in tasks:
+            for index, data in zip(chunk, future.result()):
+                self._log_groups[index] = LogGroup.FromString(data)
+                self._messages[index] = None
+                self._parsed_count += 1
+        return self._log_groups
+
+    def to_columns(self, keys=None):
+        """ Export the logs as columns, see tencentcloud.log.columnar.log_groups_to_columns
+
+        :type keys: list
+        :param keys: content keys to export, default None exports all the keys
+
+        :return: OrderedDict, column name -> column
+        """
+        return log_groups_to_columns(self.iter_log_groups(), keys)
+
+    def to_record_batch(self, keys=None):
+        """ Export the logs as a pyarrow RecordBatch, requires pyarrow
+
+        :type keys: list
+        :param keys: content keys to export, default None exports all the keys
+
+        :return: pyarrow.RecordBatch
+        """
+        return log_groups_to_record_batch(self.iter_log_groups(), keys)
+
     def get_flatten_logs_json(self, time_as_str=None):
         if self.flatten_logs_json is None:
             self.flatten_logs_json = self.log_groups_to_flattern_list(self.log_groups, time_as_str=time_as_str)
@@ -149,6 +284,152 @@ class PullLogResponse(LogResponse):
         return self.flatten_logs_json
 
 
+class PullLogStreamResponse(LogResponse):
+    """ The response of the pull_logs_stream API. The downloaded body is released once decompressed, then the
+    log groups are decoded one by one while iterating and every raw message is released once decoded, so only
+    one LogGroup is alive at a time unless the caller keeps them. It could be iterated only once.
+
+    :type resp: bytearray
+    :param resp: the HTTP response body, a bytearray is emptied once decompressed
+
+    :type header: dict
+    :param header: the HTTP response header
+    """
+
+    def __init__(self, resp, header):
+        LogResponse.__init__(self, header, '')
+        resp = _decompress_resp(resp, self.get_request_id(), self.get_all_headers())
+        self.next_offset = resp['Response']["NextOffset"]
+        self._messages = resp['Response']["Message"] or []
+        self._log_group_count = len(self._messages)
+
+    def get_next_offset(self):
+        return self.next_offset
+
+    def get_log_group_count(self):
+        return self._log_group_count
+
+    def __iter__(self):
+        return self.iter_log_groups()
+
+    def iter_log_groups(self):
+        """ decode and yield the log groups one by one
+
+        :return: generator of LogGroup
+        """
+        messages, self._messages = self._messages, None
+        if messages is None:
+            raise LogException('StreamConsumed', 'the log groups of the pull log stream are already iterated')
+        for i in range(len(messages)):
+            message, messages[i] = messages[i], None
+            yield _parse_log_group(message)
+
+    def log_print(self):
+        print('PullLogStreamResponse')
+        print('next_offset', self.next_offset)
+        print('log_group_count', self._log_group_count)
+        print('headers:', self.get_all_headers())
+
+
+def parse_log_group_messages(messages, output=DECODE_OUTPUT_LOG_GROUP, keys=None):
+    """ Decode a chunk of raw pull messages, a module level function so it could run in a process pool.
+
+    :type messages: list
+    :param messages: base64 encoded messages of a pull_logs response
+
+    :type output: string
+    :param output: "log_group" (default), "columns" or "records"
+
+    :type keys: list
+    :param keys: content keys of the columns output, default None exports all the keys
+
+    :return: list of LogGroup, the columns of log_groups_to_columns, or list of LogGroupRecord
+    """
+    if output == DECODE_OUTPUT_RECORDS:
+        decoder = LogGroupDecoder()
+        return [_decode_log_record(message, decoder) for message in messages]
+    log_groups = [_parse_log_group(message) for message in messages]
+    if output == DECODE_OUTPUT_COLUMNS:
+        return log_groups_to_columns(log_groups, keys)
+    return log_groups
+
+
+def extract_log_group_messages(messages):
+    """ Decode the base64 and the header of a chunk of raw pull messages, a module level function so it could
+    run in a process pool.
+
+    :type messages: list
+    :param messages: base64 encoded messages of a pull_logs response
+
+    :return: list of bytes, the serialized LogGroups
+    """
+    data = []
+    for message in messages:
+        try:
+            log_group_binary = Message(binascii.a2b_base64(message))
+            log_group_binary.parse_message()
+        except Exception as ex:
+            raise LogException('BadResponse', 'failed to parse data to LogGroup: \n' + str(ex))
+        data.append(log_group_binary.data.tobytes())
+    return data
+
+
+def _decoded_size(message):
+    """ bytes of a base64 encoded message once decoded """
+    return len(message) * 3 // 4 - message.count('=', -2)
+
+
+def _decompress_resp(resp, request_id, headers):
+    import snappy
+
+    try:
+        decompress = snappy.decompress(resp)
+    except TypeError:
+        # some python-snappy versions only accept read-only buffers
+        decompress = snappy.decompress(bytes(resp))
+    if isinstance(resp, bytearray):
+        # the buffer of a streamed body, release it for its other holders too before parsing the json
+        del resp[:]
+    try:
+        if isinstance(decompress, six.binary_type):
+            return json.loads(decompress.decode('utf8', "ignore"))
+
+        return json.loads(decompress)
+    except Exception as ex:
+        raise LogException('BadResponse', 'Bad json format:\n' + repr(ex),
+                           request_id, headers, decompress)
+
+
+def _decode_log_record(message, decoder):
+    try:
+        log_group_binary = Message(binascii.a2b_base64(message))
+        log_group_binary.parse_message()
+        return decoder.decode_log_group(log_group_binary.data)
+    except Exception as ex:
+        err = 'failed to decode data to LogGroupRecord: \n' + str(ex)
+        raise LogException('BadResponse', err)
+
+
+def _parse_log_group(message):
+    global _parse_accepts_memoryview
+    try:
+        b_message = binascii.a2b_base64(message)
+        log_group_binary = Message(b_message)
+        log_group_binary.parse_message()
+        log_group = LogGroup()
+        if _parse_accepts_memoryview:
+            try:
+                log_group.ParseFromString(log_group_binary.data)
+                return log_group
+            except TypeError:
+                _parse_accepts_memoryview = False
+        log_group.ParseFromString(log_group_binary.data.tobytes())
+        return log_group
+    except Exception as ex:
+        err = 'failed to parse data to LogGroup: \n' + str(ex)
+        raise LogException('BadResponse', err)
+
+
 class Message(object):
     def __init__(self, src):
         self.src = src
@@ -158,21 +439,23 @@ class Message(object):
         self.logset_id = ''
         self.topic_id = ''
         self.content_len = -1
-        self.data = ''
+        self.data = memoryview(b'')
 
     def parse_message(self):
-        if len(self.src) <= MSGHEADERLEN:
+        """ read the header in place, data is a memoryview of the payload in src, nothing is copied """
+        src = self.src
+        if len(src) <= MSGHEADERLEN:
             raise LogException('InvalidLogGroup', 'log group list is too short to parse')
 
-        self.version = struct.unpack('>i', self.src[:4])[0]
+        self.version = struct.unpack_from('>i', src, 0)[0]
         if self.version == VERSION:
             self.timestamp, self.uin, self.logset_id, self.topic_id, self.content_len = \
-                struct.unpack('>qq36s36si', self.src[4:MSGHEADERLEN])
-            if self.content_len != len(self.src[MSGHEADERLEN:]):
+                struct.unpack_from(MSGHEADER_FORMAT, src, 4)
+            if self.content_len != len(src) - MSGHEADERLEN:
                 raise LogException('InvalidLogGroup',
                                    'declared log group content length is not equal to actual message length')
 
-            self.data = struct.unpack('>{}s'.format(self.content_len), self.src[MSGHEADERLEN:])[0]
+            self.data = memoryview(src)[MSGHEADERLEN:]
         else:
             err_msg = 'log group list version is not supported, version: {}'.format(self.version)
             raise LogException('InvalidLogGroupVersion', err_msg)
@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) Tencent Cloud Computing
+# All rights reserved.
+
+import threading
+import time
+
+DEFAULT_BURST = 1
+DEFAULT_DECREASE_FACTOR = 0.7
+DEFAULT_INCREASE_RATIO = 0.05
+DEFAULT_INCREASE_INTERVAL = 1
+DEFAULT_MIN_BYTES_PER_SECOND = 512 * 1024
+DEFAULT_MIN_REQUESTS_PER_SECOND = 1
+# a learned limit is dropped once the traffic stays below 1 / DROP_LIMIT_RATIO of it
+DROP_LIMIT_RATIO = 2
+OBSERVE_WINDOW = 1
+
+
+class TokenBucket(object):
+    """ Tokens refilled at rate per second, up to rate * burst. take() never refuses: it takes the tokens at
+    once, possibly leaving the bucket in debt, and returns the seconds until the debt is repaid. Callers
+    waiting that long are spaced at the rate instead of bursting. Not thread safe, TopicRateLimiter locks it.
+
+    :type rate: float
+    :param rate: tokens refilled per second
+
+    :type burst: float
+    :param burst: seconds of tokens the bucket holds
+    """
+
+    __slots__ = ('rate', 'burst', 'tokens', 'last_refill')
+
+    def __init__(self, rate, burst, now):
+        self.rate = float(rate)
+        self.burst = burst
+        self.tokens = self.rate * burst
+        self.last_refill = now
+
+    def refill(self, now):
+        self.tokens = min(self.rate * self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def take(self, amount, now):
+        """ :return: seconds to wait before using the tokens """
+        self.refill(now)
+        self.tokens -= amount
+        if self.tokens >= 0:
+            return 0
+        return -self.tokens / self.rate
+
+    def set_rate(self, rate, now):
+        self.refill(now)
+        self.rate = float(rate)
+        self.tokens = min(self.tokens, self.rate * self.burst)
+
+
+class _AdaptiveLimit(object):
+    """ one dimension, bytes or requests, of the limit of a topic: the bucket, None while unlimited, and the
+    traffic accepted by the server over the last window """
+
+    __slots__ = ('max_rate', 'min_rate', 'bucket', 'window_start', 'window_amount', 'observed_rate')
+
+    def __init__(self, max_rate, min_rate, burst, now):
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.bucket = TokenBucket(max_rate, burst, now) if max_rate else None
+        self.window_start = now
+        self.window_amount = 0
+        self.observed_rate = 0
+
+    def take(self, amount, now):
+        if self.bucket is None:
+            return 0
+        return self.bucket.take(amount, now)
+
+    def observe(self, amount, now):
+        elapsed = now - self.window_start
+        if elapsed >= OBSERVE_WINDOW:
+            self.observed_rate = self.window_amount / elapsed
+            self.window_start = now
+            self.window_amount = 0
+        self.window_amount += amount
+
+    def current_rate(self, now):
+        """ rate of the accepted traffic, the higher of the last window and of the current one, which counts as a
+        whole window until it is over """
+        return max(self.observed_rate, self.window_amount / max(now - self.window_start, OBSERVE_WINDOW))
+
+    def decrease(self, factor, burst, now):
+        # the accepted traffic is the best guess of the quota, the bucket may be far above it
+        rate = self.current_rate(now)
+        if self.bucket is not None:
+            rate = min(rate, self.bucket.rate) if rate else self.bucket.rate
+        elif not rate:
+            return
+        rate = max(self.min_rate, rate * factor)
+        if self.bucket is None:
+            self.bucket = TokenBucket(rate, burst, now)
+            # no burst right after the quota error
+            self.bucket.tokens = 0
+        else:
+            self.bucket.set_rate(rate, now)
+
+    def increase(self, ratio, now):
+        bucket = self.bucket
+        if bucket is None:
+            return
+        if self.max_rate:
+            if bucket.rate < self.max_rate:
+                bucket.set_rate(min(self.max_rate, bucket.rate + self.max_rate * ratio), now)
+        elif bucket.rate > DROP_LIMIT_RATIO * self.current_rate(now):
+            # learned limit far above the traffic, it does not shape anything any more
+            self.bucket = None
+        else:
+            bucket.set_rate(bucket.rate * (1 + ratio), now)
+
+    def get_rate(self):
+        return self.bucket.rate if self.bucket is not None else None
+
+
+class _TopicLimit(object):
+    __slots__ = ('bytes', 'requests', 'last_increase', 'last_decrease')
+
+    def __init__(self, bytes_limit, requests_limit, now):
+        self.bytes = bytes_limit
+        self.requests = requests_limit
+        self.last_increase = now
+        self.last_decrease = 0
+
+
+class TopicRateLimiter(object):
+    """ Client side rate limit of the requests of each topic, in bytes per second and requests per second,
+    shaping the traffic below the speed quota of the topic instead of sending bursts until the server answers
+    SpeedQuotaExceed. A LogClient consults it before each request, see put_rate_limiter and pull_rate_limiter.
+
+    The rates adapt to the quota errors: a SpeedQuotaExceed multiplies them by decrease_factor, and every
+    increase_interval seconds without quota error raises them by increase_ratio, up to the configured rates.
+    A dimension without a configured rate is not limited until a quota error, then it is limited below the
+    traffic accepted when the error came, and dropped again once the traffic stays far below it.
+
+        limiter = TopicRateLimiter(bytes_per_second=4 * 1024 * 1024)
+        client = LogClient(endpoint, access_key_id, access_key, put_rate_limiter=limiter)
+
+    :type bytes_per_second: float
+    :param bytes_per_second: max bytes per second of a topic, request bodies and responses, None for no limit
+        until a quota error
+
+    :type requests_per_second: float
+    :param requests_per_second: max requests per second of a topic, None for no limit until a quota error
+
+    :type burst: float
+    :param burst: default 1, seconds of traffic which could be sent at once after an idle period
+
+    :type decrease_factor: float
+    :param decrease_factor: default 0.7, the rates are multiplied by it on a quota error
+
+    :type increase_ratio: float
+    :param increase_ratio: default 0.05, part of the configured rate (or of the learned rate) added every
+        increase_interval seconds without quota error
+
+    :type increase_interval: float
+    :param increase_interval: default 1, seconds between two changes of the rates, the quota errors of the
+        requests sent before a decrease don't decrease the rates again
+
+    :type min_bytes_per_second: float
+    :param min_bytes_per_second: default 524288, floor of the decreased bytes rate
+
+    :type min_requests_per_second: float
+    :param min_requests_per_second: default 1, floor of the decreased requests rate
+
+    :type adaptive: bool
+    :param adaptive: default True, False keeps the configured rates whatever the quota errors
+    """
+
+    def __init__(self, bytes_per_second=None, requests_per_second=None, burst=DEFAULT_BURST,
+                 decrease_factor=DEFAULT_DECREASE_FACTOR, increase_ratio=DEFAULT_INCREASE_RATIO,
+                 increase_interval=DEFAULT_INCREASE_INTERVAL, min_bytes_per_second=DEFAULT_MIN_BYTES_PER_SECOND,
+                 min_requests_per_second=DEFAULT_MIN_REQUESTS_PER_SECOND, adaptive=True):
+        self.bytes_per_second = bytes_per_second
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.decrease_factor = decrease_factor
+        self.increase_ratio = increase_ratio
+        self.increase_interval = increase_interval
+        self.min_bytes_per_second = min_bytes_per_second
+        self.min_requests_per_second = min_requests_per_second
+        self.adaptive = adaptive
+        self._topics = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, topic_id, size):
+        """ Take the tokens of a request, called before sending it
+
+        :type topic_id: string
+        :param topic_id: topic id
+
+        :type size: int
+        :param size: bytes of the request body
+
+        :return: float, seconds to wait before sending the request
+        """
+        with self._lock:
+            now = time.time()
+            topic = self._topic(topic_id, now)
+            return max(topic.requests.take(1, now), topic.bytes.take(size, now))
+
+    def on_success(self, topic_id, request_size, response_size=0):
+        """ A request is accepted, its response bytes are taken, which delays the next requests
+
+        :type topic_id: string
+        :param topic_id: topic id
+
+        :type request_size: int
+        :param request_size: bytes of the request body
+
+        :type response_size: int
+        :param response_size: bytes of the response body
+        """
+        with self._lock:
+            now = time.time()
+            topic = self._topic(topic_id, now)
+            if response_size:
+                topic.bytes.take(response_size, now)
+            topic.bytes.observe(request_size + response_size, now)
+            topic.requests.observe(1, now)
+            if self.adaptive and now - max(topic.last_increase, topic.last_decrease) >= self.increase_interval:
+                topic.bytes.increase(self.increase_ratio, now)
+                topic.requests.increase(self.increase_ratio, now)
+                topic.last_increase = now
+
+    def on_quota_exceeded(self, topic_id):
+        """ The server answered SpeedQuotaExceed to a request of the topic
+
+        :type topic_id: string
+        :param topic_id: topic id
+        """
+        if not self.adaptive:
+            return
+        with self._lock:
+            now = time.time()
+            topic = self._topic(topic_id, now)
+            if now - topic.last_decrease < self.increase_interval:
+                return
+            topic.bytes.decrease(self.decrease_factor, self.burst, now)
+            topic.requests.decrease(self.decrease_factor, self.burst, now)
+            topic.last_decrease = now
+
+    def get_rate(self, topic_id):
+        """ :return: (bytes per second, requests per second) of the topic now, None for no limit """
+        topic = self._topics.get(topic_id)
+        if topic is None:
+            return self.bytes_per_second, self.requests_per_second
+        return topic.bytes.get_rate(), topic.requests.get_rate()
+
+    def _topic(self, topic_id, now):
+        topic = self._topics.get(topic_id)
+        if topic is None:
+            topic = self._topics[topic_id] = _TopicLimit(
+                _AdaptiveLimit(self.bytes_per_second, self.min_bytes_per_second, self.burst, now),
+                _AdaptiveLimit(self.requests_per_second, self.min_requests_per_second, self.burst, now), now)
+        return topic
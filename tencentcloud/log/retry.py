@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) Tencent Cloud Computing
+# All rights reserved.
+
+import random
+import threading
+import time
+
+QUOTA_EXCEED_ERROR_CODE = 'SpeedQuotaExceed'
+
+
+class RetryBudget(object):
+    """ Retry tokens shared by all the calls of a client, one token is spent for each retry and tokens are
+    refilled at a fixed rate, so a failing endpoint sees at most refill_rate retries per second from the
+    client besides the burst.
+
+    :type capacity: int
+    :param capacity: max tokens, the allowed burst of retries
+
+    :type refill_rate: float
+    :param refill_rate: tokens refilled per second
+    """
+
+    def __init__(self, capacity=100, refill_rate=10):
+        self.capacity = float(capacity)
+        self.refill_rate = float(refill_rate)
+        self._tokens = self.capacity
+        self._last_refill = time.time()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            now = time.time()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.refill_rate)
+            self._last_refill = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def get_tokens(self):
+        return self._tokens
+
+
+class QuotaCooldown(object):
+    """ Cooldown shared by all the threads after the server answers SpeedQuotaExceed for a key (topic id or
+    api action). The cooldown doubles on consecutive quota errors and is reset by a successful call. It escalates
+    at most once per cooldown: the quota errors of the requests sent before the current cooldown began, or
+    coming while it runs, don't double it again.
+
+    :type base: float
+    :param base: cooldown in second after the first quota error
+
+    :type max_cooldown: float
+    :param max_cooldown: upper bound of the cooldown in second
+    """
+
+    def __init__(self, base=1, max_cooldown=10):
+        self.base = base
+        self.max_cooldown = max_cooldown
+        self._states = {}  # key -> [cooldown_until, consecutive_quota_errors, cooldown_start]
+        self._lock = threading.Lock()
+
+    def remaining(self, key):
+        state = self._states.get(key)
+        if state is None:
+            return 0
+        return max(0, state[0] - time.time())
+
+    def on_quota_exceeded(self, key, sent_at=None):
+        """
+        :param key: quota key
+        :param sent_at: time the failed request was sent, default None for now
+        :return: seconds left of the cooldown
+        """
+        with self._lock:
+            now = time.time()
+            state = self._states.setdefault(key, [0, 0, 0])
+            if now >= state[0] and (sent_at is None or sent_at >= state[2]):
+                state[1] += 1
+                cooldown = min(self.max_cooldown, self.base * (2 ** (state[1] - 1)))
+                state[0] = now + cooldown
+                state[2] = now
+            return max(0, state[0] - now)
+
+    def on_success(self, key):
+        if key in self._states:
+            with self._lock:
+                self._states.pop(key, None)
+
+
+class RetryPolicy(object):
+    """ Retry policy of LogClient._send, a policy could be shared by several clients.
+
+    :type max_retries: int
+    :param max_retries: default 9, max retries of a call after its first attempt, so 10 attempts at most like the
+        former fixed retry loop, None means retry until deadline or budget runs out
+
+    :type base_delay: float
+    :param base_delay: default 0.2, base of the exponential backoff in second
+
+    :type max_delay: float
+    :param max_delay: default 5, upper bound of one backoff in second, the real delay is a random value
+        (full jitter) between 0 and min(max_delay, base_delay * 2 ** retries)
+
+    :type deadline: float
+    :param deadline: default None, max seconds spent by one call including all the retries
+
+    :type budget: RetryBudget
+    :param budget: retry budget, default RetryBudget()
+
+    :type quota_cooldown: QuotaCooldown
+    :param quota_cooldown: cooldown on SpeedQuotaExceed, default QuotaCooldown()
+    """
+
+    def __init__(self, max_retries=9, base_delay=0.2, max_delay=5, deadline=None, budget=None,
+                 quota_cooldown=None):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.budget = budget if budget is not None else RetryBudget()
+        self.quota_cooldown = quota_cooldown if quota_cooldown is not None else QuotaCooldown()
+
+    def backoff(self, retries):
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** retries)))
+
+    def new_state(self, key=None, unlimited=False, shaped=False):
+        """
+        :param key: quota key of the call, normally topic id or api action
+        :param unlimited: ignore max_retries
+        :param shaped: a TopicRateLimiter paces the key, quota errors are retried after a backoff like the other
+            errors instead of cooling the key down
+        :return: RetryState
+        """
+        return RetryState(self, key, unlimited, shaped)
+
+
+class RetryState(object):
+    """ retry progress of one call, it only computes the delays, the caller sleeps """
+
+    def __init__(self, policy, key, unlimited=False, shaped=False):
+        self.policy = policy
+        self.key = key
+        self.unlimited = unlimited
+        self.shaped = shaped
+        self.retries = 0
+        self.start_time = time.time()
+        self.attempt_time = self.start_time
+
+    def time_left(self):
+        """
+        :return: seconds before the deadline, None if no deadline
+        """
+        if self.policy.deadline is None:
+            return None
+        return self.policy.deadline - (time.time() - self.start_time)
+
+    def quota_delay(self):
+        """
+        :return: seconds to wait before sending, when the key is cooling down after a quota error
+        """
+        remaining = self.policy.quota_cooldown.remaining(self.key)
+        if remaining <= 0:
+            return 0
+        # spread the threads waking up after the same cooldown
+        return remaining + random.uniform(0, self.policy.base_delay)
+
+    def timeout(self, default):
+        """ timeout of the attempt about to be sent, called right before each attempt """
+        self.attempt_time = time.time()
+        time_left = self.time_left()
+        if time_left is None:
+            return default
+        return max(0.1, min(default, time_left))
+
+    def on_success(self):
+        self.policy.quota_cooldown.on_success(self.key)
+
+    def on_error(self, ex, retryable):
+        """
+        :param ex: LogException of the attempt
+        :param retryable: if the error could be retried
+        :return: seconds to sleep before the next attempt, None to give up
+        """
+        if not retryable:
+            return None
+
+        policy = self.policy
+        if not self.unlimited and policy.max_retries is not None and self.retries >= policy.max_retries:
+            return None
+
+        if ex.get_error_code() == QUOTA_EXCEED_ERROR_CODE and not self.shaped:
+            policy.quota_cooldown.on_quota_exceeded(self.key, self.attempt_time)
+            delay = self.quota_delay()
+        else:
+            delay = policy.backoff(self.retries)
+
+        time_left = self.time_left()
+        if time_left is not None and time_left <= delay:
+            return None
+
+        if not policy.budget.try_acquire():
+            return None
+
+        self.retries += 1
+        return delay
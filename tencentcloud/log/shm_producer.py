@@ -0,0 +1,407 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) Tencent Cloud Computing
+# All rights reserved.
+
+import errno
+import logging
+import multiprocessing
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import six
+
+from tencentcloud.log.logclient import lz_compresss
+from tencentcloud.log.logitem import LogItem
+from tencentcloud.log.producer import DEFAULT_MAX_BATCH_SIZE
+from tencentcloud.log.wire import LogGroupEncoder, encode_varint
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RING_SIZE = 32 * 1024 * 1024
+DEFAULT_FLUSH_INTERVAL = 1
+DEFAULT_MAX_BLOCK_TIME = 0.1
+# seconds between two checks of the process holding the lock of the ring
+LOCK_CHECK_INTERVAL = 1
+# write offset, read offset, dropped logs, sent logs, failed logs, logs dropped on lock timeout, pid of the process
+# holding the lock. the offsets grow forever, modulo the capacity gives the position in the ring
+RING_HEADER = struct.Struct('<QQQQQQQ')
+LOCK_OWNER_OFFSET = 48
+# topic id and log entry length, topic id length
+RECORD_HEADER = struct.Struct('<IH')
+
+
+class SharedMemoryRing(object):
+    """ A ring buffer of records in a multiprocessing.shared_memory block, written by any process forked after
+    its creation and read by a single process. The writers are serialized by a process-shared lock, the reader
+    only takes it to move the offsets.
+
+    A process killed while holding the lock, e.g. a worker killed on timeout or by the OOM killer, would leave it
+    locked for good. The pid of the holder is kept in the header, a process waiting for the lock in vain checks it
+    and releases the lock of a dead holder; the record it was writing is lost, the offsets are only moved once a
+    record is complete. A holder killed in the few instructions between taking the lock and writing its pid, or
+    a holder alive but stopped, is not detected: send() then drops every log, see the lock timeouts counted in
+    get_counters().
+
+    :type capacity: int
+    :param capacity: bytes of the records the ring could hold
+
+    :type wakeup_bytes: int
+    :param wakeup_bytes: wake the reader up once so many bytes are waiting
+
+    :type context: multiprocessing context
+    :param context: context creating the lock and the event
+    """
+
+    def __init__(self, capacity, wakeup_bytes, context):
+        self.capacity = capacity
+        self.wakeup_bytes = wakeup_bytes
+        self._shm = shared_memory.SharedMemory(create=True, size=RING_HEADER.size + capacity)
+        self._buf = self._shm.buf
+        RING_HEADER.pack_into(self._buf, 0, 0, 0, 0, 0, 0, 0, 0)
+        self._lock = context.Lock()
+        # guards the drops on lock timeout, counted without the lock of the ring, and the recovery of the lock
+        self._timeout_lock = context.Lock()
+        self._data_event = context.Event()
+
+    def put(self, record, timeout):
+        """
+        :param record: bytes
+        :param timeout: max seconds to wait for the lock
+        :return: bool, False if the record is dropped, because the ring is full or the lock is not got in time
+        """
+        if not self._acquire(timeout):
+            with self._timeout_lock:
+                timeouts = struct.unpack_from('<Q', self._buf, 40)[0]
+                struct.pack_into('<Q', self._buf, 40, timeouts + 1)
+            return False
+        try:
+            write, read, dropped = struct.unpack_from('<QQQ', self._buf, 0)
+            if write - read + len(record) > self.capacity:
+                struct.pack_into('<Q', self._buf, 16, dropped + 1)
+                self._data_event.set()
+                return False
+            self._copy_in(write % self.capacity, record)
+            write += len(record)
+            struct.pack_into('<Q', self._buf, 0, write)
+        finally:
+            self._release()
+        if write - read >= self.wakeup_bytes:
+            self._data_event.set()
+        return True
+
+    def drain(self):
+        """ take all the records written, called by the reader only
+
+        :return: bytes
+        """
+        self._acquire(None)
+        try:
+            write, read = struct.unpack_from('<QQ', self._buf, 0)
+        finally:
+            self._release()
+        if write == read:
+            return b''
+        data = self._copy_out(read % self.capacity, write - read)
+        self._acquire(None)
+        try:
+            struct.pack_into('<Q', self._buf, 8, write)
+        finally:
+            self._release()
+        return data
+
+    def wait(self, timeout):
+        """ wait until wakeup_bytes are waiting or timeout, called by the reader only """
+        self._data_event.wait(timeout)
+        self._data_event.clear()
+
+    def wakeup(self):
+        self._data_event.set()
+
+    def add_counters(self, sent, failed):
+        """ add to the sent and failed logs counters, called by the reader only """
+        self._acquire(None)
+        try:
+            sent_count, failed_count = struct.unpack_from('<QQ', self._buf, 24)
+            struct.pack_into('<QQ', self._buf, 24, sent_count + sent, failed_count + failed)
+        finally:
+            self._release()
+
+    def get_counters(self):
+        """ :return: (dropped, sent, failed) logs, dropped counts the ring full and the lock timeouts """
+        dropped, sent, failed, timeouts = struct.unpack_from('<QQQQ', self._buf, 16)
+        return dropped + timeouts, sent, failed
+
+    def close(self, unlink=False):
+        self._buf.release()
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
+
+    def _acquire(self, timeout):
+        """ take the lock of the ring, taking it over from a dead holder
+
+        :param timeout: max seconds to wait, None to wait until the lock is got
+        :return: bool, False if the lock is not got in time
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            wait = LOCK_CHECK_INTERVAL if deadline is None else \
+                min(LOCK_CHECK_INTERVAL, max(0, deadline - time.time()))
+            if self._lock.acquire(timeout=wait):
+                struct.pack_into('<Q', self._buf, LOCK_OWNER_OFFSET, os.getpid())
+                return True
+            if not self._recover() and deadline is not None and time.time() >= deadline:
+                return False
+
+    def _release(self):
+        struct.pack_into('<Q', self._buf, LOCK_OWNER_OFFSET, 0)
+        self._lock.release()
+
+    def _recover(self):
+        """ release the lock if its holder is dead
+
+        :return: bool, if the lock is released
+        """
+        with self._timeout_lock:
+            owner = struct.unpack_from('<Q', self._buf, LOCK_OWNER_OFFSET)[0]
+            if not owner or _is_alive(owner):
+                return False
+            struct.pack_into('<Q', self._buf, LOCK_OWNER_OFFSET, 0)
+            try:
+                self._lock.release()
+            except ValueError:
+                # released meanwhile, not held any more
+                return False
+        logger.warning("the process %d died holding the lock of the shared memory ring, the lock is released", owner)
+        return True
+
+    def _copy_in(self, position, data):
+        start = RING_HEADER.size + position
+        first = min(len(data), self.capacity - position)
+        self._buf[start:start + first] = data[:first]
+        if first < len(data):
+            self._buf[RING_HEADER.size:RING_HEADER.size + len(data) - first] = data[first:]
+
+    def _copy_out(self, position, size):
+        start = RING_HEADER.size + position
+        first = min(size, self.capacity - position)
+        data = bytes(self._buf[start:start + first])
+        if first < size:
+            data += bytes(self._buf[RING_HEADER.size:RING_HEADER.size + size - first])
+        return data
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno != errno.ESRCH
+    return True
+
+
+class SharedMemoryProducer(object):
+    """ Producer shared by forked processes, e.g. the workers of gunicorn or of a multiprocessing pool.
+    send() encodes the log and writes it into a SharedMemoryRing without waiting for the network, a single
+    sender process drains the ring every flush_interval seconds, or as soon as max_batch_size bytes are
+    waiting, and sends the logs of each topic in batches through put_log_lz4 on its own connections.
+    A log is sent within flush_interval seconds plus the time of the requests, logs are dropped and counted
+    when the ring is full. Requires python 3.8+ (multiprocessing.shared_memory) and fork.
+
+        producer = SharedMemoryProducer(client, source='10.0.0.1')
+        producer.start()  # before forking the workers
+        ...
+        producer.send(topic_id, {'level': 'INFO', 'message': 'hello'})  # in any worker
+        ...
+        producer.close()  # in the process which started it
+
+    :type client: LogClient
+    :param client: client of the sender process, which gives it a session of its own
+
+    :type ring_size: int
+    :param ring_size: default 33554432 (32MB), bytes of encoded logs the ring could hold
+
+    :type max_batch_size: int
+    :param max_batch_size: default 524288, max bytes of encoded logs sent in one request
+
+    :type flush_interval: float
+    :param flush_interval: default 1, max seconds between two drains of the ring
+
+    :type io_threads: int
+    :param io_threads: default 2, threads of the sender process sending the batches of a drain
+
+    :type source: string
+    :param source: source of the log groups
+
+    :type filename: string
+    :param filename: filename of the log groups
+
+    :type tags: dict or tuple(key-value) list
+    :param tags: tags of the log groups
+
+    :type max_block_time: float
+    :param max_block_time: default 0.1, max seconds send() waits for the lock of the ring before dropping the log
+    """
+
+    def __init__(self, client, ring_size=DEFAULT_RING_SIZE, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, io_threads=2, source=None, filename=None, tags=None,
+                 max_block_time=DEFAULT_MAX_BLOCK_TIME):
+        if shared_memory is None:
+            raise ImportError('SharedMemoryProducer requires multiprocessing.shared_memory of python 3.8+')
+
+        self.client = client
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.io_threads = io_threads
+        self.source = source
+        self.filename = filename
+        self.tags = tags
+        self.max_block_time = max_block_time
+
+        self._context = multiprocessing.get_context('fork')
+        self._ring = SharedMemoryRing(ring_size, max_batch_size, self._context)
+        self._stop_event = self._context.Event()
+        self._sender = None
+        self._owner_pid = os.getpid()
+        # encoders are per thread, and per process after a fork
+        self._local = threading.local()
+
+    def start(self):
+        """ start the sender process, before forking the processes calling send() """
+        self._sender = self._context.Process(target=self._run_sender, name='cls-shm-producer-sender')
+        self._sender.daemon = True
+        self._sender.start()
+
+    def send(self, topic_id, log, timestamp=None):
+        """ Write a log into the ring, safe in any process forked after the creation of the producer
+
+        :type topic_id: string
+        :param topic_id: topic id
+
+        :type log: LogItem, dict or tuple(key-value) list
+        :param log: the log, other values than strings are converted by six.text_type
+
+        :type timestamp: int
+        :param timestamp: time of a dict or list log, default the current time
+
+        :return: bool, False if the log is dropped because the ring is full or its lock is not got in time
+        """
+        if isinstance(log, LogItem):
+            timestamp = log.get_time()
+            contents = log.get_contents()
+        else:
+            contents = log.items() if isinstance(log, dict) else log
+        contents = [(key, value if isinstance(value, six.string_types) else six.text_type(value))
+                    for key, value in contents]
+
+        entry = self._encoder().encode_log_group([contents], timestamp=timestamp)
+        topic = topic_id.encode('utf8')
+        record = RECORD_HEADER.pack(len(topic) + len(entry), len(topic)) + topic + entry
+        return self._ring.put(record, self.max_block_time)
+
+    def get_dropped_count(self):
+        """ logs dropped because the ring was full or its lock not got in time, by all the processes """
+        return self._ring.get_counters()[0]
+
+    def get_sent_count(self):
+        """ logs accepted by the server """
+        return self._ring.get_counters()[1]
+
+    def get_failed_count(self):
+        """ logs not sent because put_log_lz4 failed """
+        return self._ring.get_counters()[2]
+
+    def close(self, timeout=None):
+        """ Send the logs left in the ring and stop the sender process, only in the process which created the
+        producer, other processes just stop using it
+
+        :type timeout: float
+        :param timeout: max seconds to wait for the sender process
+        """
+        if os.getpid() != self._owner_pid:
+            return
+        if self._sender is not None:
+            self._stop_event.set()
+            self._ring.wakeup()
+            self._sender.join(timeout)
+            self._sender = None
+        self._ring.close(unlink=True)
+
+    def _encoder(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.pid = os.getpid()
+            local.encoder = LogGroupEncoder()
+        return local.encoder
+
+    def _run_sender(self):
+        # the connections inherited from the parent are not ours
+        self.client.reset_session()
+        group_fields = LogGroupEncoder().encode_log_group([], source=self.source, filename=self.filename,
+                                                          tags=self.tags)
+        executor = ThreadPoolExecutor(max_workers=self.io_threads)
+        try:
+            while True:
+                self._ring.wait(self.flush_interval)
+                stopping = self._stop_event.is_set()
+                batches = self._split_batches(self._ring.drain())
+                results = executor.map(lambda batch: self._send_batch(batch[0], batch[1], batch[2], group_fields),
+                                       batches)
+                sent = failed = 0
+                for count, ok in results:
+                    if ok:
+                        sent += count
+                    else:
+                        failed += count
+                if sent or failed:
+                    self._ring.add_counters(sent, failed)
+                if stopping:
+                    break
+        finally:
+            executor.shutdown()
+            self.client.close()
+
+    def _split_batches(self, data):
+        """ :return: list of (topic_id, log entries, log count), a batch holds at most max_batch_size bytes """
+        topics = OrderedDict()
+        batches = []
+        position = 0
+        while position < len(data):
+            length, topic_length = RECORD_HEADER.unpack_from(data, position)
+            position += RECORD_HEADER.size
+            topic_id = data[position:position + topic_length].decode('utf8')
+            entry = data[position + topic_length:position + length]
+            position += length
+
+            batch = topics.get(topic_id)
+            if batch is not None and batch[3] + len(entry) > self.max_batch_size:
+                batches.append(topics.pop(topic_id))
+                batch = None
+            if batch is None:
+                batch = topics[topic_id] = [topic_id, [], 0, 0]
+            batch[1].append(entry)
+            batch[2] += 1
+            batch[3] += len(entry)
+        batches.extend(topics.values())
+        return [(topic_id, entries, count) for topic_id, entries, count, _ in batches]
+
+    def _send_batch(self, topic_id, entries, count, group_fields):
+        # the entries are the logs fields of a LogGroup, followed by its other fields they make the group
+        log_group = b''.join(entries) + group_fields
+        body = b'\x0a' + encode_varint(len(log_group)) + log_group
+        try:
+            self.client.put_log_lz4(topic_id, lz_compresss(body))
+            return count, True
+        except Exception as e:
+            logger.warning("fail to send %d logs to topic %s: %s", count, topic_id, e)
+            return count, False
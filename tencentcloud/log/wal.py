@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) Tencent Cloud Computing
+# All rights reserved.
+
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+from tencentcloud.log.logexception import LogException
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEGMENT_SIZE = 64 * 1024 * 1024
+SEGMENT_MAGIC = b'CLSWAL01'
+SEGMENT_SUFFIX = '.wal'
+# body length, crc32 of topic id and body, log count, acked flag, topic id length. a zero length ends a segment
+RECORD_HEADER = struct.Struct('<IIIBH')
+ACKED_FLAG_OFFSET = 12
+
+
+class WalRecord(object):
+    """ a batch written in the write-ahead log, its body is read back from the segment when it is sent """
+
+    __slots__ = ('segment', 'position', 'topic_id', 'log_count', 'size', 'sequence')
+
+    def __init__(self, segment, position, topic_id, log_count, size, sequence):
+        self.segment = segment
+        self.position = position
+        self.topic_id = topic_id
+        self.log_count = log_count
+        self.size = size
+        self.sequence = sequence
+
+    def __lt__(self, other):
+        return self.sequence < other.sequence
+
+
+class WalSegment(object):
+    """ a memory-mapped segment file, records are appended until it is full and the file is deleted once all
+    its records are acknowledged """
+
+    def __init__(self, path, segment_id, size=None):
+        self.path = path
+        self.segment_id = segment_id
+        if size is not None:
+            with open(path, 'wb') as f:
+                f.write(SEGMENT_MAGIC)
+                f.truncate(size)
+        self._file = open(path, 'r+b')
+        self.mmap = mmap.mmap(self._file.fileno(), 0)
+        self.size = len(self.mmap)
+        self.write_position = len(SEGMENT_MAGIC)
+        self.live_count = 0
+        self.closed = False
+
+    def is_valid(self):
+        return self.size >= len(SEGMENT_MAGIC) and self.mmap[:len(SEGMENT_MAGIC)] == SEGMENT_MAGIC
+
+    def scan(self):
+        """ read the records written by a former process, up to the first torn or empty one
+
+        :return: list of (position, topic_id, log_count, body length, acked)
+        """
+        records = []
+        position = len(SEGMENT_MAGIC)
+        while position + RECORD_HEADER.size <= self.size:
+            length, crc, log_count, acked, topic_length = RECORD_HEADER.unpack_from(self.mmap, position)
+            payload_start = position + RECORD_HEADER.size
+            payload_end = payload_start + topic_length + length
+            if length == 0 or payload_end > self.size:
+                break
+            if zlib.crc32(self.mmap[payload_start:payload_end]) & 0xffffffff != crc:
+                logger.warning("torn record at %d of write-ahead log segment %s, ignore the rest", position,
+                               self.path)
+                break
+            topic_id = self.mmap[payload_start:payload_start + topic_length].decode('utf8')
+            records.append((position, topic_id, log_count, length, acked))
+            position = payload_end
+        self.write_position = position
+        return records
+
+    def room(self):
+        return self.size - self.write_position
+
+    def append(self, topic_id, body, log_count, sync):
+        topic = topic_id.encode('utf8')
+        position = self.write_position
+        payload_start = position + RECORD_HEADER.size
+        payload_end = payload_start + len(topic) + len(body)
+        # the payload first, the header validates it
+        self.mmap[payload_start:payload_start + len(topic)] = topic
+        self.mmap[payload_start + len(topic):payload_end] = body
+        crc = zlib.crc32(body, zlib.crc32(topic)) & 0xffffffff
+        RECORD_HEADER.pack_into(self.mmap, position, len(body), crc, log_count, 0, len(topic))
+        if sync:
+            start = position - position % mmap.ALLOCATIONGRANULARITY
+            self.mmap.flush(start, payload_end - start)
+        self.write_position = payload_end
+        self.live_count += 1
+        return position
+
+    def read(self, position):
+        length, _, _, _, topic_length = RECORD_HEADER.unpack_from(self.mmap, position)
+        body_start = position + RECORD_HEADER.size + topic_length
+        return self.mmap[body_start:body_start + length]
+
+    def ack(self, position):
+        self.mmap[position + ACKED_FLAG_OFFSET:position + ACKED_FLAG_OFFSET + 1] = b'\x01'
+        self.live_count -= 1
+
+    def close(self):
+        self.closed = True
+        self.mmap.close()
+        self._file.close()
+
+
+class WriteAheadLog(object):
+    """ Append-only log of the lz4 compressed LogGroupList bodies of the producer batches, stored in
+    memory-mapped segment files of a directory. A record is flagged once the server acknowledges it, and a
+    segment is deleted once all its records are acknowledged. The records left by a former process are
+    returned by recover() in the order they were written.
+
+    :type directory: string
+    :param directory: directory of the segment files, only one WriteAheadLog may use it at a time
+
+    :type segment_size: int
+    :param segment_size: default 67108864 (64MB), size of a segment file, a bigger record gets a segment of its own
+
+    :type sync: bool
+    :param sync: default True, msync each record before append returns, else the records survive a crash of
+        the process but not of the host
+    """
+
+    def __init__(self, directory, segment_size=DEFAULT_SEGMENT_SIZE, sync=True):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.sync = sync
+        self._lock = threading.Lock()
+        self._segments = []
+        self._active = None
+        self._next_segment_id = 1
+        self._sequence = 0
+        self._pending_count = 0
+        self._pending_bytes = 0
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._recovered = self._load_segments()
+
+    def _load_segments(self):
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith(SEGMENT_SUFFIX))
+        records = []
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                segment_id = int(name[:-len(SEGMENT_SUFFIX)])
+            except ValueError:
+                continue
+            self._next_segment_id = max(self._next_segment_id, segment_id + 1)
+            if os.path.getsize(path) < len(SEGMENT_MAGIC):
+                logger.warning("ignore write-ahead log segment %s, truncated", path)
+                continue
+            segment = WalSegment(path, segment_id)
+            if not segment.is_valid():
+                logger.warning("ignore write-ahead log segment %s, bad header", path)
+                segment.close()
+                continue
+
+            for position, topic_id, log_count, length, acked in segment.scan():
+                if acked:
+                    continue
+                segment.live_count += 1
+                records.append(self._new_record(segment, position, topic_id, log_count, length))
+            if segment.live_count == 0:
+                self._remove_segment(segment)
+            else:
+                self._segments.append(segment)
+        return records
+
+    def _new_record(self, segment, position, topic_id, log_count, size):
+        self._sequence += 1
+        self._pending_count += 1
+        self._pending_bytes += size
+        return WalRecord(segment, position, topic_id, log_count, size, self._sequence)
+
+    def recover(self):
+        """ the records not acknowledged by a former process, once
+
+        :return: list of WalRecord, in the order they were written
+        """
+        with self._lock:
+            records, self._recovered = self._recovered, []
+        return records
+
+    def append(self, topic_id, body, log_count):
+        """ write a batch
+
+        :type topic_id: string
+        :param topic_id: topic id of the batch
+
+        :type body: bytes
+        :param body: the lz4 compressed LogGroupList, as sent by put_log_raw
+
+        :type log_count: int
+        :param log_count: logs in the batch
+
+        :return: WalRecord
+        """
+        record_size = RECORD_HEADER.size + len(topic_id.encode('utf8')) + len(body)
+        with self._lock:
+            if self._active is None or self._active.room() < record_size:
+                self._roll(record_size)
+            position = self._active.append(topic_id, body, log_count, self.sync)
+            return self._new_record(self._active, position, topic_id, log_count, len(body))
+
+    def read(self, record):
+        """ :return: bytes, the body of the record """
+        with self._lock:
+            if record.segment.closed:
+                raise LogException('WalRecordReclaimed', 'the record is acknowledged and its segment deleted')
+            return record.segment.read(record.position)
+
+    def ack(self, record):
+        """ flag the record as acknowledged by the server, its segment is deleted with its last record """
+        with self._lock:
+            if record.segment.closed:
+                # acknowledged after close, the next producer on the directory sends it again
+                return
+            record.segment.ack(record.position)
+            self._pending_count -= 1
+            self._pending_bytes -= record.size
+            if record.segment.live_count == 0 and record.segment is not self._active:
+                self._segments.remove(record.segment)
+                self._remove_segment(record.segment)
+
+    def get_pending_count(self):
+        """ records not acknowledged yet """
+        return self._pending_count
+
+    def get_pending_bytes(self):
+        """ compressed bytes of the records not acknowledged yet """
+        return self._pending_bytes
+
+    def close(self):
+        with self._lock:
+            for segment in self._segments:
+                if segment.live_count == 0:
+                    self._remove_segment(segment)
+                else:
+                    segment.close()
+            self._segments = []
+            self._active = None
+
+    def _roll(self, record_size):
+        # called with the lock held
+        if self._active is not None and self._active.live_count == 0:
+            self._segments.remove(self._active)
+            self._remove_segment(self._active)
+        segment_id = self._next_segment_id
+        self._next_segment_id += 1
+        path = os.path.join(self.directory, '%020d%s' % (segment_id, SEGMENT_SUFFIX))
+        size = max(self.segment_size, len(SEGMENT_MAGIC) + record_size + RECORD_HEADER.size)
+        self._active = WalSegment(path, segment_id, size)
+        self._segments.append(self._active)
+
+    @staticmethod
+    def _remove_segment(segment):
+        segment.close()
+        try:
+            os.remove(segment.path)
+        except OSError as e:
+            logger.warning("fail to remove write-ahead log segment %s: %s", segment.path, e)
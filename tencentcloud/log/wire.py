@@ -0,0 +1,453 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright (C) Tencent Cloud Computing
+# All rights reserved.
+
+import time
+
+import six
+
+from tencentcloud.log.logitem import LogItem
+
+# tags of the cls.proto fields, (field number << 3) | wire type
+_LOG_TIME = b'\x08'
+_LOG_CONTENTS = b'\x12'
+_CONTENT_KEY = b'\x0a'
+_CONTENT_VALUE = b'\x12'
+_LOG_GROUP_LOGS = b'\x0a'
+_LOG_GROUP_CONTEXT_FLOW = b'\x12'
+_LOG_GROUP_FILENAME = b'\x1a'
+_LOG_GROUP_SOURCE = b'\x22'
+_LOG_GROUP_LOG_TAGS = b'\x2a'
+_LOG_GROUP_LIST_LOG_GROUPS = b'\x0a'
+
+_MAX_KEY_CACHE_SIZE = 4096
+
+
+def _encode_varint(value):
+    if value < 0:
+        value += 1 << 64
+    bits = value & 0x7f
+    value >>= 7
+    result = bytearray()
+    while value:
+        result.append(0x80 | bits)
+        bits = value & 0x7f
+        value >>= 7
+    result.append(bits)
+    return bytes(result)
+
+
+_VARINTS = [_encode_varint(i) for i in range(2048)]
+
+
+def encode_varint(value):
+    """ :return: bytes, value in protobuf varint encoding, negative values as 10 bytes like int64 """
+    if 0 <= value < 2048:
+        return _VARINTS[value]
+    return _encode_varint(value)
+
+
+def _to_bytes(value):
+    return value.encode('utf8') if isinstance(value, six.text_type) else value
+
+
+class LogGroupEncoder(object):
+    """ Writes the cls.proto wire format of a LogGroup straight from LogItems or (key, value) lists, the
+    output is the same as building a cls_pb2.LogGroup and calling SerializeToString, without a protobuf
+    object per log and per content. The logs are written into a bytearray reused by the next calls, and the
+    encoded content keys are cached, an encoder is not thread safe.
+
+        encoder = LogGroupEncoder()
+        body = encoder.encode_log_group_list(logs, source='127.0.0.1')
+        client.put_log_lz4(topic_id, lz_compresss(body))
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self._keys = {}
+
+    def encode_log_group(self, logs, source=None, filename=None, tags=None, context_flow=None, timestamp=None):
+        """ Encode a LogGroup
+
+        :type logs: iterable
+        :param logs: each log is a LogItem, a (timestamp, contents) pair, or contents logged at timestamp, the
+            contents being a (key, value) list of strings
+
+        :type source: string
+        :param source: source of the log group, None to leave it unset
+
+        :type filename: string
+        :param filename: filename of the log group
+
+        :type tags: dict or tuple(key-value) list
+        :param tags: tags of the log group
+
+        :type context_flow: string
+        :param context_flow: contextFlow of the log group
+
+        :type timestamp: int
+        :param timestamp: time of the logs given as contents only, default the current time
+
+        :return: bytes, as cls_pb2.LogGroup.SerializeToString
+        """
+        buf = self.buffer
+        del buf[:]
+        self._write_log_group(buf, logs, source, filename, tags, context_flow, timestamp)
+        return bytes(buf)
+
+    def encode_log_group_list(self, logs, source=None, filename=None, tags=None, context_flow=None,
+                              timestamp=None):
+        """ Encode a LogGroupList of one LogGroup, the body of put_log_raw before compression, see
+        encode_log_group for the parameters
+
+        :return: bytes, as cls_pb2.LogGroupList.SerializeToString
+        """
+        buf = self.buffer
+        del buf[:]
+        self._write_log_group(buf, logs, source, filename, tags, context_flow, timestamp)
+        buf[0:0] = _LOG_GROUP_LIST_LOG_GROUPS + encode_varint(len(buf))
+        return bytes(buf)
+
+    def encode_columns(self, times, keys, columns, source=None, filename=None, tags=None, context_flow=None,
+                       as_list=False):
+        """ Encode logs given as columns, see LogBatchBuilder
+
+        :type times: sequence
+        :param times: time of each log
+
+        :type keys: sequence
+        :param keys: content keys
+
+        :type columns: sequence
+        :param columns: one sequence of values per key, a None value is not written
+
+        :type as_list: bool
+        :param as_list: encode a LogGroupList of one LogGroup instead of a LogGroup
+
+        see encode_log_group for the other parameters
+
+        :return: bytes
+        """
+        buf = self.buffer
+        del buf[:]
+        key_fields = []
+        for key in keys:
+            key = _to_bytes(key)
+            key_fields.append(_CONTENT_KEY + encode_varint(len(key)) + key)
+
+        for row, log_time in enumerate(times):
+            start = len(buf)
+            buf += _LOG_TIME
+            buf += encode_varint(log_time)
+            for key_field, column in zip(key_fields, columns):
+                value = column[row]
+                if value is None:
+                    continue
+                if isinstance(value, six.text_type):
+                    value = value.encode('utf8')
+                elif not isinstance(value, six.binary_type):
+                    value = six.text_type(value).encode('utf8')
+                value_length = encode_varint(len(value))
+                buf += _LOG_CONTENTS
+                buf += encode_varint(len(key_field) + 1 + len(value_length) + len(value))
+                buf += key_field
+                buf += _CONTENT_VALUE
+                buf += value_length
+                buf += value
+            buf[start:start] = _LOG_GROUP_LOGS + encode_varint(len(buf) - start)
+
+        self._write_log_group(buf, (), source, filename, tags, context_flow, None)
+        if as_list:
+            buf[0:0] = _LOG_GROUP_LIST_LOG_GROUPS + encode_varint(len(buf))
+        return bytes(buf)
+
+    def _write_log_group(self, buf, logs, source, filename, tags, context_flow, timestamp):
+        keys = self._keys
+        if len(keys) > _MAX_KEY_CACHE_SIZE:
+            keys.clear()
+        default_time = None
+
+        for log in logs:
+            if isinstance(log, LogItem):
+                log_time = log.timestamp
+                contents = log.contents
+            elif isinstance(log, tuple) and len(log) == 2 and isinstance(log[0], six.integer_types):
+                log_time, contents = log
+            else:
+                if default_time is None:
+                    default_time = int(timestamp) if timestamp is not None else int(time.time())
+                log_time = default_time
+                contents = log
+
+            start = len(buf)
+            buf += _LOG_TIME
+            buf += encode_varint(log_time)
+            for key, value in contents:
+                key_field = keys.get(key)
+                if key_field is None:
+                    encoded_key = _to_bytes(key)
+                    key_field = keys[key] = _CONTENT_KEY + encode_varint(len(encoded_key)) + encoded_key
+                value = _to_bytes(value)
+                value_length = encode_varint(len(value))
+                buf += _LOG_CONTENTS
+                buf += encode_varint(len(key_field) + 1 + len(value_length) + len(value))
+                buf += key_field
+                buf += _CONTENT_VALUE
+                buf += value_length
+                buf += value
+            # the length of a log is known once its contents are written
+            buf[start:start] = _LOG_GROUP_LOGS + encode_varint(len(buf) - start)
+
+        if context_flow is not None:
+            self._write_string(buf, _LOG_GROUP_CONTEXT_FLOW, context_flow)
+        if filename is not None:
+            self._write_string(buf, _LOG_GROUP_FILENAME, filename)
+        if source is not None:
+            self._write_string(buf, _LOG_GROUP_SOURCE, source)
+        if tags:
+            for key, value in (tags.items() if isinstance(tags, dict) else tags):
+                key = _to_bytes(key)
+                value = _to_bytes(value)
+                tag = _CONTENT_KEY + encode_varint(len(key)) + key + _CONTENT_VALUE + encode_varint(len(value)) + value
+                buf += _LOG_GROUP_LOG_TAGS
+                buf += encode_varint(len(tag))
+                buf += tag
+
+    @staticmethod
+    def _write_string(buf, tag, value):
+        value = _to_bytes(value)
+        buf += tag
+        buf += encode_varint(len(value))
+        buf += value
+
+
+class LogRecord(object):
+    """ A log decoded by LogGroupDecoder, the keys tuple is shared by the logs with the same keys
+
+    :type time: int
+    :param time: time of the log
+
+    :type keys: tuple
+    :param keys: content keys
+
+    :type values: tuple
+    :param values: content values, in the order of keys
+    """
+
+    __slots__ = ('time', 'keys', 'values')
+
+    def __init__(self, time, keys, values):
+        self.time = time
+        self.keys = keys
+        self.values = values
+
+    @property
+    def contents(self):
+        """ :return: list of (key, value) """
+        return list(zip(self.keys, self.values))
+
+    def get(self, key, default=None):
+        """ :return: value of the first content with key, or default """
+        try:
+            return self.values[self.keys.index(key)]
+        except ValueError:
+            return default
+
+    def to_dict(self):
+        return dict(zip(self.keys, self.values))
+
+    def __reduce__(self):
+        return LogRecord, (self.time, self.keys, self.values)
+
+    def __repr__(self):
+        return 'LogRecord(time={0}, contents={1})'.format(self.time, self.contents)
+
+
+class LogGroupRecord(object):
+    """ A log group decoded by LogGroupDecoder, with the fields of cls_pb2.LogGroup, unset strings are ''
+
+    :type logs: list
+    :param logs: list of LogRecord
+
+    :type tags: tuple
+    :param tags: tuple of (key, value)
+    """
+
+    __slots__ = ('logs', 'contextFlow', 'filename', 'source', 'tags')
+
+    def __init__(self, logs, context_flow=u'', filename=u'', source=u'', tags=()):
+        self.logs = logs
+        self.contextFlow = context_flow
+        self.filename = filename
+        self.source = source
+        self.tags = tags
+
+    def __reduce__(self):
+        return LogGroupRecord, (self.logs, self.contextFlow, self.filename, self.source, self.tags)
+
+    def __repr__(self):
+        return 'LogGroupRecord(filename={0!r}, source={1!r}, tags={2!r}, logs={3})'.format(
+            self.filename, self.source, self.tags, len(self.logs))
+
+
+def _read_varint(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        result |= (b & 0x7f) << shift
+        if b < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _skip_field(data, pos, tag):
+    wire_type = tag & 0x07
+    if wire_type == 0:
+        return _read_varint(data, pos)[1]
+    if wire_type == 1:
+        return pos + 8
+    if wire_type == 2:
+        length, pos = _read_varint(data, pos)
+        return pos + length
+    if wire_type == 5:
+        return pos + 4
+    raise ValueError('unsupported wire type {0}'.format(wire_type))
+
+
+class LogGroupDecoder(object):
+    """ Reads the cls.proto wire format of a LogGroup into a LogGroupRecord of LogRecords, instead of the
+    protobuf objects built by ParseFromString. The content keys and the keys tuples are interned across all
+    the log groups decoded by the same decoder, e.g. the log groups of a pull_logs response. A decoder is not
+    thread safe.
+    """
+
+    def __init__(self):
+        self._strings = {}
+        self._keys_tuples = {}
+
+    def decode_log_group(self, data):
+        """
+        :type data: bytes, bytearray or memoryview
+        :param data: a serialized LogGroup
+
+        :return: LogGroupRecord
+        """
+        if six.PY2 or isinstance(data, memoryview):
+            # indexing gives ints, slicing copies only the strings
+            data = bytearray(data)
+        strings = self._strings
+        keys_tuples = self._keys_tuples
+
+        logs = []
+        context_flow = filename = source = u''
+        tags = []
+        pos = 0
+        end = len(data)
+        while pos < end:
+            tag = data[pos]
+            pos += 1
+            if tag > 0x7f:
+                tag, pos = _read_varint(data, pos - 1)
+            if tag & 0x07 != 2:
+                pos = _skip_field(data, pos, tag)
+                continue
+            length = data[pos]
+            if length < 0x80:
+                pos += 1
+            else:
+                length, pos = _read_varint(data, pos)
+            field_end = pos + length
+
+            if tag == 0x0a:
+                logs.append(self._decode_log(data, pos, field_end, strings, keys_tuples))
+            elif tag == 0x2a:
+                tags.append(self._decode_pair(data, pos, field_end))
+            elif tag == 0x12:
+                context_flow = data[pos:field_end].decode('utf8')
+            elif tag == 0x1a:
+                filename = self._intern(data[pos:field_end])
+            elif tag == 0x22:
+                source = self._intern(data[pos:field_end])
+            pos = field_end
+        return LogGroupRecord(logs, context_flow, filename, source, tuple(tags))
+
+    def _intern(self, raw):
+        raw = bytes(raw)
+        value = self._strings.get(raw)
+        if value is None:
+            value = self._strings[raw] = raw.decode('utf8')
+        return value
+
+    def _decode_log(self, data, pos, end, strings, keys_tuples):
+        log_time = 0
+        keys = []
+        values = []
+        while pos < end:
+            tag = data[pos]
+            pos += 1
+            if tag == 0x08:
+                log_time, pos = _read_varint(data, pos)
+                if log_time >= 1 << 63:
+                    log_time -= 1 << 64
+                continue
+            if tag != 0x12:
+                if tag > 0x7f:
+                    tag, pos = _read_varint(data, pos - 1)
+                pos = _skip_field(data, pos, tag)
+                continue
+
+            length = data[pos]
+            if length < 0x80:
+                pos += 1
+            else:
+                length, pos = _read_varint(data, pos)
+            content_end = pos + length
+
+            key = value = u''
+            while pos < content_end:
+                field = data[pos]
+                pos += 1
+                if field & 0x07 != 2:
+                    pos = _skip_field(data, pos, field)
+                    continue
+                length = data[pos]
+                if length < 0x80:
+                    pos += 1
+                else:
+                    length, pos = _read_varint(data, pos)
+                if field == 0x0a:
+                    raw = bytes(data[pos:pos + length])
+                    key = strings.get(raw)
+                    if key is None:
+                        key = strings[raw] = raw.decode('utf8')
+                elif field == 0x12:
+                    value = data[pos:pos + length].decode('utf8')
+                pos += length
+            keys.append(key)
+            values.append(value)
+
+        keys = tuple(keys)
+        interned = keys_tuples.get(keys)
+        if interned is None:
+            interned = keys_tuples[keys] = keys
+        return LogRecord(log_time, interned, tuple(values))
+
+    def _decode_pair(self, data, pos, end):
+        key = value = u''
+        while pos < end:
+            field = data[pos]
+            pos += 1
+            if field & 0x07 != 2:
+                pos = _skip_field(data, pos, field)
+                continue
+            length, pos = _read_varint(data, pos)
+            if field == 0x0a:
+                key = self._intern(data[pos:pos + length])
+            elif field == 0x12:
+                value = self._intern(data[pos:pos + length])
+            pos += length
+        return key, value
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Consumer throughput against the local stand-in server, with the fetched batches handed over to the
+processors as is, with the former deep copy of every batch, with several batches prefetched, and with
+the log groups decoded into LogGroupRecords.
+
+    python tests/benchmark_consumer_throughput.py [seconds] [partitions]
+"""
+import copy
+import sys
+import threading
+import time
+
+from mock_cls_server import MockClsServer
+from tencentcloud.log.consumer import ConsumerProcessorBase, ConsumerWorker, LogHubConfig
+from tencentcloud.log.consumer import worker as consumer_worker
+from tencentcloud.log.consumer.partition_worker import PartitionConsumerWorker
+
+
+class CountingProcessor(ConsumerProcessorBase):
+    lock = threading.Lock()
+    log_count = 0
+
+    def process(self, log_groups, offset_tracker):
+        count = 0
+        for log_group in log_groups:
+            count += len(log_group.logs)
+        with CountingProcessor.lock:
+            CountingProcessor.log_count += count
+        self.save_offset(offset_tracker)
+
+
+class DeepCopyPartitionConsumerWorker(PartitionConsumerWorker):
+    """ the former behaviour: every fetched batch is deep copied before being processed """
+
+    def _generate_next_task(self):
+        if self.prefetched_log_groups:
+            self.prefetched_log_groups[0] = copy.deepcopy(self.prefetched_log_groups[0])
+        super(DeepCopyPartitionConsumerWorker, self)._generate_next_task()
+
+
+def run(server, seconds, partition_worker_class, **option_kwargs):
+    consumer_worker.PartitionConsumerWorker = partition_worker_class
+    option = LogHubConfig(server.endpoint, 'id', 'key', '', 'logset', [server.topic_id], 'group', 'consumer',
+                          heartbeat_interval=1, data_fetch_interval=0.01, offset_start_time='begin',
+                          **option_kwargs)
+    CountingProcessor.log_count = 0
+    worker = ConsumerWorker(CountingProcessor, consumer_option=option)
+    worker.start()
+    # skip the first heart beat and initialization
+    time.sleep(2)
+    start_count, start = CountingProcessor.log_count, time.time()
+    time.sleep(seconds)
+    logs = CountingProcessor.log_count - start_count
+    cost = time.time() - start
+    worker.shutdown()
+    worker.join()
+    consumer_worker.PartitionConsumerWorker = PartitionConsumerWorker
+    return logs / cost
+
+
+def main(extra_modes=()):
+    seconds = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    partitions = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    server = MockClsServer(partition_count=partitions, log_groups_per_pull=1000, logs_per_group=10)
+    server.start()
+    server.point_yunapi_clients()
+    try:
+        modes = [('deep copy per batch', DeepCopyPartitionConsumerWorker, {}),
+                 ('hand over without copy', PartitionConsumerWorker, {}),
+                 ('prefetch depth 4', PartitionConsumerWorker, {'prefetch_depth': 4}),
+                 ('decode to records', PartitionConsumerWorker, {'decode_output': 'records'})] + list(extra_modes)
+        for name, partition_worker_class, option_kwargs in modes:
+            logs_per_second = run(server, seconds, partition_worker_class, **option_kwargs)
+            print('{0:<28} {1:>12.0f} logs/s'.format(name, logs_per_second))
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Compare put_log_raw throughput with a fresh connection per request (keep_alive=False, the former behaviour)
+and with the pooled keep-alive session, against a local stand-in server.
+
+    python tests/benchmark_http_session.py [threads] [requests_per_thread]
+"""
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from mock_cls_server import MockClsServer
+from tencentcloud.log.cls_pb2 import LogGroup
+from tencentcloud.log.logclient import LogClient
+
+
+def make_log_group():
+    log_group = LogGroup()
+    log_group.source = '127.0.0.1'
+    log = log_group.logs.add()
+    log.time = int(time.time())
+    for i in range(10):
+        content = log.contents.add()
+        content.key = 'key%d' % i
+        content.value = 'value%d' % i
+    return log_group
+
+
+def run(server, threads, count, **client_kwargs):
+    client = LogClient(server.endpoint, 'id', 'key', source='127.0.0.1', pool_maxsize=threads, **client_kwargs)
+    log_group = make_log_group()
+
+    def worker(_):
+        for _ in range(count):
+            client.put_log_raw('topic', log_group)
+
+    server.reset_counters()
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(worker, range(threads)))
+    cost = time.time() - start
+    client.close()
+    return threads * count / cost, server.connection_count
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    server = MockClsServer()
+    server.start()
+    try:
+        for name, kwargs in (('new connection per request', {'keep_alive': False}),
+                             ('pooled keep-alive session', {'keep_alive': True})):
+            qps, connections = run(server, threads, count, **kwargs)
+            print('{0:<28} {1:>10.1f} req/s {2:>8} connections'.format(name, qps, connections))
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Encode benchmark of a batch of small LogItems, building cls_pb2 objects and calling SerializeToString
+against LogGroupEncoder writing the wire format directly. Checks that both give the same bytes.
+Then the cost of building the batch: LogItems deep copying their contents, LogItem.wrap, and the columns
+of a LogBatchBuilder, each followed by the encoding.
+
+    python tests/benchmark_log_group_encode.py [logs] [rounds]
+"""
+import sys
+import time
+
+from tencentcloud.log.cls_pb2 import LogGroupList
+from tencentcloud.log.logitem import LogBatchBuilder, LogItem
+from tencentcloud.log.wire import LogGroupEncoder
+
+SOURCE = '10.0.0.1'
+FILENAME = '/var/log/app.log'
+TAGS = [('host', 'host-1'), ('service', 'web')]
+KEYS = ('level', 'logger', 'status', 'message')
+
+
+def row(i):
+    return 'INFO', 'app.handler', str(200 + i % 5), 'request %d served in %d ms' % (i, i % 97)
+
+
+def build_and_encode_log_items(encoder, count):
+    log_items = [LogItem(contents=list(zip(KEYS, row(i)))) for i in range(count)]
+    return encode_direct(encoder, log_items)
+
+
+def build_and_encode_wrapped(encoder, count):
+    now = int(time.time())
+    log_items = [LogItem.wrap(now, list(zip(KEYS, row(i)))) for i in range(count)]
+    return encode_direct(encoder, log_items)
+
+
+def build_and_encode_columns(encoder, count):
+    builder = LogBatchBuilder(KEYS)
+    for i in range(count):
+        builder.add(row(i))
+    return builder.encode_log_group_list(encoder, source=SOURCE, filename=FILENAME, tags=TAGS)
+
+
+def build_log_items(count):
+    return [LogItem(1700000000 + i, [('level', 'INFO'), ('logger', 'app.handler'), ('status', str(200 + i % 5)),
+                                     ('message', 'request %d served in %d ms' % (i, i % 97))])
+            for i in range(count)]
+
+
+def encode_protobuf(log_items):
+    log_group_list = LogGroupList()
+    log_group = log_group_list.logGroupList.add()
+    for log_item in log_items:
+        log = log_group.logs.add()
+        log.time = log_item.get_time()
+        for key, value in log_item.get_contents():
+            content = log.contents.add()
+            content.key = key
+            content.value = value
+    log_group.filename = FILENAME
+    log_group.source = SOURCE
+    for key, value in TAGS:
+        tag = log_group.logTags.add()
+        tag.key = key
+        tag.value = value
+    return log_group_list.SerializeToString()
+
+
+def encode_direct(encoder, log_items):
+    return encoder.encode_log_group_list(log_items, source=SOURCE, filename=FILENAME, tags=TAGS)
+
+
+def measure(name, encode, rounds, count):
+    start = time.time()
+    for _ in range(rounds):
+        body = encode()
+    cost = (time.time() - start) / rounds
+    print('{0:<32} {1:>8.2f} ms/batch {2:>12.0f} logs/s {3:>10} bytes'.format(name, cost * 1000, count / cost,
+                                                                           len(body)))
+    return body
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 4096
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    log_items = build_log_items(count)
+    encoder = LogGroupEncoder()
+    expected = measure('protobuf SerializeToString', lambda: encode_protobuf(log_items), rounds, count)
+    body = measure('LogGroupEncoder', lambda: encode_direct(encoder, log_items), rounds, count)
+    print('same bytes: {0}'.format(body == expected))
+
+    measure('build LogItem + encode', lambda: build_and_encode_log_items(encoder, count), rounds, count)
+    measure('build LogItem.wrap + encode', lambda: build_and_encode_wrapped(encoder, count), rounds, count)
+    measure('build LogBatchBuilder + encode', lambda: build_and_encode_columns(encoder, count), rounds, count)
+
+
+if __name__ == '__main__':
+    main()
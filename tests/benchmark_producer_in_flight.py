@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+LogProducer sending the logs of one topic to the local stand-in server answering each put after a round trip
+time: one batch in flight, several in flight, and several in flight with the batches of each source, or of
+each contextFlow, kept in order. Prints the logs per second and checks the order of the ordered logs.
+
+    python tests/benchmark_producer_in_flight.py [logs] [rtt]
+"""
+import sys
+import time
+
+import lz4.block
+
+from mock_cls_server import MockClsServer
+from tencentcloud.log.cls_pb2 import LogGroupList
+from tencentcloud.log.logclient import LogClient
+from tencentcloud.log.producer import LogProducer, ORDERING_CONTEXT_FLOW, ORDERING_NONE, ORDERING_SOURCE
+
+SOURCES = 4
+BATCH_COUNT = 200
+
+
+def run(server, count, io_threads, ordering, max_in_flight_per_topic=None):
+    client = LogClient(server.endpoint, 'id', 'key', source='127.0.0.1', pool_maxsize=io_threads)
+    producer = LogProducer(client, max_batch_count=BATCH_COUNT, linger=0.05, io_threads=io_threads,
+                           max_in_flight_per_topic=max_in_flight_per_topic, ordering=ordering)
+    start = time.time()
+    for i in range(count):
+        stream = str(i % SOURCES)
+        if ordering == ORDERING_SOURCE:
+            producer.send('topic', {'stream': stream, 'seq': i}, source='10.0.0.' + stream)
+        elif ordering == ORDERING_CONTEXT_FLOW and i % 2:
+            producer.send('topic', {'stream': stream, 'seq': i}, context_flow=stream)
+        else:
+            producer.send('topic', {'stream': 'unordered', 'seq': i})
+    producer.close()
+    return time.time() - start
+
+
+def out_of_order(server):
+    """ :return: logs of a source or contextFlow received before a log sent earlier """
+    last = {}
+    count = 0
+    for _, body in server.put_bodies:
+        # the raw size is unknown here, an upper bound is enough to decompress
+        data = lz4.block.decompress(body, uncompressed_size=len(body) * 255)
+        for log_group in LogGroupList.FromString(data).logGroupList:
+            for log in log_group.logs:
+                contents = dict((content.key, content.value) for content in log.contents)
+                stream, seq = contents['stream'], int(contents['seq'])
+                if stream != 'unordered':
+                    if seq < last.get(stream, -1):
+                        count += 1
+                    last[stream] = seq
+    return count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rtt = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+
+    server = MockClsServer(keep_put_bodies=True, put_delay=rtt)
+    server.start()
+    try:
+        for name, io_threads, ordering in (('1 in flight', 1, ORDERING_NONE),
+                                           ('8 in flight', 8, ORDERING_NONE),
+                                           ('8 in flight, by source', 8, ORDERING_SOURCE),
+                                           ('8 in flight, by contextFlow', 8, ORDERING_CONTEXT_FLOW)):
+            del server.put_bodies[:]
+            cost = run(server, count, io_threads, ordering)
+            print('{0:<28} {1:>10.0f} logs/s {2:>6} requests {3:>4} out of order'.format(
+                name, count / cost, len(server.put_bodies), out_of_order(server)))
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
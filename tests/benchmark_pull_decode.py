@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Decode benchmark of a synthetic pull_logs response, with the memory held by the decoded log groups for
+the protobuf objects of ParseFromString and the LogGroupRecords of LogGroupDecoder.
+
+    python tests/benchmark_pull_decode.py [response_megabytes]
+"""
+import base64
+import json
+import struct
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import snappy
+
+from tencentcloud.log.cls_pb2 import LogGroup
+from tencentcloud.log.columnar import log_groups_to_columns
+from tencentcloud.log.pulllog_response import PullLogResponse, MSGHEADERLEN, VERSION
+
+
+def build_log_group(index, logs_per_group=100):
+    log_group = LogGroup()
+    log_group.filename = '/var/log/app.log'
+    log_group.source = '10.0.0.%d' % (index % 255)
+    tag = log_group.logTags.add()
+    tag.key = 'host'
+    tag.value = 'host-%d' % (index % 16)
+    for i in range(logs_per_group):
+        log = log_group.logs.add()
+        log.time = 1700000000 + i
+        for key, value in (('level', 'INFO'), ('logger', 'app.handler'), ('status', str(200 + i % 5)),
+                           ('message', 'request %d served in %d ms' % (i, i % 97))):
+            content = log.contents.add()
+            content.key = key
+            content.value = value
+    return log_group
+
+
+def build_message(payload):
+    header = struct.pack('>iqq36s36si', VERSION, 1700000000, 1000, b'logset-' + b'0' * 29,
+                         b'topic-' + b'0' * 30, len(payload))
+    assert len(header) == MSGHEADERLEN
+    return base64.b64encode(header + payload).decode('ascii')
+
+
+def build_response(megabytes):
+    payload = build_log_group(0).SerializeToString()
+    messages = []
+    size = 0
+    while size < megabytes * 1024 * 1024:
+        messages.append(build_message(payload))
+        size += len(payload)
+    body = json.dumps({'Response': {'NextOffset': 100, 'Message': messages}}).encode('utf8')
+    return snappy.compress(body), len(messages), size
+
+
+def legacy_decode(message):
+    # the copying decode of the former Message.parse_message, kept for comparison
+    src = base64.b64decode(message)
+    struct.unpack('>i', src[:4])
+    content_len = struct.unpack('>qq36s36si', src[4:MSGHEADERLEN])[4]
+    if content_len != len(src[MSGHEADERLEN:]):
+        raise ValueError('bad length')
+    data = struct.unpack('>{}s'.format(content_len), src[MSGHEADERLEN:])[0]
+    log_group = LogGroup()
+    log_group.ParseFromString(data)
+    return log_group
+
+
+def measure(name, func, payload_size, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        cost = time.time() - start
+        best = cost if best is None else min(best, cost)
+    print('{0:<30} {1:>8.3f} s {2:>8.1f} MB/s'.format(name, best, payload_size / best / 1024 / 1024))
+
+
+def measure_memory(name, func):
+    tracemalloc.start()
+    result = func()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    print('{0:<30} {1:>8.1f} MB held'.format(name, size / 1024.0 / 1024))
+
+
+def main():
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    resp, count, payload_size = build_response(megabytes)
+    print('{0} log groups, {1:.1f} MB of LogGroup payload'.format(count, payload_size / 1024.0 / 1024))
+
+    messages = PullLogResponse(resp, {}).decompress_resp(resp)['Response']['Message']
+    measure('legacy copying decode', lambda: [legacy_decode(m) for m in messages], payload_size)
+    measure('PullLogResponse.log_groups', lambda: PullLogResponse(resp, {}).log_groups, payload_size)
+    measure('PullLogResponse.get_log_records', lambda: PullLogResponse(resp, {}).get_log_records(), payload_size)
+
+    log_groups = PullLogResponse(resp, {}).log_groups
+    measure('log_groups_to_flattern_list', lambda: PullLogResponse.log_groups_to_flattern_list(log_groups),
+            payload_size)
+    measure('log_groups_to_columns', lambda: log_groups_to_columns(log_groups), payload_size)
+
+    with ProcessPoolExecutor() as executor:
+        measure('process pool, log_group', lambda: PullLogResponse(resp, {}).decode_with_executor(executor),
+                payload_size)
+        measure('process pool, columns',
+                lambda: PullLogResponse(resp, {}).decode_with_executor(executor, output='columns'), payload_size)
+        measure('process pool, records',
+                lambda: PullLogResponse(resp, {}).decode_with_executor(executor, output='records'), payload_size)
+
+    responses = [PullLogResponse(resp, {}), PullLogResponse(resp, {})]
+    measure_memory('ParseFromString log groups', lambda: responses[0].log_groups)
+    measure_memory('LogGroupDecoder records', lambda: responses[1].get_log_records())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Threads putting batches as fast as they can into a topic of the local stand-in server limited to a bytes per
+second quota: without rate limiter, only the quota cooldown of the retry policy, against a TopicRateLimiter
+learning the quota from the errors, and one configured slightly above it. Prints the accepted bytes per
+second, the spread of the accepted bytes from one second to the next, and the SpeedQuotaExceed answers.
+
+    python tests/benchmark_rate_limit.py [seconds] [threads]
+"""
+import os
+import sys
+import threading
+import time
+
+from mock_cls_server import MockClsServer
+from tencentcloud.log.logclient import LogClient
+from tencentcloud.log.ratelimit import TopicRateLimiter
+
+QUOTA = 2 * 1024 * 1024
+BATCH_SIZE = 64 * 1024
+
+
+def run(server, seconds, threads, limiter):
+    client = LogClient(server.endpoint, 'id', 'key', source='127.0.0.1', put_rate_limiter=limiter)
+    body = os.urandom(BATCH_SIZE)
+    accepted = {}
+    lock = threading.Lock()
+    start = time.time()
+
+    def target():
+        while time.time() - start < seconds:
+            try:
+                client.put_log_lz4('topic', body)
+            except Exception:
+                continue
+            second = int(time.time() - start)
+            with lock:
+                accepted[second] = accepted.get(second, 0) + len(body)
+
+    workers = [threading.Thread(target=target) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    client.close()
+    # the first second drains the burst of the quota, the last one is cut
+    rates = [accepted.get(second, 0) for second in range(1, int(seconds) - 1)]
+    mean = sum(rates) / float(len(rates))
+    spread = (sum((rate - mean) ** 2 for rate in rates) / len(rates)) ** 0.5
+    return mean, spread
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    server = MockClsServer()
+    server.start()
+    try:
+        for name, limiter in (('no rate limiter', None),
+                              ('adaptive rate limiter', TopicRateLimiter()),
+                              ('rate limiter at quota', TopicRateLimiter(bytes_per_second=QUOTA * 1.1))):
+            server.set_put_quota(QUOTA)
+            server.reset_counters()
+            mean, spread = run(server, seconds, threads, limiter)
+            print('{0:<24} {1:>8.0f} KB/s accepted {2:>8.0f} KB/s spread {3:>6} quota errors'.format(
+                name, mean / 1024, spread / 1024, server.quota_exceeded_count))
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Forked workers shipping logs to the local stand-in server, each with a LogProducer of its own, against one
+SharedMemoryProducer shared by all of them. Prints the time the workers spent sending, and the requests and
+connections seen by the server.
+
+    python tests/benchmark_shm_producer.py [workers] [logs_per_worker]
+"""
+import os
+import sys
+import time
+
+from mock_cls_server import MockClsServer
+from tencentcloud.log.logclient import LogClient
+from tencentcloud.log.producer import LogProducer
+from tencentcloud.log.shm_producer import SharedMemoryProducer
+
+
+def fork_workers(workers, target):
+    pids = []
+    for worker in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                target(worker)
+            finally:
+                os._exit(0)
+        pids.append(pid)
+    for pid in pids:
+        os.waitpid(pid, 0)
+
+
+def log(worker, i):
+    return {'worker': worker, 'level': 'INFO', 'message': 'request %d served' % i}
+
+
+def run_own_producers(server, workers, count):
+    def target(worker):
+        producer = LogProducer(LogClient(server.endpoint, 'id', 'key', source='127.0.0.1'), linger=0.2)
+        for i in range(count):
+            producer.send('topic', log(worker, i))
+        producer.close()
+
+    fork_workers(workers, target)
+
+
+def run_shared_producer(server, workers, count):
+    producer = SharedMemoryProducer(LogClient(server.endpoint, 'id', 'key', source='127.0.0.1'),
+                                    flush_interval=0.2)
+    producer.start()
+
+    def target(worker):
+        for i in range(count):
+            producer.send('topic', log(worker, i))
+
+    fork_workers(workers, target)
+    producer.close()
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+
+    server = MockClsServer()
+    server.start()
+    try:
+        for name, run in (('LogProducer per worker', run_own_producers),
+                          ('SharedMemoryProducer', run_shared_producer)):
+            server.reset_counters()
+            start = time.time()
+            run(server, workers, count)
+            print('{0:<24} {1:>8.2f} s {2:>6} requests {3:>6} connections'.format(
+                name, time.time() - start, server.request_count, server.connection_count))
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Signing throughput of the CLS signature and the YunAPI TC3 signature, with and without the signing caches.
+
+    python tests/benchmark_signature.py [iterations]
+"""
+import sys
+import time
+
+from tencentcloud.log import auth
+
+ACCESS_KEY_ID = 'AKIDxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx'
+ACCESS_KEY = 'xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx'
+
+
+def sign_cls():
+    headers = {'Host': 'ap-guangzhou.cls.tencentcs.com', 'Content-Type': 'application/json'}
+    auth.signature(ACCESS_KEY_ID, ACCESS_KEY, 'POST', '/pull_log', {'topic_id': 'topic'}, headers, 300)
+
+
+def sign_tc3():
+    headers = {'Host': 'cls.tencentcloudapi.com', 'Content-Type': 'application/json',
+               'X-TC-Timestamp': str(int(time.time()))}
+    auth.signatureWithYunApiV3(ACCESS_KEY_ID, ACCESS_KEY, 'cls', 'POST', '/', {}, headers,
+                               '{"LogsetId": "logset", "ConsumerGroup": "group"}')
+
+
+def measure(func, iterations):
+    start = time.time()
+    for _ in range(iterations):
+        func()
+    return iterations / (time.time() - start)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    for name, func in (('cls signature', sign_cls), ('tc3 signature', sign_tc3)):
+        auth.configure_sign_cache(0, 0)
+        uncached = measure(func, iterations)
+        auth.configure_sign_cache()
+        cached = measure(func, iterations)
+        print('{0:<14} uncached {1:>10.0f} sign/s  cached {2:>10.0f} sign/s  x{3:.1f}'.format(
+            name, uncached, cached, cached / uncached))
+
+
+if __name__ == '__main__':
+    main()
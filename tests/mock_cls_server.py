@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+A local stand-in of the CLS endpoints used by the benchmarks and samples in this directory.
+It serves put_log_raw (/structuredlog), pull_logs (/pull_log) and the YunAPI consumer group actions,
+assigns every partition to any consumer sending heart beats, and stores committed offsets in memory.
+fail_puts() makes put_log_raw fail until recover_puts(), to play an outage of the endpoint.
+set_put_quota() answers SpeedQuotaExceed to the puts beyond a bytes per second quota, like a topic does.
+put_delay holds every put answer for so many seconds, to play the round trip time to a remote region.
+
+    server = MockClsServer(partition_count=4)
+    server.start()
+    client = LogClient(server.endpoint, 'id', 'key', source='127.0.0.1')
+    server.point_yunapi_clients()  # YunApiLogClient created afterwards talk to the stand-in server
+    ...
+    server.shutdown()
+"""
+import base64
+import json
+import struct
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockClsHandler(BaseHTTPRequestHandler):
+    # keep-alive needs HTTP/1.1 and an explicit Content-Length on every response
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        self.server.on_request(self.path, self.headers, body)
+
+        route = self.path.split('?', 1)[0]
+        if route == '/structuredlog':
+            if self.server.put_delay:
+                time.sleep(self.server.put_delay)
+            failure = self.server.put_failure or self.server.check_put_quota(len(body))
+            if failure is not None:
+                status, error_code = failure
+                self._reply(status, json.dumps({'errorcode': error_code, 'errormessage': 'failed on command'})
+                            .encode('utf8'))
+            else:
+                self.server.on_put(self.path, body)
+                self._reply(200, b'')
+        elif route == '/pull_log':
+            self._reply(200, self.server.pull_log(json.loads(body.decode('utf8'))), 'application/octet-stream')
+        elif route == '/':
+            action = self.headers.get('X-TC-Action')
+            response = self.server.yunapi(action, json.loads(body.decode('utf8')) if body else {})
+            response['RequestId'] = str(uuid.uuid4())
+            self._reply(200, json.dumps({'Response': response}).encode('utf8'))
+        else:
+            self._reply(404, b'{"errorcode": "NotFound", "errormessage": "no such api"}')
+
+    def _reply(self, status, body, content_type='application/json'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-Cls-Requestid', str(uuid.uuid4()))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MockClsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, handler=MockClsHandler, topic_id='topic', partition_count=1,
+                 log_groups_per_pull=100, logs_per_group=10, keep_put_bodies=False, put_delay=0):
+        ThreadingHTTPServer.__init__(self, (host, port), handler)
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.connection_count = 0
+        self.topic_id = topic_id
+        self.partition_count = partition_count
+        self.log_groups_per_pull = log_groups_per_pull
+        self.logs_per_group = logs_per_group
+        self.committed_offsets = {}
+        self.put_failure = None
+        self.put_quota = None
+        self.put_delay = put_delay
+        self.quota_exceeded_count = 0
+        self._quota_tokens = 0
+        self._quota_time = 0
+        # (topic id, lz4 compressed LogGroupList) of the accepted puts, if keep_put_bodies
+        self.put_bodies = [] if keep_put_bodies else None
+        self._pull_messages = None
+        self._thread = None
+
+    @property
+    def endpoint(self):
+        return 'http://{0}:{1}'.format(self.server_address[0], self.server_address[1])
+
+    def point_yunapi_clients(self):
+        """ make the YunApiLogClient created from now on send to this server """
+        from tencentcloud.log import logclient
+        logclient.CLS_YUNAPI_ENDPOINT = self.endpoint
+
+    def on_request(self, path, headers, body):
+        with self.lock:
+            self.request_count += 1
+
+    def on_put(self, path, body):
+        if self.put_bodies is not None:
+            topic_id = path.split('topic_id=', 1)[-1].split('&', 1)[0]
+            with self.lock:
+                self.put_bodies.append((topic_id, body))
+
+    def fail_puts(self, status=503, error_code='InternalError'):
+        """ answer every put_log_raw with an error until recover_puts() """
+        self.put_failure = (status, error_code)
+
+    def recover_puts(self):
+        self.put_failure = None
+
+    def set_put_quota(self, bytes_per_second):
+        """ refuse the puts beyond bytes_per_second, with one second of burst, None for no quota """
+        with self.lock:
+            self.put_quota = bytes_per_second
+            self._quota_tokens = bytes_per_second or 0
+            self._quota_time = time.time()
+
+    def check_put_quota(self, size):
+        """ :return: (status, error code) if the put exceeds the quota, else None """
+        if self.put_quota is None:
+            return None
+        with self.lock:
+            now = time.time()
+            self._quota_tokens = min(self.put_quota, self._quota_tokens + (now - self._quota_time) * self.put_quota)
+            self._quota_time = now
+            if self._quota_tokens < size:
+                self.quota_exceeded_count += 1
+                return 429, 'SpeedQuotaExceed'
+            self._quota_tokens -= size
+            return None
+
+    def process_request(self, request, client_address):
+        with self.lock:
+            self.connection_count += 1
+        ThreadingHTTPServer.process_request(self, request, client_address)
+
+    def reset_counters(self):
+        with self.lock:
+            self.request_count = 0
+            self.connection_count = 0
+            self.quota_exceeded_count = 0
+
+    def _build_pull_messages(self):
+        from tencentcloud.log.cls_pb2 import LogGroup
+
+        log_group = LogGroup()
+        log_group.filename = '/var/log/app.log'
+        log_group.source = '127.0.0.1'
+        for i in range(self.logs_per_group):
+            log = log_group.logs.add()
+            log.time = 1700000000 + i
+            for key, value in (('level', 'INFO'), ('message', 'request %d served' % i)):
+                content = log.contents.add()
+                content.key = key
+                content.value = value
+        payload = log_group.SerializeToString()
+        header = struct.pack('>iqq36s36si', 130, 1700000000, 1000, b'0' * 36, b'0' * 36, len(payload))
+        return [base64.b64encode(header + payload).decode('ascii')] * self.log_groups_per_pull
+
+    def pull_log(self, request):
+        import snappy
+
+        if self._pull_messages is None:
+            self._pull_messages = self._build_pull_messages()
+        offset = max(int(request.get('StartOffset') or 0), 0)
+        body = {'Response': {'NextOffset': offset + len(self._pull_messages), 'Message': self._pull_messages}}
+        return snappy.compress(json.dumps(body).encode('utf8'))
+
+    def yunapi(self, action, request):
+        if action == 'SendConsumerHeartbeat':
+            return {'TopicPartitionsInfo': [{'TopicID': self.topic_id,
+                                             'Partitions': list(range(self.partition_count))}]}
+        if action == 'DescribeConsumerOffsets':
+            partition_id = int(request.get('PartitionId', -1))
+            partitions = range(self.partition_count) if partition_id < 0 else [partition_id]
+            with self.lock:
+                offsets = [{'PartitionId': p, 'Offset': self.committed_offsets.get(p, 0)} for p in partitions]
+            return {'TopicPartitionOffsetsInfo': [{'TopicID': self.topic_id, 'PartitionOffsets': offsets}]}
+        if action == 'CommitConsumerOffsets':
+            with self.lock:
+                for topic_info in request.get('TopicPartitionOffsetsInfo') or []:
+                    for partition_offset in topic_info['PartitionOffsets']:
+                        self.committed_offsets[partition_offset['PartitionId']] = partition_offset['Offset']
+            return {}
+        if action == 'DescribeConsumerGroups':
+            return {'ConsumerGroupsInfo': []}
+        # CreateConsumerGroup, ModifyConsumerGroup, DeleteConsumerGroup
+        return {}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def shutdown(self):
+        ThreadingHTTPServer.shutdown(self)
+        self.server_close()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+LogProducer with a write-ahead log through an outage of the local stand-in server: the batches failing
+during the outage are kept on disk, survive a restart of the producer, and are replayed once the server
+recovers. Checks that every log reached the server.
+
+    python tests/sample_producer_wal.py [logs]
+"""
+import shutil
+import sys
+import tempfile
+import time
+
+import lz4.block
+
+from mock_cls_server import MockClsServer
+from tencentcloud.log.cls_pb2 import LogGroupList
+from tencentcloud.log.logclient import LogClient
+from tencentcloud.log.producer import LogProducer
+from tencentcloud.log.retry import RetryPolicy
+
+
+def received_logs(server):
+    logs = []
+    for _, body in server.put_bodies:
+        log_group_list = LogGroupList.FromString(lz4.block.decompress(body, uncompressed_size=64 * 1024 * 1024))
+        for log_group in log_group_list.logGroupList:
+            logs.extend(int(log.contents[0].value) for log in log_group.logs)
+    return logs
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    wal_dir = tempfile.mkdtemp(prefix='cls-producer-wal-')
+    server = MockClsServer(keep_put_bodies=True)
+    server.start()
+    client = LogClient(server.endpoint, 'id', 'key', source='127.0.0.1',
+                       retry_policy=RetryPolicy(max_retries=1, base_delay=0.05))
+    try:
+        producer = LogProducer(client, linger=0.1, max_batch_count=100, wal_dir=wal_dir, replay_max_interval=1)
+        for i in range(count // 2):
+            producer.send('topic', {'seq': i})
+        producer.flush()
+        print('sent {0} logs, {1} accepted'.format(count // 2, len(received_logs(server))))
+
+        server.fail_puts()
+        for i in range(count // 2, count):
+            producer.send('topic', {'seq': i})
+        time.sleep(1)
+        print('outage, {0} batches waiting for replay'.format(producer.get_replay_count()))
+        producer.close(timeout=1)
+
+        producer = LogProducer(client, wal_dir=wal_dir, replay_max_interval=1)
+        print('restarted, {0} batches recovered from the write-ahead log'.format(producer.get_replay_count()))
+        server.recover_puts()
+        while producer.get_replay_count():
+            time.sleep(0.1)
+        producer.close()
+
+        logs = received_logs(server)
+        print('{0} logs accepted, all delivered: {1}, duplicates: {2}'.format(
+            len(logs), set(logs) == set(range(count)), len(logs) - len(set(logs))))
+    finally:
+        server.shutdown()
+        shutil.rmtree(wal_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()